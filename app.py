@@ -4,13 +4,28 @@ from models import db
 from routes.auth import auth_bp
 from routes.content import content_bp
 from routes.reminders import reminders_bp
+from services.reminder_scheduler import reminder_scheduler
+from services.sync_job_service import job_worker
+from services.token_manager import token_manager
+from utils.db_engine import configure_engines, init_engines
+from utils.metrics import init_metrics
+from utils.structured_logging import configure_logging
+import click
 import os
+import time
 
-def create_app():
+def create_app(config_overrides=None):
+    """Builds the app from Config; `config_overrides` replace settings before any service starts."""
     app = Flask(__name__)
     app.config.from_object(Config)
+    if config_overrides:
+        app.config.update(config_overrides)
+    configure_logging(app)
 
+    bind_pragmas = configure_engines(app)
     db.init_app(app)
+    init_engines(app, db, bind_pragmas)
+    init_metrics(app)
     # mail.init_app(app) # If using Flask-Mail
 
     # Register Blueprints
@@ -18,6 +33,13 @@ def create_app():
     app.register_blueprint(content_bp)
     app.register_blueprint(reminders_bp)
 
+    if app.config.get('REMINDER_SCHEDULER_ENABLED'):
+        reminder_scheduler.start(app)
+    if app.config.get('TOKEN_REFRESHER_ENABLED'):
+        token_manager.start(app)
+    if app.config.get('JOB_WORKER_ENABLED'):
+        job_worker.start(app)
+
     @app.route('/')
     def index():
         return "Backend is running!"
@@ -40,6 +62,89 @@ def create_app():
         db.create_all()
         print('Initialized the database.')
 
+    @app.cli.command('run-sync-workers')
+    @click.option('--workers', type=int, default=None, help='Shard processes to start on this host (default: CPU count).')
+    @click.option('--shard-count', type=int, default=None, help='Shards across all hosts (default: --workers).')
+    @click.option('--first-shard', type=int, default=0, help='Index of the first shard this host runs.')
+    @click.option('--concurrency', type=int, default=None, help='Accounts synced at once per process (default SYNC_SHARD_CONCURRENCY).')
+    @click.option('--no-token-refresher', is_flag=True, help='Leave token refreshes to another process.')
+    def run_sync_workers_command(workers, shard_count, first_shard, concurrency, no_token_refresher):
+        """Keep every linked account synced, one worker process per user-id shard, until interrupted."""
+        from services.sync_shard_service import ShardSupervisor
+        workers = workers or os.cpu_count() or 1
+        shard_count = shard_count or workers
+        supervisor = ShardSupervisor(shard_count, range(first_shard, min(first_shard + workers, shard_count)),
+                                     concurrency=concurrency)
+        print(f'Running shards {supervisor.shards[0]}-{supervisor.shards[-1]} of {shard_count}.')
+        # One refresher for the host, in this process, so the shards' syncs find fresh tokens
+        if not no_token_refresher:
+            token_manager.start(app)
+        try:
+            supervisor.run()
+        finally:
+            token_manager.stop()
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Create or rebuild the full-text search index from saved content."""
+        from services.search_service import SearchService
+        SearchService().rebuild_index()
+        print('Rebuilt the search index.')
+
+    @app.cli.command('run-reminder-scheduler')
+    def run_reminder_scheduler_command():
+        """Run the reminder timer in the foreground until interrupted."""
+        reminder_scheduler.start(app)
+        try:
+            reminder_scheduler.join()
+        except KeyboardInterrupt:
+            reminder_scheduler.stop()
+
+    @app.cli.command('run-job-worker')
+    @click.option('--concurrency', type=int, default=None, help='Jobs run at once (default JOB_WORKER_CONCURRENCY).')
+    @click.option('--exit-when-idle', is_flag=True, help='Exit once no job is due instead of polling forever.')
+    @click.option('--no-token-refresher', is_flag=True, help='Leave token refreshes to another process.')
+    def run_job_worker_command(concurrency, exit_when_idle, no_token_refresher):
+        """Run queued sync jobs in the foreground until interrupted."""
+        # Refreshes expiring tokens ahead of the jobs, so a sync rarely waits on a token endpoint
+        if not no_token_refresher and not exit_when_idle:
+            token_manager.start(app)
+        job_worker.start(app, concurrency=concurrency, exit_when_idle=exit_when_idle)
+        try:
+            job_worker.join()
+        except KeyboardInterrupt:
+            job_worker.stop()
+        finally:
+            token_manager.stop()
+        print(f'Ran {job_worker.jobs_run} jobs.')
+
+    @app.cli.command('send-outbox')
+    @click.option('--loop', is_flag=True, help='Keep polling the outbox instead of exiting when it is empty.')
+    @click.option('--interval', default=5.0, help='Seconds between polls with --loop.')
+    def send_outbox_command(loop, interval):
+        """Deliver pending emails from the outbox."""
+        from services.email_outbox_service import EmailOutboxService
+        outbox = EmailOutboxService()
+        while True:
+            outbox.dispatch_pending()
+            if not loop:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('refresh-tokens')
+    def refresh_tokens_command():
+        """Refresh every platform token that expires within the refresh leeway."""
+        refreshed, failed = token_manager.refresh_expiring()
+        print(f'Refreshed {refreshed} tokens, {failed} failed.')
+
+    @app.cli.command('explain-queries')
+    @click.option('--user-id', default=1, help='User whose data the service queries are run against.')
+    def explain_queries_command(user_id):
+        """Run EXPLAIN on the service queries and flag full scans."""
+        from utils.query_plans import report_query_plans
+        if report_query_plans(user_id):
+            raise SystemExit(1)
+
     return app
 
 # This part allows running the app directly from this file
@@ -0,0 +1,128 @@
+"""
+Synthetic data generator: fills the models with users, linked platform accounts, saved items and
+reminders, using bulk inserts. Deterministic for a given seed.
+
+    python benchmarks/datagen.py --database-url sqlite:///bench.db --users 1000 --items-per-account 200
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, User, PlatformAccount, SavedContent, Reminder
+
+PLATFORM_CONTENT_TYPES = {'youtube': 'video', 'twitter': 'tweet', 'reddit': 'post'}
+INSERT_CHUNK_SIZE = 5000
+WORDS = ('python', 'flask', 'database', 'index', 'cache', 'async', 'latency', 'queue', 'worker', 'search',
+         'review', 'guide', 'tutorial', 'deep', 'dive', 'notes', 'talk', 'thread', 'paper', 'benchmark')
+
+
+def populate(users=100, platforms_per_user=3, items_per_account=100, reminders_per_user=5,
+             due_reminder_fraction=0.5, seed=42):
+    """
+    Inserts the data into the current app's database and commits. Ids continue after the largest
+    existing ones, so it can run against a database that already holds data.
+    `due_reminder_fraction` of the reminders are scheduled in the past, i.e. due now.
+    Returns the counts inserted and the time taken.
+    """
+    rng = random.Random(seed)
+    started = time.monotonic()
+    now = datetime.utcnow()
+    platforms = list(PLATFORM_CONTENT_TYPES)[:platforms_per_user]
+
+    next_user_id = _next_id(User)
+    next_account_id = _next_id(PlatformAccount)
+    next_content_id = _next_id(SavedContent)
+    next_reminder_id = _next_id(Reminder)
+
+    user_rows, account_rows, content_rows, reminder_rows = [], [], [], []
+    for user_index in range(users):
+        user_id = next_user_id + user_index
+        user_rows.append({'id': user_id, 'email': f'bench{user_id}@example.com', 'registered_at': now,
+                          'content_version': 0, 'reminder_version': 0})
+        user_content_ids = []
+        for platform in platforms:
+            account_rows.append({
+                'id': next_account_id + len(account_rows), 'user_id': user_id, 'platform': platform,
+                'access_token': f'bench_access_{user_id}_{platform}', 'refresh_token': f'bench_refresh_{user_id}_{platform}',
+                'expires_at': now + timedelta(hours=1)
+            })
+            for item_index in range(items_per_account):
+                content_id = next_content_id + len(content_rows)
+                saved_at = now - timedelta(seconds=rng.randrange(365 * 86400))
+                content_rows.append({
+                    'id': content_id, 'user_id': user_id, 'platform': platform,
+                    'original_id': f'{platform}-{user_id}-{item_index}',
+                    'title': ' '.join(rng.choice(WORDS) for _ in range(6)),
+                    'url': f'https://{platform}.example.com/{user_id}/{item_index}',
+                    'description': ' '.join(rng.choice(WORDS) for _ in range(30)),
+                    'content_type': PLATFORM_CONTENT_TYPES[platform],
+                    'saved_at': saved_at,
+                    'original_published_at': saved_at - timedelta(days=rng.randrange(30))
+                })
+                user_content_ids.append(content_id)
+        for _ in range(reminders_per_user if user_content_ids else 0):
+            due = rng.random() < due_reminder_fraction
+            offset = timedelta(seconds=rng.randrange(1, 7 * 86400))
+            reminder_rows.append({
+                'id': next_reminder_id + len(reminder_rows), 'user_id': user_id,
+                'content_id': rng.choice(user_content_ids),
+                'reminder_time': now - offset if due else now + offset,
+                'created_at': now, 'status': 'scheduled'
+            })
+
+    for model, rows in ((User, user_rows), (PlatformAccount, account_rows),
+                        (SavedContent, content_rows), (Reminder, reminder_rows)):
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            db.session.execute(model.__table__.insert(), rows[start:start + INSERT_CHUNK_SIZE])
+    db.session.commit()
+
+    return {
+        'users': len(user_rows),
+        'platform_accounts': len(account_rows),
+        'saved_content': len(content_rows),
+        'reminders': len(reminder_rows),
+        'elapsed_seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--platforms-per-user', type=int, default=3, choices=(1, 2, 3))
+    parser.add_argument('--items-per-account', type=int, default=100)
+    parser.add_argument('--reminders-per-user', type=int, default=5)
+    parser.add_argument('--due-reminder-fraction', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def populate_from_args(args):
+    return populate(users=args.users, platforms_per_user=args.platforms_per_user,
+                    items_per_account=args.items_per_account, reminders_per_user=args.reminders_per_user,
+                    due_reminder_fraction=args.due_reminder_fraction, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Defaults to DATABASE_URL / the app default.')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(populate_from_args(args))
+
+
+if __name__ == '__main__':
+    main()
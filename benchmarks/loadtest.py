@@ -0,0 +1,339 @@
+"""
+End-to-end HTTP load test: starts the app from create_app() in a WSGI server (see serve_app.py) and
+a mock platform API (see mock_platform_server.py), then runs virtual users through a mix of
+scenarios and reports throughput and p50/p95/p99 latency per route.
+
+    python benchmarks/loadtest.py --users 50 --duration 60 --latency-ms 200 --error-rate 0.02
+    python benchmarks/loadtest.py --mix list_content=60,sync=20,create_reminder=20 --output load.json
+
+Each virtual user registers, logs in and links all three platforms, then loops over the scenario
+mix until the run ends. Uses a fresh temporary SQLite database unless --database-url is given;
+the app's output goes to a log file in the run directory.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import mock_platform_server
+from run_benchmarks import git_commit
+from serve_app import SERVERS, pick_server
+
+PLATFORMS = mock_platform_server.PLATFORMS
+DEFAULT_MIX = {'list_content': 35, 'list_reminders': 15, 'create_reminder': 15, 'sync': 15,
+               'login': 10, 'oauth_callback': 5, 'register': 5}
+
+
+class RouteStats:
+    """Latencies and status codes recorded for one route."""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.statuses = Counter()
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies_ms)
+        errors = sum(count for status, count in self.statuses.items() if status == 'error' or status >= 500)
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': round(len(latencies) / duration, 2),
+            'p50_ms': _percentile(latencies, 50),
+            'p95_ms': _percentile(latencies, 95),
+            'p99_ms': _percentile(latencies, 99),
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items(), key=str)}
+        }
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile, None for no values."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1], 2)
+
+
+class Recorder:
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, elapsed_ms, status):
+        with self._lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats()
+            stats.latencies_ms.append(elapsed_ms)
+            stats.statuses[status] += 1
+
+    def summary(self, duration):
+        with self._lock:
+            routes = {route: stats.summary(duration) for route, stats in sorted(self.routes.items())}
+            total = RouteStats()
+            for stats in self.routes.values():
+                total.latencies_ms.extend(stats.latencies_ms)
+                total.statuses.update(stats.statuses)
+        return routes, total.summary(duration)
+
+
+class VirtualUser(threading.Thread):
+    """One simulated client with its own keep-alive connection, running scenarios until `deadline`."""
+
+    def __init__(self, index, base_url, mix, deadline, recorder, run_id, seed, think_ms):
+        super().__init__(name=f'vu-{index}', daemon=True)
+        parsed = urllib.parse.urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        self.scenarios, self.weights = zip(*mix.items())
+        self.deadline = deadline
+        self.recorder = recorder
+        self.email = f'load-{run_id}-{index}@example.com'
+        self.random = random.Random(seed)
+        self.think_ms = think_ms
+        self.user_id = None
+        self.content_ids = []
+        self.etags = {}
+
+    def run(self):
+        self.register()
+        if self.user_id is None:
+            return
+        self.login()
+        for platform in PLATFORMS:
+            self.oauth_callback(platform)
+        while time.monotonic() < self.deadline:
+            getattr(self, self.random.choices(self.scenarios, self.weights)[0])()
+            if self.think_ms:
+                time.sleep(self.random.uniform(0, 2 * self.think_ms) / 1000)
+        self.connection.close()
+
+    # Scenarios
+
+    def register(self):
+        first = self.user_id is None
+        email = self.email if first else f'load-{uuid.uuid4().hex}@example.com'
+        status, payload = self.request('POST /api/auth/register', 'POST', '/api/auth/register', {'email': email})
+        if first and status == 201:
+            self.user_id = payload['user_id']
+
+    def login(self):
+        self.request('POST /api/auth/login', 'POST', '/api/auth/login', {'email': self.email})
+
+    def oauth_callback(self, platform=None):
+        platform = platform or self.random.choice(PLATFORMS)
+        query = urllib.parse.urlencode({'code': f'load-code-{uuid.uuid4().hex[:8]}', 'state': f'{self.user_id}-{platform}'})
+        self.request('GET /api/auth/oauth/<platform>/callback', 'GET', f'/api/auth/oauth/{platform}/callback?{query}')
+
+    def list_content(self):
+        # Clients revalidate with the ETag they were given, as a browser would
+        status, payload = self.request('GET /api/content/', 'GET', f'/api/content/?user_id={self.user_id}&limit=50',
+                                       etag_key='content')
+        if status == 200 and payload:
+            self.content_ids = [item['id'] for item in payload['items']] or self.content_ids
+
+    def list_reminders(self):
+        self.request('GET /api/reminders/', 'GET', f'/api/reminders/?user_id={self.user_id}', etag_key='reminders')
+
+    def create_reminder(self):
+        if not self.content_ids:
+            return self.list_content()
+        reminder_time = datetime.utcnow() + timedelta(minutes=self.random.randrange(10, 7 * 24 * 60))
+        self.request('POST /api/reminders/', 'POST', '/api/reminders/',
+                     {'user_id': self.user_id, 'content_id': self.random.choice(self.content_ids),
+                      'reminder_time': reminder_time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def sync(self):
+        platform = self.random.choice(PLATFORMS)
+        status, payload = self.request('POST /api/content/sync/<platform>', 'POST', f'/api/content/sync/{platform}',
+                                       {'user_id': self.user_id})
+        if status in (200, 202) and payload:
+            self.request('GET /api/content/sync/jobs/<job_id>', 'GET', payload['status_url'])
+
+    def request(self, route, method, path, body=None, etag_key=None):
+        """Sends one request and records its latency under `route`. Returns (status, JSON payload or None)."""
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if etag_key and etag_key in self.etags:
+            headers['If-None-Match'] = self.etags[etag_key]
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.recorder.record(route, (time.perf_counter() - started) * 1000, 'error')
+            self.connection.close() # Reconnects on the next request
+            return None, None
+        self.recorder.record(route, (time.perf_counter() - started) * 1000, response.status)
+
+        if etag_key and response.getheader('ETag'):
+            self.etags[etag_key] = response.getheader('ETag')
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}' (choose from {', '.join(DEFAULT_MIX)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for '{name}': {weight!r}")
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, process, log_path, timeout=30):
+    deadline = time.monotonic() + timeout
+    parsed = urllib.parse.urlsplit(base_url)
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f'App server exited with code {process.returncode}; see {log_path}')
+        try:
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+        finally:
+            connection.close()
+    raise SystemExit(f'App server did not answer on {base_url} within {timeout}s.')
+
+
+def start_app(args, mock_url, run_dir):
+    """Starts serve_app.py in a subprocess; returns (process, base URL, log path)."""
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=args.database_url or 'sqlite:///' + os.path.join(run_dir, 'loadtest.db'),
+               MOCK_PLATFORM_API_URL=mock_url,
+               JOB_WORKER_ENABLED='true',
+               JOB_WORKER_CONCURRENCY=str(args.job_concurrency),
+               JOB_POLL_INTERVAL_SECONDS='0.2',
+               SYNC_MIN_INTERVAL_SECONDS=str(args.sync_min_interval),
+               PYTHONUNBUFFERED='1')
+    for platform in PLATFORMS:
+        env[f'{platform.upper()}_TOKEN_URL'] = f'{mock_url}/{platform}/token'
+
+    log_path = os.path.join(run_dir, 'app.log')
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'serve_app.py'), '--server', args.server,
+                                '--port', str(port), '--workers', str(args.workers), '--threads', str(args.threads)],
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return process, f'http://127.0.0.1:{port}', log_path
+
+
+def print_results(routes, total):
+    print(f"{'route':<42}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, result in list(routes.items()) + [('total', total)]:
+        if result['requests']:
+            print(f"{route:<42}{result['requests']:>9}{result['errors']:>8}{result['throughput_rps']:>9.1f}"
+                  f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds the scenario mix runs.')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='Seconds over which the users are started.')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='Mean pause between a user\'s requests.')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Scenario weights, e.g. list_content=50,sync=20 (default: %(default)s).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server', choices=('auto',) + SERVERS, default='auto')
+    parser.add_argument('--workers', type=int, default=2, help='App server processes (gunicorn only).')
+    parser.add_argument('--threads', type=int, default=8, help='App server threads per process.')
+    parser.add_argument('--job-concurrency', type=int, default=4, help='Sync jobs run at once per app process.')
+    parser.add_argument('--sync-min-interval', type=int, default=30, help='SYNC_MIN_INTERVAL_SECONDS for the app.')
+    parser.add_argument('--database-url', help='Database for the app (default: a temporary SQLite file).')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    mock_platform_server.add_arguments(parser)
+    args = parser.parse_args()
+    args.server = pick_server(args.server)
+    if args.server == 'werkzeug':
+        print("Neither gunicorn nor waitress is installed; using Werkzeug's threaded server instead.")
+
+    run_dir = tempfile.mkdtemp(prefix='loadtest-')
+    mock_server = mock_platform_server.server_from_args(args)
+    threading.Thread(target=mock_server.serve_forever, daemon=True).start()
+    process, base_url, log_path = start_app(args, mock_server.url, run_dir)
+    try:
+        wait_until_up(base_url, process, log_path)
+        print(f'App ({args.server}) on {base_url}, mock platform API on {mock_server.url}, log in {log_path}')
+
+        recorder = Recorder()
+        run_id = uuid.uuid4().hex[:8]
+        started = time.monotonic()
+        deadline = started + args.ramp_up + args.duration
+        users = [VirtualUser(index, base_url, args.mix, deadline, recorder, run_id, args.seed + index, args.think_ms)
+                 for index in range(args.users)]
+        for index, user in enumerate(users):
+            user.start()
+            time.sleep(args.ramp_up / max(len(users), 1))
+        for user in users:
+            user.join()
+        duration = time.monotonic() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        mock_server.shutdown()
+        mock_server.server_close()
+
+    routes, total = recorder.summary(duration)
+    print_results(routes, total)
+    platform_stats = mock_server.stats()
+    print(f"Mock platform API served {platform_stats['requests']} requests: {platform_stats['by_platform']}")
+    if args.output:
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'created_at': datetime.utcnow().isoformat(),
+                'server': args.server,
+                'duration_seconds': round(duration, 2),
+                'parameters': {key: value for key, value in vars(args).items()
+                               if key not in ('output', 'database_url', 'server')}
+            },
+            'routes': routes,
+            'total': total,
+            'platform_api': platform_stats
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
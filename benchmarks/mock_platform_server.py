@@ -0,0 +1,214 @@
+"""
+Mock YouTube, Twitter and Reddit APIs for load tests, with tunable latency and error rates. Point the
+app at it with MOCK_PLATFORM_API_URL (saved items) and <PLATFORM>_TOKEN_URL (token refreshes).
+
+    python benchmarks/mock_platform_server.py --port 8081 --latency-ms 150 --jitter-ms 50 --error-rate 0.01
+
+GET  /<platform>/saved   -- newest saved items of the bearer token's account, in the platform's raw format
+POST /<platform>/token   -- refresh-token exchange
+GET  /stats              -- requests served, by platform and status
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+
+PLATFORMS = ('youtube', 'twitter', 'reddit')
+
+
+class MockPlatformServer(ThreadingHTTPServer):
+    """
+    latency_ms/jitter_ms -- each response is delayed by latency_ms plus up to ±jitter_ms
+    error_rate -- fraction of requests answered with 503
+    throttle_rate -- fraction answered with 429 and a Retry-After of retry_after seconds
+    page_items -- items per /saved response
+    new_items_per_second -- how fast every account's library grows, so repeated syncs find new items
+    quota_per_minute -- per-token quota; when set, /saved responses carry X-RateLimit-Remaining/Reset
+        and a token over its quota gets 429 until the minute window resets
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=100.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, page_items=20, new_items_per_second=0.5, quota_per_minute=0, seed=None):
+        super().__init__(address, MockPlatformHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.page_items = page_items
+        self.new_items_per_second = new_items_per_second
+        self.quota_per_minute = quota_per_minute
+        self.started_at = time.time()
+        self.counts = Counter()
+        self._quota_used = Counter() # (token, window start) -> requests
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def draw(self):
+        """Returns (delay seconds, status) for the next request."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 503
+        return delay, 200
+
+    def take_quota(self, token):
+        """Counts a request against the token's window. Returns (remaining, reset epoch), or None without a quota."""
+        if not self.quota_per_minute:
+            return None
+        window = int(time.time() // 60) * 60
+        with self._lock:
+            if (token, window) not in self._quota_used:
+                self._quota_used = Counter({key: used for key, used in self._quota_used.items() if key[1] == window})
+            self._quota_used[(token, window)] += 1
+            used = self._quota_used[(token, window)]
+        return self.quota_per_minute - used, window + 60
+
+    def record(self, platform, status):
+        with self._lock:
+            self.counts[(platform, status)] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        by_platform = {}
+        for (platform, status), count in sorted(counts.items()):
+            by_platform.setdefault(platform, {})[str(status)] = count
+        return {'requests': sum(counts.values()), 'by_platform': by_platform}
+
+    def saved_items(self, platform, access_token):
+        """The newest page_items items of the token's account, newest first."""
+        account = hashlib.blake2b(access_token.encode(), digest_size=4).hexdigest()
+        newest = int((time.time() - self.started_at) * self.new_items_per_second) + self.page_items
+        base = datetime.utcfromtimestamp(self.started_at)
+        return [_raw_item(platform, f'{account}-{index}', base + timedelta(seconds=index / max(self.new_items_per_second, 1e-6)))
+                for index in range(newest, max(newest - self.page_items, 0), -1)]
+
+
+def _raw_item(platform, item_id, published):
+    if platform == 'youtube':
+        return {'id': item_id, 'title': f'Load test video {item_id}', 'url': f'http://youtube.com/watch?v={item_id}',
+                'publishedAt': published.strftime('%Y-%m-%dT%H:%M:%SZ')}
+    if platform == 'twitter':
+        return {'id': item_id, 'text': f'Load test tweet {item_id}', 'url': f'http://twitter.com/user/status/{item_id}',
+                'created_at': published.strftime('%a %b %d %H:%M:%S +0000 %Y')}
+    return {'id': item_id, 'title': f'Load test post {item_id}', 'url': f'http://reddit.com/comments/{item_id}',
+            'created_utc': int((published - datetime(1970, 1, 1)).total_seconds())}
+
+
+class MockPlatformHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like the real APIs
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send(200, self.server.stats())
+        platform, action = self._route()
+        if action != 'saved':
+            return self._send(404, {'error': 'not found'})
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token:
+            return self._send(401, {'error': 'missing access token'})
+        self._respond(platform, lambda: {'items': self.server.saved_items(platform, token)}, quota_token=token)
+
+    def do_POST(self):
+        platform, action = self._route()
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if action != 'token':
+            return self._send(404, {'error': 'not found'})
+        self._respond(platform, lambda: {'access_token': f'mock_access_token_{uuid.uuid4()}',
+                                         'refresh_token': f'mock_refresh_token_{uuid.uuid4()}',
+                                         'expires_in': 3600, 'token_type': 'bearer'})
+
+    def _route(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) == 2 and parts[0] in PLATFORMS:
+            return parts[0], parts[1]
+        return None, None
+
+    def _respond(self, platform, body, quota_token=None):
+        delay, status = self.server.draw()
+        quota = self.server.take_quota(quota_token) if quota_token else None
+        headers = {}
+        if quota is not None:
+            remaining, reset = quota
+            if remaining < 0:
+                status = 429
+            headers = {'X-RateLimit-Remaining': str(max(remaining, 0)), 'X-RateLimit-Reset': str(reset)}
+        time.sleep(delay)
+        self.server.record(platform, status)
+        if status == 429:
+            retry_after = max(1, int(quota[1] - time.time())) if quota and quota[0] < 0 else self.server.retry_after
+            self._send(429, {'error': 'rate limit exceeded'}, {'Retry-After': str(retry_after), **headers})
+        elif status == 503:
+            self._send(503, {'error': 'service unavailable'})
+        else:
+            self._send(200, body(), headers)
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # One line per request would drown the load test's own output
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='Mean platform response time.')
+    parser.add_argument('--jitter-ms', type=float, default=25.0, help='Response times vary by up to this much either way.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of platform requests answered with 503.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction answered with 429.')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with each 429.')
+    parser.add_argument('--page-items', type=int, default=20, help='Items per saved-items response.')
+    parser.add_argument('--new-items-per-second', type=float, default=0.5,
+                        help='How fast each mock account gains saved items.')
+    parser.add_argument('--quota-per-minute', type=int, default=0,
+                        help='Per-token quota advertised in X-RateLimit headers and enforced with 429s (0: none).')
+
+
+def server_from_args(args, host='127.0.0.1', port=0):
+    return MockPlatformServer((host, port), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                              retry_after=args.retry_after, page_items=args.page_items,
+                              new_items_per_second=args.new_items_per_second, quota_per_minute=args.quota_per_minute,
+                              seed=getattr(args, 'seed', None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = server_from_args(args, args.host, args.port)
+    print(f'Mock platform API on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Service-level benchmarks: wall time and SQL statement counts of the hot paths, against a database
+filled by benchmarks/datagen.py. Results are written as JSON; pass an earlier result file to
+--compare to see how the current tree moved against it.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --users 500 --fetch-latency 0.05 --compare results.json
+
+Uses a fresh temporary SQLite database unless --database-url is given. Service logging is cut
+down to warnings (LOG_LEVEL), so it doesn't skew the timings.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import platform as platform_module
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+from bench_normalization import generate_items
+
+SYNTHETIC_PLATFORM = 'benchmark'
+SYNTHETIC_PAGE_SIZE = 100
+
+
+@contextmanager
+def count_statements(engine):
+    """Counts the SQL statements sent through `engine` inside the block, by leading keyword."""
+    counts = Counter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counts[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def register_synthetic_fetcher(items_per_sync):
+    """Registers a platform whose API returns `items_per_sync` items in pages, with the mock latency per page."""
+    from services.platform_fetchers import PlatformFetcher, register_fetcher, mock_latency
+    from utils.normalization import NormalizationSpec, parse_iso8601
+
+    raw_items = [{'id': f'synthetic-{index}', 'title': f'Synthetic item {index}',
+                  'url': f'https://benchmark.example.com/{index}',
+                  'publishedAt': (datetime(2024, 1, 1) - timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+                 for index in range(items_per_sync)]
+
+    @register_fetcher
+    class SyntheticFetcher(PlatformFetcher):
+        platform = SYNTHETIC_PLATFORM
+        spec = NormalizationSpec(fields={'title': 'title', 'url': 'url'}, constants={'content_type': 'video'},
+                                 published_at=('publishedAt', parse_iso8601))
+
+        def pages(self, access_token, call_api):
+            for start in range(0, len(raw_items), SYNTHETIC_PAGE_SIZE):
+                def request_page(start=start):
+                    time.sleep(mock_latency())
+                    return raw_items[start:start + SYNTHETIC_PAGE_SIZE]
+                yield call_api(request_page)
+
+
+def build_operations(args, user_ids):
+    """Returns [(name, setup, run)]; setup runs untimed before each run."""
+    from models import db, PlatformAccount, SavedContent, Reminder, EmailOutbox
+    from services.auth_service import AuthService
+    from services.data_aggregator_service import DataAggregatorService
+    from services.platform_fetchers import get_fetcher
+    from services.reminder_service import ReminderService
+    from sqlalchemy import update
+
+    aggregator = DataAggregatorService()
+    reminders = ReminderService()
+    auth = AuthService()
+    rng = random.Random(args.seed)
+    user_id = user_ids[0]
+    raw_youtube_page = generate_items('youtube', args.normalize_items, max(1, args.normalize_items // 10), rng)
+
+    db.session.add(PlatformAccount(user_id=user_id, platform=SYNTHETIC_PLATFORM, access_token='bench_synthetic_token'))
+    db.session.commit()
+
+    def fresh_session():
+        db.session.expunge_all()
+
+    def reset_synthetic_account():
+        db.session.query(SavedContent).filter_by(user_id=user_id, platform=SYNTHETIC_PLATFORM) \
+            .delete(synchronize_session=False)
+        db.session.query(PlatformAccount).filter_by(user_id=user_id, platform=SYNTHETIC_PLATFORM) \
+            .update({'sync_cursor': None, 'last_published_at': None, 'last_synced_at': None})
+        db.session.commit()
+        fresh_session()
+
+    def reset_due_reminders():
+        # Puts a fixed number of reminders back in the past, so every run sends the same amount
+        due_ids = [reminder_id for (reminder_id,) in db.session.query(Reminder.id)
+                   .order_by(Reminder.id).limit(args.due_reminders)]
+        db.session.execute(update(Reminder).where(Reminder.id.in_(due_ids))
+                           .values(status='scheduled', reminder_time=datetime.utcnow() - timedelta(minutes=1),
+                                   lease_owner=None, lease_expires_at=None))
+        db.session.execute(update(Reminder).where(Reminder.id.notin_(due_ids), Reminder.status == 'scheduled')
+                           .values(reminder_time=datetime.utcnow() + timedelta(days=30)))
+        db.session.query(EmailOutbox).delete(synchronize_session=False)
+        db.session.commit()
+        fresh_session()
+
+    youtube = get_fetcher('youtube')
+    return [
+        ('normalize_page', lambda: None, lambda: youtube.normalize_page(raw_youtube_page)),
+        ('sync_user_platform.mock_youtube', fresh_session,
+         lambda: aggregator.sync_user_platform(user_id, 'youtube', full=True)),
+        ('sync_user_platform.initial', reset_synthetic_account,
+         lambda: aggregator.sync_user_platform(user_id, SYNTHETIC_PLATFORM)),
+        ('sync_user_platform.resync_unchanged', fresh_session,
+         lambda: aggregator.sync_user_platform(user_id, SYNTHETIC_PLATFORM, full=True)),
+        ('get_user_content', fresh_session, lambda: aggregator.get_user_content(user_id)),
+        ('get_user_content_page', fresh_session, lambda: aggregator.get_user_content_page(user_id, limit=50)),
+        ('process_due_reminders', reset_due_reminders, lambda: reminders.process_due_reminders()),
+        ('handle_oauth_callback', fresh_session,
+         lambda: auth.handle_oauth_callback(rng.choice(user_ids), rng.choice(('youtube', 'twitter', 'reddit')), 'code')),
+    ]
+
+
+def run_operation(engine, setup, run, repeats, warmup):
+    timings, statement_counts = [], []
+    for index in range(warmup + repeats):
+        setup()
+        with count_statements(engine) as counts:
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+        if index >= warmup:
+            timings.append(elapsed * 1000)
+            statement_counts.append(counts)
+
+    timings.sort()
+    last_counts = statement_counts[-1]
+    return {
+        'runs': repeats,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': sum(last_counts.values()),
+        'queries_by_kind': dict(sorted(last_counts.items())),
+        'queries_varied': len({sum(counts.values()) for counts in statement_counts}) > 1
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_results = (baseline or {}).get('results', {})
+    header = f"{'operation':<38}{'median ms':>12}{'p95 ms':>10}{'queries':>9}"
+    if baseline:
+        header += f"{'Δ median':>11}{'Δ queries':>11}"
+    print(header)
+    for name, result in results.items():
+        line = f"{name:<38}{result['median_ms']:>12.3f}{result['p95_ms']:>10.3f}{result['queries']:>9}"
+        previous = baseline_results.get(name)
+        if previous:
+            change = (result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100 if previous['median_ms'] else 0.0
+            line += f"{change:>+10.1f}%{result['queries'] - previous['queries']:>+11}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database to fill and benchmark (default: a temporary SQLite file).')
+    datagen.add_arguments(parser)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--fetch-latency', type=float, default=0.0,
+                        help='Seconds each mock platform API request takes (MOCK_FETCH_LATENCY_SECONDS).')
+    parser.add_argument('--sync-items', type=int, default=1000, help='Items the synthetic platform returns per sync.')
+    parser.add_argument('--normalize-items', type=int, default=1000, help='Raw items per normalize_page call.')
+    parser.add_argument('--due-reminders', type=int, default=200, help='Reminders due in each process_due_reminders run.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Earlier JSON results to compare against.')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['MOCK_FETCH_LATENCY_SECONDS'] = str(args.fetch_latency)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from app import create_app
+    from models import db, User
+
+    app = create_app()
+    # Measure our own code rather than API quotas or the resync throttle
+    app.config.update(PLATFORM_RATE_LIMITS={}, SYNC_MIN_INTERVAL_SECONDS=0, MOCK_FETCH_LATENCY_SECONDS=args.fetch_latency)
+    register_synthetic_fetcher(args.sync_items)
+
+    with app.app_context():
+        db.create_all()
+        dataset = datagen.populate_from_args(args)
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+        results = {}
+        for name, setup, run in build_operations(args, user_ids):
+            results[name] = run_operation(db.engine, setup, run, args.repeats, args.warmup)
+        dialect = db.engine.dialect.name
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform_module.python_version(),
+            'database': dialect,
+            'parameters': {key: value for key, value in vars(args).items()
+                           if key not in ('output', 'compare', 'database_url')}
+        },
+        'dataset': dataset,
+        'results': results
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline['meta'].get('commit')})")
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
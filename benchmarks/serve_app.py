@@ -0,0 +1,79 @@
+"""
+Serves create_app() in a production-style WSGI server for load tests, after creating the tables.
+
+    python benchmarks/serve_app.py --server gunicorn --port 8080 --workers 4 --threads 8
+
+--server auto picks gunicorn (multi-process, gthread workers), then waitress (threaded), whichever is
+installed, and falls back to Werkzeug's threaded server, which is only a stand-in for either.
+Configuration comes from the environment, as in production.
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = ('gunicorn', 'waitress', 'werkzeug')
+BACKGROUND_WORKER_FLAGS = ('JOB_WORKER_ENABLED', 'REMINDER_SCHEDULER_ENABLED', 'TOKEN_REFRESHER_ENABLED')
+
+
+def pick_server(requested='auto'):
+    if requested != 'auto':
+        return requested
+    if os.name == 'posix' and importlib.util.find_spec('gunicorn'):
+        return 'gunicorn'
+    if importlib.util.find_spec('waitress'):
+        return 'waitress'
+    return 'werkzeug'
+
+
+def create_tables():
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=('auto',) + SERVERS, default='auto')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2, help='Processes (gunicorn only).')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per process (gunicorn, waitress).')
+    parser.add_argument('--create-tables-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.create_tables_only:
+        create_tables()
+        return
+    server = pick_server(args.server)
+
+    # Tables first, in a short-lived process without the background workers: create_app() starts
+    # them, and they expect the tables to exist (and gunicorn workers would race to create them)
+    background_off = {name: 'false' for name in BACKGROUND_WORKER_FLAGS}
+    subprocess.run([sys.executable, __file__, '--create-tables-only'], env={**os.environ, **background_off}, check=True)
+
+    if server == 'gunicorn':
+        os.chdir(ROOT)
+        os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '--bind', f'{args.host}:{args.port}',
+                                  '--workers', str(args.workers), '--worker-class', 'gthread',
+                                  '--threads', str(args.threads), 'app:create_app()'])
+
+    from app import create_app
+    app = create_app()
+    print(f'--- LOADTEST: serving on http://{args.host}:{args.port} with {server} ---', flush=True)
+    if server == 'waitress':
+        import waitress
+        waitress.serve(app, host=args.host, port=args.port, threads=args.threads)
+    else:
+        from werkzeug.serving import make_server
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,30 +7,179 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-very-secret-key-for-dev'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica. When set, listing reads (content, reminders and their cache versions) are
+    # served from it; syncs, reminder processing and every write use the primary. Reads there lag the primary
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+
+    # Engine profile, picked per database URL. SQLite: pragmas set on every new connection; WAL lets
+    # listing reads run while a sync writes, and the busy timeout makes writers queue instead of failing
+    DB_SQLITE_JOURNAL_MODE = os.environ.get('DB_SQLITE_JOURNAL_MODE', 'WAL')
+    DB_SQLITE_SYNCHRONOUS = os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL') # Durable with WAL except on power loss
+    DB_SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT_MS', 5000))
+    DB_SQLITE_MMAP_SIZE = int(os.environ.get('DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)) # Bytes; 0 turns memory-mapped I/O off
+    DB_SQLITE_CACHE_SIZE = int(os.environ.get('DB_SQLITE_CACHE_SIZE', -64000)) # Negative: KiB of page cache per connection
+    # Server databases (PostgreSQL, MySQL): connection pool per process
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20)) # Extra connections allowed under bursts
+    DB_POOL_TIMEOUT_SECONDS = int(os.environ.get('DB_POOL_TIMEOUT_SECONDS', 30)) # Wait for a free connection
+    DB_POOL_RECYCLE_SECONDS = int(os.environ.get('DB_POOL_RECYCLE_SECONDS', 1800)) # Below the server's idle timeout
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true' # Drop connections the server closed
 
     # Placeholder for platform credentials - replace with actual values and secure storage
     PLATFORM_CREDS = {
         'youtube': {
             'client_id': os.environ.get('YOUTUBE_CLIENT_ID', 'mock_youtube_client_id'),
             'client_secret': os.environ.get('YOUTUBE_CLIENT_SECRET', 'mock_youtube_client_secret'),
-            'redirect_uri': 'http://localhost:5000/api/auth/oauth/youtube/callback'
+            'redirect_uri': 'http://localhost:5000/api/auth/oauth/youtube/callback',
+            'token_url': os.environ.get('YOUTUBE_TOKEN_URL') # Refresh endpoint; refreshes are mocked when unset
         },
         'twitter': { # Twitter API is now X API - requires different approach/pricing
             'client_id': os.environ.get('TWITTER_CLIENT_ID', 'mock_twitter_client_id'),
             'client_secret': os.environ.get('TWITTER_CLIENT_SECRET', 'mock_twitter_client_secret'),
-            'redirect_uri': 'http://localhost:5000/api/auth/oauth/twitter/callback'
+            'redirect_uri': 'http://localhost:5000/api/auth/oauth/twitter/callback',
+            'token_url': os.environ.get('TWITTER_TOKEN_URL') # Refresh endpoint; refreshes are mocked when unset
         },
         'reddit': {
             'client_id': os.environ.get('REDDIT_CLIENT_ID', 'mock_reddit_client_id'),
             'client_secret': os.environ.get('REDDIT_CLIENT_SECRET', 'mock_reddit_client_secret'),
-            'redirect_uri': 'http://localhost:5000/api/auth/oauth/reddit/callback'
+            'redirect_uri': 'http://localhost:5000/api/auth/oauth/reddit/callback',
+            'token_url': os.environ.get('REDDIT_TOKEN_URL') # Refresh endpoint; refreshes are mocked when unset
+        }
+    }
+
+    # API quotas per platform: requests_per_second/burst for the whole client and
+    # credential_requests_per_second/credential_burst per user token. Throttled requests are retried
+    # up to max_retries times; concurrency adapts between min_concurrency and SYNC_PLATFORM_CONCURRENCY.
+    PLATFORM_RATE_LIMITS = {
+        'youtube': {
+            'requests_per_second': float(os.environ.get('YOUTUBE_REQUESTS_PER_SECOND', 10)),
+            'burst': int(os.environ.get('YOUTUBE_BURST', 20)),
+            'credential_requests_per_second': float(os.environ.get('YOUTUBE_CREDENTIAL_REQUESTS_PER_SECOND', 2)),
+            'credential_burst': int(os.environ.get('YOUTUBE_CREDENTIAL_BURST', 5))
+        },
+        'twitter': {
+            'requests_per_second': float(os.environ.get('TWITTER_REQUESTS_PER_SECOND', 5)),
+            'burst': int(os.environ.get('TWITTER_BURST', 15)),
+            'credential_requests_per_second': float(os.environ.get('TWITTER_CREDENTIAL_REQUESTS_PER_SECOND', 1)),
+            'credential_burst': int(os.environ.get('TWITTER_CREDENTIAL_BURST', 5))
+        },
+        'reddit': { # 100 requests per minute per OAuth client
+            'requests_per_second': float(os.environ.get('REDDIT_REQUESTS_PER_SECOND', 1.6)),
+            'burst': int(os.environ.get('REDDIT_BURST', 10)),
+            'credential_requests_per_second': float(os.environ.get('REDDIT_CREDENTIAL_REQUESTS_PER_SECOND', 1)),
+            'credential_burst': int(os.environ.get('REDDIT_CREDENTIAL_BURST', 5))
         }
     }
 
+    # Access token lifecycle
+    # Background refresher in the web app. The sync worker commands (`flask run-job-worker` and
+    # `flask run-sync-workers`, one per host) run their own unless started with --no-token-refresher
+    TOKEN_REFRESHER_ENABLED = os.environ.get('TOKEN_REFRESHER_ENABLED', 'false').lower() == 'true'
+    TOKEN_REFRESH_INTERVAL_SECONDS = int(os.environ.get('TOKEN_REFRESH_INTERVAL_SECONDS', 60))
+    # Tokens expiring within this window are refreshed in the background, ahead of any sync needing them
+    TOKEN_REFRESH_LEEWAY_SECONDS = int(os.environ.get('TOKEN_REFRESH_LEEWAY_SECONDS', 300))
+    # A sync refreshes inline only if its token would expire within this many seconds
+    TOKEN_MIN_VALIDITY_SECONDS = int(os.environ.get('TOKEN_MIN_VALIDITY_SECONDS', 30))
+    TOKEN_REFRESH_BATCH_SIZE = int(os.environ.get('TOKEN_REFRESH_BATCH_SIZE', 500)) # Accounts refreshed per background pass
+    TOKEN_REQUEST_TIMEOUT_SECONDS = int(os.environ.get('TOKEN_REQUEST_TIMEOUT_SECONDS', 10))
+
+    # Full sync fan-out settings
+    SYNC_PARALLEL = os.environ.get('SYNC_PARALLEL', 'true').lower() == 'true'
+    SYNC_MAX_WORKERS = int(os.environ.get('SYNC_MAX_WORKERS', 16))
+    # Max concurrent syncs per platform, so one API's quota isn't hammered by the whole pool
+    SYNC_PLATFORM_CONCURRENCY = {
+        'youtube': int(os.environ.get('SYNC_YOUTUBE_CONCURRENCY', 4)),
+        'twitter': int(os.environ.get('SYNC_TWITTER_CONCURRENCY', 4)),
+        'reddit': int(os.environ.get('SYNC_REDDIT_CONCURRENCY', 4))
+    }
+
+    # An account synced within this many seconds isn't fetched again (unless a full resync is asked for);
+    # sync triggers inside the window get the last result back
+    SYNC_MIN_INTERVAL_SECONDS = int(os.environ.get('SYNC_MIN_INTERVAL_SECONDS', 60))
+    # Incremental syncs stop at the stored cursor, so edits to items synced earlier are only seen by a
+    # full resync; a sync runs as one when the account's last full resync is older than this (0: never)
+    SYNC_FULL_RESYNC_INTERVAL_SECONDS = int(os.environ.get('SYNC_FULL_RESYNC_INTERVAL_SECONDS', 86400))
+    # Every sync leases its account in the database, so job and shard workers in different processes
+    # never sync the same account at once; the lease is renewed as pages are saved
+    SYNC_ACCOUNT_LEASE_SECONDS = int(os.environ.get('SYNC_ACCOUNT_LEASE_SECONDS', 300))
+    SYNC_ACCOUNT_LEASE_RENEW_SECONDS = float(os.environ.get('SYNC_ACCOUNT_LEASE_RENEW_SECONDS', 60))
+
+    # Simulated network delay of each mock platform API request (benchmarks and load tests lower it)
+    MOCK_FETCH_LATENCY_SECONDS = float(os.environ.get('MOCK_FETCH_LATENCY_SECONDS', 1.0))
+    # Base URL of a mock platform API server (benchmarks/mock_platform_server.py). When set, the mock
+    # fetchers make real HTTP requests to it instead of sleeping, so load tests see its latency and errors
+    MOCK_PLATFORM_API_URL = os.environ.get('MOCK_PLATFORM_API_URL')
+
+    # Rows inserted (and committed) per chunk when saving synced content
+    SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', 500))
+
+    # Content listing page sizes
+    CONTENT_PAGE_SIZE = int(os.environ.get('CONTENT_PAGE_SIZE', 50))
+    CONTENT_MAX_PAGE_SIZE = int(os.environ.get('CONTENT_MAX_PAGE_SIZE', 500))
+    # Cache of serialized content listing pages
+    CONTENT_CACHE_ENABLED = os.environ.get('CONTENT_CACHE_ENABLED', 'true').lower() == 'true'
+    CONTENT_CACHE_MAX_ENTRIES = int(os.environ.get('CONTENT_CACHE_MAX_ENTRIES', 10000))
+    CONTENT_CACHE_TTL_SECONDS = int(os.environ.get('CONTENT_CACHE_TTL_SECONDS', 60))
+    CONTENT_CACHE_REDIS_URL = os.environ.get('CONTENT_CACHE_REDIS_URL') # Shares the cache between processes
+    # Full-text search backend: 'auto' (FTS5 on SQLite, tsvector on Postgres), 'sqlite_fts5', 'postgres_tsvector' or 'like'
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    # Rows fetched per round trip while streaming an export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Due reminders claimed, sent and committed per batch
+    REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+    # How long a processor may hold claimed reminders before another one may reclaim them
+    REMINDER_LEASE_SECONDS = int(os.environ.get('REMINDER_LEASE_SECONDS', 300))
+    # Identifies this processor in lease_owner; defaults to host:pid
+    REMINDER_WORKER_ID = os.environ.get('REMINDER_WORKER_ID')
+    # Run the in-process reminder timer inside the web app (or use `flask run-reminder-scheduler`)
+    REMINDER_SCHEDULER_ENABLED = os.environ.get('REMINDER_SCHEDULER_ENABLED', 'false').lower() == 'true'
+    # How far ahead the scheduler loads reminders into its timer
+    REMINDER_SCHEDULER_WINDOW_SECONDS = int(os.environ.get('REMINDER_SCHEDULER_WINDOW_SECONDS', 3600))
+    # Off (0) by default: the scheduler learns of new reminders from notify() in its own process and
+    # sees other processes' reminders at the next window reload. Set to poll for the earliest scheduled
+    # reminder this often instead, so a standalone scheduler fires them at most this late
+    REMINDER_SCHEDULER_PEEK_SECONDS = float(os.environ.get('REMINDER_SCHEDULER_PEEK_SECONDS', 0))
+
     # Mock email settings
-    MAIL_SERVER = 'smtp.mock.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'mock') # 'mock' logs emails, 'smtp' delivers them
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.mock.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME', 'mock_user')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', 'mock_password')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'reminders@mock.com')
     ADMINS = ['admin@mock.com']
+
+    # Email outbox delivery
+    MAIL_SENDER_WORKERS = int(os.environ.get('MAIL_SENDER_WORKERS', 4)) # Concurrent sender threads
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE', 4)) # Reusable SMTP connections
+    MAIL_MESSAGES_PER_CONNECTION = int(os.environ.get('MAIL_MESSAGES_PER_CONNECTION', 100))
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 200))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))
+    MAIL_RETRY_BASE_SECONDS = int(os.environ.get('MAIL_RETRY_BASE_SECONDS', 30)) # Doubled after each failed attempt
+    MAIL_LEASE_SECONDS = int(os.environ.get('MAIL_LEASE_SECONDS', 300))
+
+    # Background sync jobs
+    JOB_WORKER_ENABLED = os.environ.get('JOB_WORKER_ENABLED', 'false').lower() == 'true' # Run workers in the web app (or use `flask run-job-worker`)
+    JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4)) # Jobs run at once per worker process
+    JOB_WORKER_ID = os.environ.get('JOB_WORKER_ID') # Identifies this worker in lease_owner; defaults to host:pid
+    JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', 1.0)) # Idle wait between claims
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300)) # Renewed whenever a running sync reports progress
+    JOB_PROGRESS_INTERVAL_SECONDS = float(os.environ.get('JOB_PROGRESS_INTERVAL_SECONDS', 1.0))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RECLAIM_INTERVAL_SECONDS = float(os.environ.get('JOB_RECLAIM_INTERVAL_SECONDS', 30)) # How often workers requeue jobs of dead workers
+    JOB_RETRY_BASE_SECONDS = int(os.environ.get('JOB_RETRY_BASE_SECONDS', 30)) # Doubled after each failed attempt
+
+    # Sharded sync workers (`flask run-sync-workers`): each process keeps the accounts with
+    # user_id % shard count == its shard synced, re-syncing each one SYNC_SHARD_INTERVAL_SECONDS after the last
+    SYNC_SHARD_INTERVAL_SECONDS = int(os.environ.get('SYNC_SHARD_INTERVAL_SECONDS', 900))
+    SYNC_SHARD_CONCURRENCY = int(os.environ.get('SYNC_SHARD_CONCURRENCY', 4)) # Accounts synced at once per shard process
+    SYNC_SHARD_POLL_SECONDS = float(os.environ.get('SYNC_SHARD_POLL_SECONDS', 5.0)) # Idle wait when nothing is due
+    SYNC_SHARD_RETRY_SECONDS = int(os.environ.get('SYNC_SHARD_RETRY_SECONDS', 300)) # Back-off after a failed account sync
+    SYNC_SHARD_WORKER_ID = os.environ.get('SYNC_SHARD_WORKER_ID') # Identifies shard processes in account lease owners; defaults to host
+
+    # Observability
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text') # 'text' (key=value fields) or 'json' (one object per line)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true' # Request/SQL timings and /metrics
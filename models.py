@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from utils.db_engine import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Routes read_from_replica calls to the replica bind
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,6 +10,10 @@ class User(db.Model):
     # In a real app, store password hashes, not plain text
     # password_hash = db.Column(db.String(128))
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever the user's saved content changes; cached listings keyed on an older value stop matching
+    content_version = db.Column(db.Integer, default=0, nullable=False)
+    # Same for the user's reminders (created, sent, failed or reclaimed)
+    reminder_version = db.Column(db.Integer, default=0, nullable=False)
 
     platform_accounts = db.relationship('PlatformAccount', backref='user', lazy='dynamic')
     saved_content = db.relationship('SavedContent', backref='user', lazy='dynamic')
@@ -26,7 +31,22 @@ class PlatformAccount(db.Model):
     refresh_token = db.Column(db.String(256)) # May not exist for all platforms
     expires_at = db.Column(db.DateTime) # Token expiration time
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'platform', name='_user_platform_uc'),)
+    # Incremental sync state
+    sync_cursor = db.Column(db.String(256)) # original_id of the newest item seen; the next sync stops there
+    last_published_at = db.Column(db.DateTime) # Newest original_published_at seen so far
+    last_synced_at = db.Column(db.DateTime) # When the last successful sync finished
+    last_full_synced_at = db.Column(db.DateTime) # When the last complete full resync finished; see SYNC_FULL_RESYNC_INTERVAL_SECONDS
+    # Held by whichever worker is syncing the account (see DataAggregatorService.sync_user_platform);
+    # a failed shard sync keeps the expiry without an owner, which delays the shard's retry
+    sync_lease_owner = db.Column(db.String(100))
+    sync_lease_expires_at = db.Column(db.DateTime)
+
+    # The unique index leads with user_id, so it also serves lookups by user_id alone
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'platform', name='_user_platform_uc'),
+        db.Index('ix_platform_account_expires_at', 'expires_at'), # Background token refresh scans by expiry
+        db.Index('ix_platform_account_last_synced_at', 'last_synced_at'), # Shard workers pick the stalest accounts
+    )
 
     def __repr__(self):
         return f'<PlatformAccount {self.user.email} - {self.platform}>'
@@ -42,10 +62,18 @@ class SavedContent(db.Model):
     content_type = db.Column(db.String(50)) # e.g., 'video', 'tweet', 'post'
     saved_at = db.Column(db.DateTime, default=datetime.utcnow)
     original_published_at = db.Column(db.DateTime) # Original creation time
+    # Fingerprint of the normalized content columns (utils.normalization.content_hash); syncs rewrite a row
+    # only when it changes. NULL for rows saved before hashing, which the next sync that sees them fills in.
+    content_hash = db.Column(db.String(16))
 
     # Add more fields as needed for normalization (e.g., author, thumbnail, etc.)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'platform', 'original_id', name='_user_platform_content_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'platform', 'original_id', name='_user_platform_content_uc'),
+        # Content listing: filter by user (and optionally platform), newest first, keyset on (saved_at, id)
+        db.Index('ix_saved_content_user_saved_at', 'user_id', 'saved_at', 'id'),
+        db.Index('ix_saved_content_user_platform_saved_at', 'user_id', 'platform', 'saved_at', 'id'),
+    )
 
     def __repr__(self):
         return f'<SavedContent "{self.title}" from {self.platform}>'
@@ -56,9 +84,98 @@ class Reminder(db.Model):
     content_id = db.Column(db.Integer, db.ForeignKey('saved_content.id'), nullable=False)
     reminder_time = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='scheduled') # 'scheduled', 'sent', 'cancelled'
+    status = db.Column(db.String(20), default='scheduled') # 'scheduled', 'processing', 'sent', 'cancelled', 'error'
+    # Set while a processor holds the reminder in 'processing'; an expired lease can be reclaimed
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
 
     content = db.relationship('SavedContent', backref='reminders')
 
+    __table_args__ = (
+        # Due-reminder scan; partial so sent/cancelled history doesn't bloat it
+        db.Index('ix_reminder_scheduled_time', 'reminder_time',
+                 sqlite_where=db.text("status = 'scheduled'"),
+                 postgresql_where=db.text("status = 'scheduled'")),
+        # Stale-lease reclaim scan
+        db.Index('ix_reminder_processing_lease', 'lease_expires_at',
+                 sqlite_where=db.text("status = 'processing'"),
+                 postgresql_where=db.text("status = 'processing'")),
+        # Per-user listing ordered by reminder_time
+        db.Index('ix_reminder_user_time', 'user_id', 'reminder_time'),
+    )
+
     def __repr__(self):
         return f'<Reminder for content {self.content_id} at {self.reminder_time}>'
+
+class EmailOutbox(db.Model):
+    """Emails waiting to be delivered. Written in the same transaction as the change that caused them."""
+    id = db.Column(db.Integer, primary_key=True)
+    reminder_id = db.Column(db.Integer, db.ForeignKey('reminder.id')) # Set for reminder emails
+    to_address = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending') # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow) # Pushed back after a failed attempt
+    last_error = db.Column(db.Text)
+    # Set while a sender holds the message in 'sending'; an expired lease can be reclaimed
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_pending', 'next_attempt_at',
+                 sqlite_where=db.text("status = 'pending'"),
+                 postgresql_where=db.text("status = 'pending'")),
+        db.Index('ix_email_outbox_sending_lease', 'lease_expires_at',
+                 sqlite_where=db.text("status = 'sending'"),
+                 postgresql_where=db.text("status = 'sending'")),
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} to {self.to_address} ({self.status})>'
+
+class SyncJob(db.Model):
+    """
+    A queued sync, run by a job worker. A 'platform' job syncs one user's account on one platform;
+    a 'full' job fans out one platform job (parent_id = its id) per linked account.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default='platform') # 'platform' or 'full'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id')) # Not set for 'full' jobs
+    platform = db.Column(db.String(50))
+    full_resync = db.Column(db.Boolean, nullable=False, default=False) # Ignore the account's sync cursor
+    parent_id = db.Column(db.Integer, db.ForeignKey('sync_job.id'))
+    status = db.Column(db.String(20), nullable=False, default='queued') # 'queued', 'running', 'succeeded', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow) # Pushed back after a failed attempt
+    # Set while a worker holds the job in 'running'; renewed as the sync makes progress
+    lease_owner = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)
+    # Progress, updated while the job runs
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    items_added = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text) # JSON stats of the finished run
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_sync_job_queued', 'next_attempt_at',
+                 sqlite_where=db.text("status = 'queued'"),
+                 postgresql_where=db.text("status = 'queued'")),
+        db.Index('ix_sync_job_running_lease', 'lease_expires_at',
+                 sqlite_where=db.text("status = 'running'"),
+                 postgresql_where=db.text("status = 'running'")),
+        db.Index('ix_sync_job_parent_status', 'parent_id', 'status'), # Progress of a full sync's children
+        # At most one queued or running sync per account; later triggers join that job (once a running
+        # job's lease has expired, it is requeued before anything joins it)
+        db.Index('ux_sync_job_active_account', 'user_id', 'platform', unique=True,
+                 sqlite_where=db.text("kind = 'platform' AND status IN ('queued', 'running')"),
+                 postgresql_where=db.text("kind = 'platform' AND status IN ('queued', 'running')")),
+    )
+
+    def __repr__(self):
+        return f'<SyncJob {self.id} {self.kind} {self.platform or ""} ({self.status})>'
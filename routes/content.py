@@ -1,18 +1,39 @@
-from flask import Blueprint, request, jsonify
-from services.data_aggregator_service import DataAggregatorService
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, url_for
+from services.data_aggregator_service import (DataAggregatorService, CONTENT_FIELDS, decode_content_cursor,
+                                              encode_content_cursor, resolve_content_fields)
+from services.platform_fetchers import supported_platforms
+from services.search_service import SearchService
+from services.sync_job_service import SyncJobService
+from utils.cache import get_app_cache
+from datetime import datetime
+from functools import wraps
+import csv
+import hashlib
+import io
+import json
+import logging
+import zlib
 # from services.auth_service import AuthService # Might need this later for token validation
 
+logger = logging.getLogger(__name__)
+
 content_bp = Blueprint('content', __name__, url_prefix='/api/content')
 data_aggregator_service = DataAggregatorService()
+search_service = SearchService()
+sync_job_service = SyncJobService()
+
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_CHUNK_SIZE = 64 * 1024 # Bytes buffered before a chunk is sent
 # auth_service = AuthService() # For authentication
 
 # Middleware/Decorator for authentication (placeholder)
 def require_auth(f):
     # In a real app, this would check for a valid token/session in the request headers/cookies
     # and lookup the user. For this demo, we'll just require a 'user_id' in the body/args.
-    # @wraps(f)
+    @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_id = request.json.get('user_id') if request.json else request.args.get('user_id')
+        data = request.get_json(silent=True) # GET requests carry no JSON body
+        user_id = data.get('user_id') if data else request.args.get('user_id')
         if not user_id:
             return jsonify({'error': 'Authentication required: user_id missing'}), 401
         # In a real app, lookup user by token and pass user object or user_id
@@ -21,53 +42,228 @@ def require_auth(f):
     return decorated_function
 
 
-@content_bp.route('/', methods=['POST']) # Use POST to get user_id from body
+def make_listing_etag(kind, user_id, versions, params):
+    """Builds the ETag for a listing from the user's change counters and the request parameters."""
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True).encode(), digest_size=8).hexdigest()
+    return f"{kind}-{user_id}-{'-'.join(str(version) for version in versions)}-{digest}"
+
+def not_modified(etag):
+    """Returns a 304 response if the client's If-None-Match already holds `etag`, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+@content_bp.route('/', methods=['GET', 'POST']) # POST takes user_id from the body, GET from the query string
 @require_auth
 def get_user_content(user_id):
-    platform = request.json.get('platform') # Optional filter
-    content_list = data_aggregator_service.get_user_content(user_id, platform)
-
-    # Serialize the content list to JSON
-    content_data = []
-    for item in content_list:
-        content_data.append({
-            'id': item.id,
-            'platform': item.platform,
-            'original_id': item.original_id,
-            'title': item.title,
-            'url': item.url,
-            'description': item.description,
-            'content_type': item.content_type,
-            'saved_at': item.saved_at.isoformat(),
-            'original_published_at': item.original_published_at.isoformat() if item.original_published_at else None
-        })
-
-    return jsonify(content_data), 200
+    data = request.get_json(silent=True) or request.args.to_dict()
+    fields = data.get('fields') # Optional list of columns to return
+    if isinstance(fields, str):
+        fields = [field for field in fields.split(',') if field] # ?fields=id,title
+
+    try:
+        limit = int(data.get('limit', current_app.config['CONTENT_PAGE_SIZE']))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, current_app.config['CONTENT_MAX_PAGE_SIZE']))
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(field, str) for field in fields)):
+        return jsonify({'error': 'fields must be a list of field names'}), 400
+
+    # Everything is validated and normalized before the ETag and cache key are built from it,
+    # so a bad request gets its 400 rather than a 304 or a cached page
+    platform, error = _platform_filter(data)
+    if error:
+        return error
+    cursor = data.get('cursor') or None # next_cursor from the previous page
+    try:
+        fields = resolve_content_fields(fields)
+        if cursor is not None:
+            cursor = encode_content_cursor(*decode_content_cursor(cursor))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The user's content version changes whenever a sync adds rows, so an unchanged
+    # refresh is answered with 304 after a single primary-key lookup
+    version = data_aggregator_service.get_content_version(user_id)
+    etag = None
+    if version is not None:
+        etag = make_listing_etag('content', user_id, [version], [platform, cursor, limit, fields])
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+    # Pages are cached already serialized, keyed on the same version, so stale pages simply stop matching
+    cache = get_app_cache(current_app, 'content') if current_app.config['CONTENT_CACHE_ENABLED'] else None
+    cache_key = None
+    if cache is not None:
+        cache_key = json.dumps([user_id, version, platform, cursor, limit, fields])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _listing_response(cached, etag)
+
+    rows, next_cursor = data_aggregator_service.get_user_content_page(
+        user_id, platform, limit=limit, cursor=cursor, fields=fields)
+
+    # Serialize the content page to JSON
+    content_data = [serialize_content_row(row) for row in rows]
+    body = json.dumps({'items': content_data, 'next_cursor': next_cursor})
+    if cache_key is not None:
+        cache.set(cache_key, body)
+
+    return _listing_response(body, etag)
+
+def _platform_filter(data):
+    """Returns (platform filter or None, None), or (None, 400 response) for a platform we don't sync."""
+    platform = data.get('platform') or None
+    if platform is not None and (not isinstance(platform, str) or platform not in supported_platforms()):
+        return None, (jsonify({'error': f'Unsupported platform: {platform}'}), 400)
+    return platform, None
+
+def _listing_response(body, etag):
+    response = Response(body, status=200, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+    return response
+
+@content_bp.route('/cache/stats', methods=['GET'])
+def content_cache_stats():
+    """Hit/miss counters for the content listing cache."""
+    return jsonify(get_app_cache(current_app, 'content').stats()), 200
+
+def serialize_content_row(row):
+    """Converts a projected content row to JSON-safe values (datetimes become ISO strings)."""
+    return {field: value.isoformat() if isinstance(value, datetime) else value
+            for field, value in row.items()}
+
+@content_bp.route('/search', methods=['POST'])
+@require_auth
+def search_user_content(user_id):
+    """Ranked full-text search over the user's saved titles and descriptions, paginated by offset."""
+    data = request.json
+    query = data.get('q')
+    if not query or not isinstance(query, str):
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = int(data.get('limit', current_app.config['CONTENT_PAGE_SIZE']))
+        offset = int(data.get('offset', 0))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    limit = max(1, min(limit, current_app.config['CONTENT_MAX_PAGE_SIZE']))
+    offset = max(0, offset)
+
+    rows, has_more = search_service.search(user_id, query, data.get('platform'), limit=limit, offset=offset)
+    return jsonify({
+        'items': [serialize_content_row(row._mapping) for row in rows],
+        'next_offset': offset + limit if has_more else None
+    }), 200
+
+@content_bp.route('/export', methods=['POST'])
+@require_auth
+def export_user_content(user_id):
+    """Streams the user's whole library as NDJSON or CSV, optionally gzip-compressed."""
+    data = request.json
+    export_format = data.get('format', 'ndjson')
+    platform, error = _platform_filter(data)
+    if error:
+        return error
+    fields = data.get('fields') or list(CONTENT_FIELDS)
+    use_gzip = bool(data.get('gzip', False))
+
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        return jsonify({'error': 'fields must be a list of field names'}), 400
+
+    try:
+        rows = data_aggregator_service.iter_user_content(
+            user_id, platform, fields=fields,
+            batch_size=current_app.config['EXPORT_BATCH_SIZE'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    chunks = _export_chunks(rows, export_format, fields)
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+
+    headers = {'Content-Disposition': f'attachment; filename=saved_content.{export_format}'}
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    # stream_with_context keeps the request (and its DB session) alive while the body is generated
+    return Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[export_format], headers=headers)
+
+def _export_chunks(rows, export_format, fields):
+    """Serializes rows into text chunks of roughly EXPORT_CHUNK_SIZE bytes."""
+    buffer = io.StringIO()
+    csv_writer = None
+    if export_format == 'csv':
+        csv_writer = csv.writer(buffer)
+        csv_writer.writerow(fields)
+
+    for row in rows:
+        row = serialize_content_row(row)
+        if csv_writer:
+            csv_writer.writerow([row[field] for field in fields])
+        else:
+            buffer.write(json.dumps(row))
+            buffer.write('\n')
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _gzip_chunks(chunks):
+    """Incrementally gzip-compresses a stream of byte chunks."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
 
 @content_bp.route('/sync/<platform>', methods=['POST'])
 @require_auth
 def sync_platform(user_id, platform):
-    # In a real app, this would typically just *trigger* a background job
-    # not perform the sync synchronously within the request handler.
+    # Only queues the sync; a job worker runs it. Poll the returned status_url for progress.
     # user_id is passed by require_auth decorator
 
-    supported_platforms = ['youtube', 'twitter', 'reddit']
-    if platform not in supported_platforms:
+    if platform not in supported_platforms():
          return jsonify({'error': f'Unsupported platform: {platform}'}), 400
+    if not data_aggregator_service.has_linked_account(user_id, platform):
+        return jsonify({'error': f'No {platform} account linked for user {user_id}'}), 400
 
-    print(f"--- API: Received manual sync request for user {user_id}, platform {platform} ---")
-    success = data_aggregator_service.sync_user_platform(user_id, platform) # Sync directly for demo
+    data = request.get_json(silent=True) or {}
+    logger.info('sync requested', extra={'user_id': user_id, 'platform': platform})
+    job, coalesced = sync_job_service.enqueue_platform_sync(user_id, platform, full=bool(data.get('full')))
+    if coalesced:
+        # Already queued, running, or finished moments ago: hand back that job rather than sync again
+        return _job_accepted(job, f'Sync of {platform} for user {user_id} joined job {job.id}', coalesced=True)
+    return _job_accepted(job, f'Sync of {platform} queued for user {user_id}')
 
-    if success:
-        return jsonify({'message': f'Manual sync triggered for {platform} for user {user_id} (mock - ran synchronously)'}), 200
-    else:
-        return jsonify({'error': f'Failed to trigger sync for {platform} for user {user_id}. Check if account is linked.'}), 400
-
-# Endpoint to trigger the *mock* full background sync process manually
+# Endpoint to trigger the full sync of every linked account
 @content_bp.route('/sync/all', methods=['POST'])
 def trigger_full_sync():
-     # WARNING: Running this synchronously in a real app will block the server!
-     # This is only for demonstration purposes to show the mock scheduler function.
-     print("--- API: Received request to trigger mock full sync ---")
-     data_aggregator_service.schedule_full_sync()
-     return jsonify({'message': 'Mock full sync process triggered (ran synchronously)'}), 200
+     # Queues one job that fans out a platform job per linked account; job workers run them
+     logger.info('full sync requested')
+     job = sync_job_service.enqueue_full_sync()
+     return _job_accepted(job, 'Full sync queued')
+
+@content_bp.route('/sync/jobs/<int:job_id>', methods=['GET'])
+def sync_job_status(job_id):
+    status = sync_job_service.get_job_status(job_id)
+    # A user's sync jobs are only visible to that user; full syncs, like /sync/all, to anyone
+    user_id = request.args.get('user_id', type=int)
+    if status is None or (status['user_id'] is not None and status['user_id'] != user_id):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status), 200
+
+def _job_accepted(job, message, coalesced=False):
+    response = jsonify({'message': message, 'job_id': job.id, 'status': job.status, 'coalesced': coalesced,
+                        'status_url': url_for('content.sync_job_status', job_id=job.id, user_id=job.user_id)})
+    response.headers['Location'] = response.json['status_url']
+    # A job that already finished needs no polling; its status_url has the result
+    return response, 200 if job.status in ('succeeded', 'failed') else 202
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from services.reminder_service import ReminderService
 # from services.auth_service import AuthService # Might need this later for token validation
-from routes.content import require_auth # Use the auth decorator
+from routes.content import require_auth, make_listing_etag, not_modified # Use the auth decorator
+import logging
+
+logger = logging.getLogger(__name__)
 
 reminders_bp = Blueprint('reminders', __name__, url_prefix='/api/reminders')
 reminder_service = ReminderService()
@@ -32,9 +35,18 @@ def create_reminder(user_id):
     else:
         return jsonify({'error': 'Failed to create reminder. Content not found or time invalid.'}), 400
 
-@reminders_bp.route('/', methods=['POST']) # Use POST to get user_id from body
+# GET, since POST on this URL creates a reminder; user_id comes from the query string
+@reminders_bp.route('/', methods=['GET'])
 @require_auth
 def get_user_reminders(user_id):
+    # Answer an unchanged refresh with 304 before any reminders are loaded
+    versions = reminder_service.get_listing_versions(user_id)
+    etag = make_listing_etag('reminders', user_id, versions, []) if versions else None
+    if etag:
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
     reminders = reminder_service.get_user_reminders(user_id)
 
     reminders_data = []
@@ -51,13 +63,18 @@ def get_user_reminders(user_id):
             'content_platform': r.content.platform if r.content else None,
         })
 
-    return jsonify(reminders_data), 200
+    response = jsonify(reminders_data)
+    if etag:
+        response.set_etag(etag)
+    return response, 200
 
 # Endpoint to trigger the *mock* reminder processing manually
 @reminders_bp.route('/process-due', methods=['POST'])
 def trigger_process_reminders():
      # WARNING: Running this synchronously in a real app will block the server!
      # This is only for demonstration purposes.
-     print("--- API: Received request to trigger mock reminder processing ---")
-     reminder_service.process_due_reminders()
-     return jsonify({'message': 'Mock reminder processing triggered (ran synchronously)'}), 200
+     logger.info('reminder processing requested')
+     stats = reminder_service.process_due_reminders()
+     email_stats = reminder_service.outbox.dispatch_pending()
+     return jsonify({'message': 'Mock reminder processing triggered (ran synchronously)',
+                     'stats': stats, 'email_stats': email_stats}), 200
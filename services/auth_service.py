@@ -1,8 +1,12 @@
 from models import db, User, PlatformAccount
 from config import Config
+from services.token_manager import token_manager
 from flask import redirect, url_for, request # Needed for real OAuth flow, mocked here
+import logging
 import uuid # To generate mock tokens
 
+logger = logging.getLogger(__name__)
+
 class AuthService:
     def register_user(self, email):
         if User.query.filter_by(email=email).first():
@@ -31,7 +35,7 @@ class AuthService:
         # In reality, you'd build a complex authorization URL
         # with client_id, redirect_uri, scope, state, etc.
         mock_auth_url = f"http://mock-oauth.com/auth?client_id={creds['client_id']}&redirect_uri={creds['redirect_uri']}&state={user_id}-{platform}"
-        print(f"--- MOCK: Redirecting user {user_id} to {mock_auth_url} for {platform} OAuth ---")
+        logger.debug('mock OAuth redirect', extra={'user_id': user_id, 'platform': platform, 'auth_url': mock_auth_url})
         # For a real app, you'd return Flask's redirect(mock_auth_url)
         return mock_auth_url # Returning URL string for demonstration
 
@@ -39,7 +43,7 @@ class AuthService:
         """Mocks handling the OAuth callback and exchanging code for tokens."""
         # In reality, you'd make a POST request to the platform's token endpoint
         # with the authorization 'code', client_id, client_secret, redirect_uri, etc.
-        print(f"--- MOCK: Handling callback for user {user_id}, platform {platform} with code {code} ---")
+        logger.debug('mock OAuth callback', extra={'user_id': user_id, 'platform': platform})
 
         # Mock receiving tokens
         mock_access_token = f"mock_access_token_{uuid.uuid4()}"
@@ -49,28 +53,35 @@ class AuthService:
         mock_expires_at = datetime.utcnow() + timedelta(hours=1)
 
         # Save tokens to the database
+        account = self.store_tokens(user_id, platform, mock_access_token, mock_refresh_token, mock_expires_at)
+        token_manager.prime(account) # Syncs can use the new token without re-reading it
+
+        return True # Indicate success (in a real app, handle errors)
+
+    def store_tokens(self, user_id, platform, access_token, refresh_token, expires_at):
+        """Saves tokens for a user's platform account, linking the account if needed. Returns the account."""
         account = PlatformAccount.query.filter_by(user_id=user_id, platform=platform).first()
         if account:
             # Update existing tokens
-            account.access_token = mock_access_token
-            account.refresh_token = mock_refresh_token
-            account.expires_at = mock_expires_at
-            print(f"--- MOCK: Updated tokens for user {user_id}, platform {platform} ---")
+            account.access_token = access_token
+            if refresh_token: # Some platforms only issue a refresh token once
+                account.refresh_token = refresh_token
+            account.expires_at = expires_at
+            logger.info('updated platform tokens', extra={'user_id': user_id, 'platform': platform})
         else:
             # Create new account link
-            new_account = PlatformAccount(
+            account = PlatformAccount(
                 user_id=user_id,
                 platform=platform,
-                access_token=mock_access_token,
-                refresh_token=mock_refresh_token,
-                expires_at=mock_expires_at
+                access_token=access_token,
+                refresh_token=refresh_token,
+                expires_at=expires_at
             )
-            db.session.add(new_account)
-            print(f"--- MOCK: Linked new account for user {user_id}, platform {platform} ---")
+            db.session.add(account)
+            logger.info('linked platform account', extra={'user_id': user_id, 'platform': platform})
 
         db.session.commit()
-
-        return True # Indicate success (in a real app, handle errors)
+        return account
 
     def get_user_linked_platforms(self, user_id):
         """Gets platforms linked by a user."""
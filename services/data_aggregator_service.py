@@ -1,158 +1,597 @@
 from models import db, User, PlatformAccount, SavedContent
-from datetime import datetime
-import time # For mock delay
+from flask import current_app
+from services.token_manager import TokenRefreshError, token_manager
+from services.platform_fetchers import get_fetcher, supported_platforms
+from utils.db_engine import read_from_replica
+from utils.metrics import metrics
+from utils.normalization import content_hash
+from utils.rate_limiter import get_rate_limiter
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import base64
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SYNC_JOB_BATCH_SIZE = 500 # Accounts read per query while streaming sync jobs
+MAX_REPORTED_FAILURES = 100 # Cap on failure details kept in a run summary
+# Columns a client may request from the content listing
+CONTENT_FIELDS = ('id', 'platform', 'original_id', 'title', 'url', 'description',
+                  'content_type', 'saved_at', 'original_published_at')
+
+# Outcome of saving one page of synced rows
+PageWrite = namedtuple('PageWrite', ['inserted', 'updated', 'unchanged', 'all_stored'])
+
+# fetch: waiting for platform pages (rate limits included), normalize: mapping them to rows, persist: writing them
+SYNC_STAGES = ('fetch', 'normalize', 'persist')
+SYNCS = metrics.counter('syncs_total', 'Account syncs run, by mode (full, incremental, skipped, in_progress).',
+                        ('platform', 'mode'))
+SYNC_SECONDS = metrics.histogram('sync_duration_seconds', 'Account sync wall time.', ('platform',))
+SYNC_STAGE_SECONDS = metrics.histogram('sync_stage_duration_seconds', 'Time each account sync spends per stage.',
+                                       ('platform', 'stage'))
+SYNC_ITEMS = metrics.counter('sync_items_total', 'Synced items, by what was written (added, updated, unchanged).',
+                             ('platform', 'result'))
+
+# (user_id, platform) -> the sync running for it in this process; see sync_user_platform
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+class AccountSyncInProgress(Exception):
+    """Raised for a full resync of an account that another worker is syncing right now."""
+
+
+class AccountLeaseLost(Exception):
+    """Raised inside a sync whose account lease expired and was taken over by another worker."""
+
+
+class CoalescedSyncFailed(Exception):
+    """Raised to callers that joined another caller's sync of the account when that sync failed."""
+
+
+class _SyncFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None # Set when the sync failed in a way that any caller's sync would have
+        self.retry = False # Set when it failed for reasons of its caller's own, e.g. a lost lease
 
 class DataAggregatorService:
 
-    def _fetch_youtube_content(self, access_token):
-        """Mocks fetching saved YouTube content."""
-        print(f"--- MOCK: Calling YouTube API with token: {access_token[:10]}... ---")
-        # In a real app, use google-api-python-client to fetch saved/liked videos
-        time.sleep(1) # Simulate network delay
-        # Return mock data
-        return [
-            {'id': 'video1', 'title': 'Mock YouTube Video 1', 'url': 'http://youtube.com/watch?v=video1', 'publishedAt': '2023-10-26T10:00:00Z'},
-            {'id': 'video2', 'title': 'Mock YouTube Video 2', 'url': 'http://youtube.com/watch?v=video2', 'publishedAt': '2023-10-25T15:30:00Z'}
-        ]
-
-    def _fetch_twitter_content(self, access_token):
-        """Mocks fetching saved Twitter content (e.g., liked tweets)."""
-        print(f"--- MOCK: Calling Twitter (X) API with token: {access_token[:10]}... ---")
-         # In a real app, use tweepy or similar
-        time.sleep(1) # Simulate network delay
-        # Return mock data
-        return [
-            {'id': 'tweet1', 'text': 'Mock Tweet 1', 'url': 'http://twitter.com/user/status/tweet1', 'created_at': 'Wed Oct 25 20:00:00 +0000 2023'},
-            {'id': 'tweet2', 'text': 'Mock Tweet 2', 'url': 'http://twitter.com/user/status/tweet2', 'created_at': 'Wed Oct 25 21:00:00 +0000 2023'}
-        ]
-
-    def _fetch_reddit_content(self, access_token):
-        """Mocks fetching saved Reddit content."""
-        print(f"--- MOCK: Calling Reddit API with token: {access_token[:10]}... ---")
-         # In a real app, use PRAW (Python Reddit API Wrapper)
-        time.sleep(1) # Simulate network delay
-        # Return mock data
-        return [
-            {'id': 'post1', 'title': 'Mock Reddit Post 1', 'url': 'http://reddit.com/r/subreddit/comments/post1', 'created_utc': 1698345600}, # UTC timestamp
-            {'id': 'post2', 'title': 'Mock Reddit Post 2', 'url': 'http://reddit.com/r/subreddit/comments/post2', 'created_utc': 1698349200}
-        ]
-
-    def _normalize_content(self, platform, raw_data):
-        """Mocks normalizing data from different platforms into a common schema."""
-        normalized_list = []
-        for item in raw_data:
-            normalized_item = {
-                'platform': platform,
-                'original_id': str(item.get('id')), # Ensure string
-                'title': None,
-                'url': item.get('url'),
-                'description': None,
-                'content_type': None,
-                'original_published_at': None
-            }
+    def _call_platform_api(self, platform, access_token, request):
+        """
+        Makes one platform API request through the platform's shared rate limiter, which waits for
+        quota, caps concurrency and retries throttled requests. A real request raises
+        RateLimitedError.from_headers(response.headers) on HTTP 429 and passes the headers of
+        successful responses to limiter.observe(access_token, headers).
+        """
+        limiter = get_rate_limiter(current_app._get_current_object(), platform)
+        return limiter.call(access_token, request)
 
-            if platform == 'youtube':
-                normalized_item['title'] = item.get('title')
-                normalized_item['content_type'] = 'video'
-                # Parse ISO 8601 string
-                try:
-                    normalized_item['original_published_at'] = datetime.strptime(item.get('publishedAt'), '%Y-%m-%dT%H:%M:%S%fZ')
-                except (ValueError, TypeError):
-                    pass # Handle parsing errors
-                # YouTube API might need more logic to get full URL or description easily depending on endpoint
-
-            elif platform == 'twitter':
-                normalized_item['title'] = item.get('text') # Use text as title
-                normalized_item['description'] = item.get('text')
-                normalized_item['content_type'] = 'tweet'
-                 # Parse Twitter date format: "Wed Oct 25 20:00:00 +0000 2023"
-                try:
-                     normalized_item['original_published_at'] = datetime.strptime(item.get('created_at'), '%a %b %d %H:%M:%S +0000 %Y')
-                except (ValueError, TypeError):
-                    pass
-
-            elif platform == 'reddit':
-                normalized_item['title'] = item.get('title')
-                normalized_item['content_type'] = 'post'
-                normalized_item['url'] = item.get('url') # Can be link or permalink
-                # Handle timestamp (UTC)
+    def sync_user_platform(self, user_id, platform, full=False, progress=None, lease_owner=None):
+        """
+        Syncs saved content for a specific user and platform.
+        Only items newer than the account's sync cursor are fetched unless `full` is set, or the
+        account's last full resync is older than SYNC_FULL_RESYNC_INTERVAL_SECONDS; only full
+        resyncs see edits to items synced earlier (content hashes keep them to changed rows).
+        The platform's fetcher yields pages, and each page is normalized and saved before the next
+        one is requested, so memory stays bounded by the page size however large the library is.
+        `progress(pages, items_added)` is called after each saved page.
+        A call made while the same account is already syncing in this process waits for that sync
+        and returns its result (marked 'coalesced') instead of fetching everything again, calling
+        `progress(0, 0)` every SYNC_ACCOUNT_LEASE_RENEW_SECONDS meanwhile. A full sync only joins one
+        that turns out full; if that sync fails, joined callers get CoalescedSyncFailed, or run their
+        own sync when it failed on something of its caller's (a lost lease, an error from `progress`).
+        Across processes, the sync holds the account's lease (PlatformAccount.sync_lease_*), renewed
+        as pages are saved; a caller that already leased the account passes its `lease_owner`. If
+        another worker holds the lease, an incremental sync returns at once with mode 'in_progress'
+        and a full one raises AccountSyncInProgress. AccountLeaseLost is raised if the lease is lost.
+        Returns a stats dict, or None if the platform is unsupported, no account is linked or no
+        access token could be obtained.
+        """
+        key = (user_id, platform)
+        while True:
+            with _in_flight_lock:
+                flight = _in_flight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _in_flight[key] = _SyncFlight()
+            if leader:
+                break
+            self._wait_for_flight(flight, progress)
+            if flight.error is not None:
+                raise CoalescedSyncFailed(f'{platform} sync of user {user_id} failed: {flight.error!r}') from flight.error
+            if not flight.retry and (not full or flight.result is None or flight.result['mode'] == 'full'):
+                return dict(flight.result, coalesced=True) if flight.result else flight.result
+            # That sync didn't cover ours, or failed for its caller's own reasons: run ours once it's done
+
+        def leader_progress(pages, items_added):
+            if progress is not None:
                 try:
-                    normalized_item['original_published_at'] = datetime.utcfromtimestamp(item.get('created_utc'))
-                except (ValueError, TypeError):
-                     pass
-                # Description might need fetching post content
+                    progress(pages, items_added)
+                except BaseException:
+                    flight.retry = True
+                    raise
 
-            normalized_list.append(normalized_item)
-        return normalized_list
+        try:
+            flight.result = self._sync_user_platform(user_id, platform, full, leader_progress, lease_owner)
+            return flight.result
+        except (AccountLeaseLost, AccountSyncInProgress):
+            flight.retry = True
+            raise
+        except BaseException as e:
+            if not flight.retry:
+                flight.error = e
+            raise
+        finally:
+            with _in_flight_lock:
+                del _in_flight[key]
+            flight.done.set()
 
+    def _wait_for_flight(self, flight, progress):
+        """Waits for another caller's sync, reporting no progress of our own so the caller's job lease stays renewed."""
+        interval = current_app.config.get('SYNC_ACCOUNT_LEASE_RENEW_SECONDS', 60)
+        while not flight.done.wait(interval):
+            if progress is not None:
+                progress(0, 0)
+
+    def _sync_user_platform(self, user_id, platform, full, progress, lease_owner):
+        started = time.monotonic()
+        fetcher = get_fetcher(platform)
+        if fetcher is None:
+            logger.warning('unsupported platform', extra={'platform': platform})
+            return None
 
-    def sync_user_platform(self, user_id, platform):
-        """Syncs saved content for a specific user and platform."""
         account = PlatformAccount.query.filter_by(user_id=user_id, platform=platform).first()
         if not account:
-            print(f"--- SYNC: No {platform} account linked for user {user_id} ---")
-            return False # No account linked
+            logger.info('no linked account to sync', extra={'user_id': user_id, 'platform': platform})
+            return None # No account linked
 
-        access_token = account.access_token # In real app, handle token refresh if expired
+        try:
+            # Usually served from the token cache; refreshes inline only if the token is about to expire
+            access_token = token_manager.get_access_token(account)
+        except TokenRefreshError as e:
+            logger.warning('no access token for sync', extra={'user_id': user_id, 'platform': platform, 'error': str(e)})
+            return None
 
-        print(f"--- SYNC: Starting sync for user {user_id}, platform {platform} ---")
+        # An account synced moments ago has nothing worth fetching yet; bursts of triggers stop here
+        min_interval = current_app.config.get('SYNC_MIN_INTERVAL_SECONDS', 0)
+        if not full and min_interval and account.last_synced_at \
+                and account.last_synced_at > datetime.utcnow() - timedelta(seconds=min_interval):
+            logger.info('sync skipped, synced recently', extra={'user_id': user_id, 'platform': platform,
+                                                            'last_synced_at': account.last_synced_at.isoformat()})
+            SYNCS.inc(platform=platform, mode='skipped')
+            return {
+                'user_id': user_id,
+                'platform': platform,
+                'mode': 'skipped',
+                'pages': 0,
+                'items_added': 0,
+                'items_updated': 0,
+                'items_unchanged': 0,
+                'last_synced_at': account.last_synced_at.isoformat(),
+                'elapsed_seconds': round(time.monotonic() - started, 3)
+            }
+
+        account_id = account.id
+        held = lease_owner is not None
+        if not held:
+            lease_owner = self.acquire_account_lease(account_id)
+            if lease_owner is None:
+                if full:
+                    raise AccountSyncInProgress(f'{platform} account of user {user_id} is being synced by another worker')
+                logger.info('sync skipped, in progress elsewhere', extra={'user_id': user_id, 'platform': platform})
+                SYNCS.inc(platform=platform, mode='in_progress')
+                return {
+                    'user_id': user_id,
+                    'platform': platform,
+                    'mode': 'in_progress',
+                    'pages': 0,
+                    'items_added': 0,
+                    'items_updated': 0,
+                    'items_unchanged': 0,
+                    'elapsed_seconds': round(time.monotonic() - started, 3)
+                }
+
+        renew_interval = current_app.config.get('SYNC_ACCOUNT_LEASE_RENEW_SECONDS', 60)
+        last_renewal = [time.monotonic()]
+
+        def renewing_progress(pages, items_added):
+            if time.monotonic() - last_renewal[0] >= renew_interval:
+                last_renewal[0] = time.monotonic()
+                self.renew_account_lease(account_id, lease_owner)
+            if progress is not None:
+                progress(pages, items_added)
+
+        try:
+            resync = full or self._full_resync_due(account)
+            stats = self._fetch_and_store(account, fetcher, access_token, resync, renewing_progress, started)
+        except BaseException:
+            db.session.rollback()
+            if not held:
+                self.release_account_lease(account_id, lease_owner)
+            raise
+        if not held:
+            self.release_account_lease(account_id, lease_owner)
+        return stats
+
+    def _full_resync_due(self, account):
+        interval = current_app.config.get('SYNC_FULL_RESYNC_INTERVAL_SECONDS', 0)
+        return bool(interval) and account.sync_cursor is not None and (
+            account.last_full_synced_at is None
+            or account.last_full_synced_at <= datetime.utcnow() - timedelta(seconds=interval))
 
-        raw_content = []
-        if platform == 'youtube':
-            raw_content = self._fetch_youtube_content(access_token)
-        elif platform == 'twitter':
-            raw_content = self._fetch_twitter_content(access_token)
-        elif platform == 'reddit':
-            raw_content = self._fetch_reddit_content(access_token)
+    def _fetch_and_store(self, account, fetcher, access_token, full, progress, started):
+        """Pages through the account's saved items, saving each page, and advances its sync state."""
+        user_id, platform = account.user_id, account.platform
+        # Incremental by default: resume from the newest item seen on the last sync
+        cursor = None if full else account.sync_cursor
+        high_water = account.last_published_at # Only advanced when a sync completes
+        mode = 'full' if cursor is None else 'incremental'
+        logger.info('sync started', extra={'user_id': user_id, 'platform': platform, 'mode': mode})
+
+        call_api = lambda request: self._call_platform_api(platform, access_token, request)
+        newest_id = newest_published = None
+        new_items_count = updated_count = unchanged_count = pages = 0
+        stage_seconds = dict.fromkeys(SYNC_STAGES, 0.0)
+        mark = time.perf_counter()
+        for page in fetcher.pages(access_token, call_api):
+            fetched = time.perf_counter()
+            stage_seconds['fetch'] += fetched - mark
+            items, reached_cursor = self._cut_at_cursor(page, cursor)
+            normalized_page = fetcher.normalize_page(items)
+            if normalized_page and newest_id is None:
+                newest_id = normalized_page[0]['original_id'] # Pages come newest first
+            published = [item['original_published_at'] for item in normalized_page if item['original_published_at']]
+            if published and (newest_published is None or max(published) > newest_published):
+                newest_published = max(published)
+            normalized = time.perf_counter()
+            stage_seconds['normalize'] += normalized - fetched
+
+            write = self._persist_page(user_id, platform, normalized_page)
+            stage_seconds['persist'] += time.perf_counter() - normalized
+            new_items_count += write.inserted
+            updated_count += write.updated
+            unchanged_count += write.unchanged
+            pages += 1
+            progress(pages, new_items_count)
+            if reached_cursor:
+                break
+            # If the cursor item disappeared upstream, stop at a page that is already stored and reaches
+            # back to what a completed sync covered. An interrupted sync leaves the high-water mark
+            # where it was, so the next one keeps paging past the pages it had already saved.
+            # A full resync reads every page, which is what picks up edits to older items.
+            if not full and write.all_stored and high_water is not None and published and min(published) <= high_water:
+                break
+            mark = time.perf_counter()
         else:
-             print(f"--- SYNC: Unsupported platform {platform} ---")
-             return False
-
-        normalized_content = self._normalize_content(platform, raw_content)
-
-        # Save normalized content to the database
-        new_items_count = 0
-        for item_data in normalized_content:
-            # Check if content already exists for this user/platform/original_id
-            existing_content = SavedContent.query.filter_by(
-                user_id=user_id,
-                platform=platform,
-                original_id=item_data['original_id']
-            ).first()
-
-            if not existing_content:
-                # Add new content
-                new_content = SavedContent(user_id=user_id, **item_data)
-                db.session.add(new_content)
-                new_items_count += 1
-            else:
-                # Optional: Update existing content if needed
-                pass # For simplicity, we only add new items in this mock
+            stage_seconds['fetch'] += time.perf_counter() - mark # The request that found no further page
+
+        self._update_sync_state(account, newest_id, newest_published, completed_full=cursor is None)
+        db.session.commit()
+        stats = {
+            'user_id': user_id,
+            'platform': platform,
+            'mode': mode,
+            'pages': pages,
+            'items_added': new_items_count,
+            'items_updated': updated_count,
+            'items_unchanged': unchanged_count,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()}
+        }
+        self._record_sync_metrics(stats, stage_seconds)
+        logger.info('sync finished', extra={key: value for key, value in stats.items() if key != 'stage_seconds'})
+        return stats
 
+    def acquire_account_lease(self, account_id):
+        """
+        Leases the account for a sync, unless another worker holds a live lease. Commits.
+        Returns the lease owner, or None if the account is taken.
+        """
+        now = datetime.utcnow()
+        lease_owner = f"{socket.gethostname()}:{os.getpid()}/{uuid.uuid4().hex[:12]}"
+        result = db.session.execute(
+            update(PlatformAccount)
+            .where(PlatformAccount.id == account_id,
+                   or_(PlatformAccount.sync_lease_owner.is_(None), PlatformAccount.sync_lease_expires_at < now))
+            .values(sync_lease_owner=lease_owner,
+                    sync_lease_expires_at=now + timedelta(seconds=current_app.config.get('SYNC_ACCOUNT_LEASE_SECONDS', 300)))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return lease_owner if result.rowcount else None
+
+    def renew_account_lease(self, account_id, lease_owner):
+        """Extends our lease on the account. Commits. Raises AccountLeaseLost if it is no longer ours."""
+        lease_expires_at = datetime.utcnow() + timedelta(seconds=current_app.config.get('SYNC_ACCOUNT_LEASE_SECONDS', 300))
+        result = db.session.execute(
+            update(PlatformAccount)
+            .where(PlatformAccount.id == account_id, PlatformAccount.sync_lease_owner == lease_owner)
+            .values(sync_lease_expires_at=lease_expires_at)
+            .execution_options(synchronize_session=False)
+        )
         db.session.commit()
-        print(f"--- SYNC: Finished sync for user {user_id}, platform {platform}. Added {new_items_count} new items. ---")
-        return True
+        if result.rowcount == 0:
+            raise AccountLeaseLost(account_id)
 
-    def schedule_full_sync(self):
+    def release_account_lease(self, account_id, lease_owner, retry_after=None):
         """
-        Mocks scheduling a full sync for all users/platforms.
-        In a real app, this would submit jobs to a background queue.
+        Gives the account back, if we still hold it. Commits. With `retry_after` seconds, shard
+        workers leave the account alone until then (an explicit sync may still take it).
         """
-        print("\n--- SCHEDULER: Mocking full sync scheduler run ---")
-        users = User.query.all()
-        platforms = ['youtube', 'twitter', 'reddit'] # Define supported platforms
+        expires_at = datetime.utcnow() + timedelta(seconds=retry_after) if retry_after else None
+        db.session.execute(
+            update(PlatformAccount)
+            .where(PlatformAccount.id == account_id, PlatformAccount.sync_lease_owner == lease_owner)
+            .values(sync_lease_owner=None, sync_lease_expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _record_sync_metrics(self, stats, stage_seconds):
+        platform = stats['platform']
+        SYNCS.inc(platform=platform, mode=stats['mode'])
+        SYNC_SECONDS.observe(stats['elapsed_seconds'], platform=platform)
+        for stage, seconds in stage_seconds.items():
+            SYNC_STAGE_SECONDS.observe(seconds, platform=platform, stage=stage)
+        for result in ('added', 'updated', 'unchanged'):
+            if stats[f'items_{result}']:
+                SYNC_ITEMS.inc(stats[f'items_{result}'], platform=platform, result=result)
 
-        for user in users:
-            linked_platforms = self.get_user_linked_platforms(user.id)
-            for platform in platforms:
-                if platform in linked_platforms:
-                    # In a real app: send this task to Celery/RQ
-                    print(f"--- SCHEDULER: Submitting sync job for User {user.id}, Platform {platform} ---")
-                    # Example: celery_app.send_task('tasks.sync_platform', args=[user.id, platform])
-                    self.sync_user_platform(user.id, platform) # Directly calling for demo
+    def _cut_at_cursor(self, page, cursor):
+        """Returns (items before `cursor` in the page, whether the cursor was reached)."""
+        if cursor is not None:
+            for index, item in enumerate(page):
+                if str(item.get('id')) == cursor:
+                    return page[:index], True
+        return page, False
 
-        print("--- SCHEDULER: Mock sync scheduler run finished ---\n")
+    def bump_content_version(self, user_id):
+        """Marks the user's content as changed, in the current transaction."""
+        db.session.execute(
+            update(User).where(User.id == user_id).values(content_version=User.content_version + 1)
+            .execution_options(synchronize_session=False)
+        )
 
+    @read_from_replica # Same database as the listing it versions, so a lagging replica can't cache old rows as new
+    def get_content_version(self, user_id):
+        """Returns the user's content version (None for an unknown user). A primary-key lookup."""
+        return db.session.query(User.content_version).filter(User.id == user_id).scalar()
+
+    def _get_stored_hashes(self, user_id, platform, original_ids):
+        """Returns {original_id: (id, content_hash)} for the `original_ids` already saved."""
+        rows = db.session.query(SavedContent.original_id, SavedContent.id, SavedContent.content_hash).filter(
+            SavedContent.user_id == user_id,
+            SavedContent.platform == platform,
+            SavedContent.original_id.in_(original_ids)
+        )
+        return {original_id: (content_id, stored_hash) for original_id, content_id, stored_hash in rows}
+
+    def _update_sync_state(self, account, newest_id, newest_published, completed_full=False):
+        """Advances the account's cursor and high-water marks after a successful sync."""
+        if newest_id is not None:
+            account.sync_cursor = newest_id # Where the next sync stops
+        if newest_published and (account.last_published_at is None or newest_published > account.last_published_at):
+            account.last_published_at = newest_published
+        account.last_synced_at = datetime.utcnow()
+        if completed_full:
+            account.last_full_synced_at = account.last_synced_at
+
+    def _persist_page(self, user_id, platform, rows):
+        """
+        Saves one page of normalized rows and commits: inserts new rows and rewrites stored rows
+        whose content hash changed, leaving unchanged rows untouched. Stored hashes are looked up
+        for this page only, not for the whole library.
+        Returns a PageWrite with the counts and whether every row was already stored.
+        """
+        if not rows:
+            return PageWrite(0, 0, 0, False)
+        stored = self._get_stored_hashes(user_id, platform, [row['original_id'] for row in rows])
+
+        new_rows, changed_rows, seen = [], [], set()
+        for row in rows:
+            original_id = row['original_id']
+            if original_id in seen:
+                continue # Drops duplicates within the page
+            seen.add(original_id)
+            row_hash = content_hash(row)
+            if original_id not in stored:
+                new_rows.append(dict(row, user_id=user_id, content_hash=row_hash))
+                continue
+            content_id, stored_hash = stored[original_id]
+            if stored_hash != row_hash:
+                changed_rows.append({'b_id': content_id, 'title': row['title'], 'url': row['url'],
+                                     'description': row['description'], 'content_type': row['content_type'],
+                                     'original_published_at': row['original_published_at'], 'content_hash': row_hash})
+        unchanged = len(seen) - len(new_rows) - len(changed_rows)
+
+        inserted = 0
+        if new_rows:
+            insert_stmt = self._content_insert_statement()
+            batch_size = current_app.config.get('SYNC_BATCH_SIZE', 500)
+            for start in range(0, len(new_rows), batch_size):
+                chunk = new_rows[start:start + batch_size]
+                result = db.session.execute(insert_stmt, chunk)
+                # rowcount excludes rows skipped by ON CONFLICT; some drivers report -1 for executemany
+                inserted += result.rowcount if result.rowcount >= 0 else len(chunk)
+        if changed_rows:
+            table = SavedContent.__table__
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('b_id')).values(
+                    title=bindparam('title'), url=bindparam('url'), description=bindparam('description'),
+                    content_type=bindparam('content_type'), original_published_at=bindparam('original_published_at'),
+                    content_hash=bindparam('content_hash')),
+                changed_rows
+            )
+        if inserted or changed_rows:
+            self.bump_content_version(user_id) # Committed rows are visible, so cached listings must go
+        db.session.commit()
+        return PageWrite(inserted, len(changed_rows), unchanged, not new_rows)
+
+    def _content_insert_statement(self):
+        """
+        Builds the bulk INSERT for SavedContent. On SQLite and Postgres it skips rows that
+        hit _user_platform_content_uc, so a row added by an overlapping sync doesn't fail the chunk.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return postgresql_insert(SavedContent.__table__).on_conflict_do_nothing(constraint='_user_platform_content_uc')
+        if dialect == 'sqlite':
+            return sqlite_insert(SavedContent.__table__).on_conflict_do_nothing(
+                index_elements=['user_id', 'platform', 'original_id'])
+        return insert(SavedContent.__table__)
+
+    def schedule_full_sync(self, parallel=None):
+        """
+        Runs a sync for every linked (user, platform) account.
+        In parallel mode the jobs are fanned out to a bounded worker pool with a
+        separate concurrency limit per platform. Each worker pushes its own app
+        context, so it gets its own DB session.
+        Returns a summary dict with throughput and failures.
+        """
+        app = current_app._get_current_object()
+        if parallel is None:
+            parallel = app.config.get('SYNC_PARALLEL', True)
+
+        logger.info('full sync run started', extra={'parallel': parallel})
+        started = time.monotonic()
+
+        if parallel:
+            results = self._run_sync_jobs_parallel(app, self._iter_sync_jobs())
+        else:
+            results = [self._run_sync_job(app, user_id, platform)
+                       for user_id, platform in self._iter_sync_jobs()]
+
+        summary = self._summarize_sync_results(results, time.monotonic() - started)
+        # Cumulative for this process: requests made, throttled retries and the current concurrency ceiling
+        summary['rate_limits'] = {platform: get_rate_limiter(app, platform).stats() for platform in supported_platforms()}
+        logger.info('full sync run finished', extra={key: summary[key] for key in
+                                                   ('jobs', 'succeeded', 'failed', 'elapsed_seconds', 'jobs_per_second')})
+        return summary
+
+    def _iter_sync_jobs(self, batch_size=SYNC_JOB_BATCH_SIZE):
+        """
+        Streams (user_id, platform) pairs for every linked account.
+        Reads in keyset batches rather than holding one cursor open for the whole
+        run, so workers committing to SQLite aren't blocked by our read lock.
+        """
+        last_id = 0
+        while True:
+            rows = db.session.query(PlatformAccount.id, PlatformAccount.user_id, PlatformAccount.platform) \
+                .filter(PlatformAccount.id > last_id,
+                        PlatformAccount.platform.in_(supported_platforms())) \
+                .order_by(PlatformAccount.id) \
+                .limit(batch_size) \
+                .all()
+            db.session.rollback() # End the read transaction before handing out jobs
+            if not rows:
+                return
+            for account_id, user_id, platform in rows:
+                yield user_id, platform
+            last_id = rows[-1][0]
+
+    def _run_sync_jobs_parallel(self, app, jobs):
+        """Dispatches jobs to one bounded executor per platform and collects results."""
+        max_workers = app.config.get('SYNC_MAX_WORKERS', 16)
+        platform_limits = app.config.get('SYNC_PLATFORM_CONCURRENCY', {})
+        # Caps the total number of syncs in flight across all platform pools
+        global_slots = threading.BoundedSemaphore(max_workers)
+        # Caps the number of submitted-but-unfinished jobs so a huge account
+        # table doesn't turn into a huge executor queue
+        backlog = threading.BoundedSemaphore(max_workers * 4)
+
+        executors = {
+            platform: ThreadPoolExecutor(
+                max_workers=max(1, min(platform_limits.get(platform, max_workers), max_workers)),
+                thread_name_prefix=f'sync-{platform}'
+            )
+            for platform in supported_platforms()
+        }
+        results = []
+        results_lock = threading.Lock()
+
+        def on_done(future):
+            with results_lock:
+                results.append(future.result())
+            backlog.release()
+
+        try:
+            for user_id, platform in jobs:
+                backlog.acquire()
+                future = executors[platform].submit(self._run_sync_job, app, user_id, platform, global_slots)
+                future.add_done_callback(on_done)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+        return results
+
+    def _run_sync_job(self, app, user_id, platform, global_slots=None):
+        """Runs one sync in a fresh app context (and DB session). Never raises."""
+        if global_slots is not None:
+            global_slots.acquire()
+        started = time.monotonic()
+        error = None
+        try:
+            with app.app_context():
+                try:
+                    if not self.sync_user_platform(user_id, platform):
+                        error = 'sync returned no result'
+                except Exception as e:
+                    db.session.rollback()
+                    error = repr(e)
+                    logger.exception('sync failed', extra={'user_id': user_id, 'platform': platform})
+        finally:
+            if global_slots is not None:
+                global_slots.release()
+        return {
+            'user_id': user_id,
+            'platform': platform,
+            'ok': error is None,
+            'error': error,
+            'elapsed': time.monotonic() - started
+        }
+
+    def _summarize_sync_results(self, results, elapsed):
+        """Builds the end-of-run summary from per-job results."""
+        per_platform = {}
+        failures = []
+        for result in results:
+            stats = per_platform.setdefault(result['platform'], {'succeeded': 0, 'failed': 0, 'job_seconds': 0.0})
+            stats['job_seconds'] += result['elapsed']
+            if result['ok']:
+                stats['succeeded'] += 1
+            else:
+                stats['failed'] += 1
+                failures.append({'user_id': result['user_id'], 'platform': result['platform'], 'error': result['error']})
+
+        for stats in per_platform.values():
+            stats['job_seconds'] = round(stats['job_seconds'], 3)
+
+        return {
+            'jobs': len(results),
+            'succeeded': len(results) - len(failures),
+            'failed': len(failures),
+            'elapsed_seconds': round(elapsed, 3),
+            'jobs_per_second': round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+            'per_platform': per_platform,
+            'failures': failures[:MAX_REPORTED_FAILURES]
+        }
+
+
+    def has_linked_account(self, user_id, platform):
+        """True if the user has linked `platform`. Served by the (user_id, platform) unique index."""
+        return db.session.query(
+            PlatformAccount.query.filter_by(user_id=user_id, platform=platform).exists()).scalar()
 
     def get_user_linked_platforms(self, user_id):
          """Helper to get platforms linked by a user."""
@@ -162,9 +601,91 @@ class DataAggregatorService:
          return [acc.platform for acc in user.platform_accounts]
 
 
+    @read_from_replica
     def get_user_content(self, user_id, platform=None):
         """Retrieves aggregated content for a user."""
-        query = SavedContent.query.filter_by(user_id=user_id).order_by(SavedContent.saved_at.desc())
+        query = SavedContent.query.filter_by(user_id=user_id).order_by(SavedContent.saved_at.desc(), SavedContent.id.desc())
         if platform:
             query = query.filter_by(platform=platform)
         return query.all()
+
+    @read_from_replica
+    def get_user_content_page(self, user_id, platform=None, limit=50, cursor=None, fields=None):
+        """
+        Retrieves one page of a user's content, newest first, as (rows, next_cursor).
+        Pages are keyed on (saved_at, id), so a deep page costs the same as the first one.
+        Only the requested `fields` are selected and rows come back as plain mappings, not ORM objects.
+        Raises ValueError for an unknown field or a malformed cursor.
+        """
+        fields = resolve_content_fields(fields)
+
+        # id and saved_at are always selected because the next cursor is built from them
+        selected = list(dict.fromkeys(['id', 'saved_at'] + fields))
+        query = db.session.query(*[getattr(SavedContent, field) for field in selected]) \
+            .filter(SavedContent.user_id == user_id)
+        if platform:
+            query = query.filter(SavedContent.platform == platform)
+        if cursor:
+            saved_at, last_id = decode_content_cursor(cursor)
+            query = query.filter(or_(
+                SavedContent.saved_at < saved_at,
+                and_(SavedContent.saved_at == saved_at, SavedContent.id < last_id)
+            ))
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(SavedContent.saved_at.desc(), SavedContent.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_content_cursor(rows[-1].saved_at, rows[-1].id)
+        return [{field: row._mapping[field] for field in fields} for row in rows], next_cursor
+
+    @read_from_replica
+    def iter_user_content(self, user_id, platform=None, fields=None, batch_size=1000):
+        """
+        Streams all of a user's content, newest first, as plain mappings of the requested fields.
+        Rows are pulled from a server-side cursor `batch_size` at a time, so memory stays flat
+        however large the library is. Raises ValueError for an unknown field.
+        """
+        fields = resolve_content_fields(fields)
+        stmt = select(*[getattr(SavedContent, field) for field in fields]) \
+            .where(SavedContent.user_id == user_id) \
+            .order_by(SavedContent.saved_at.desc(), SavedContent.id.desc()) \
+            .execution_options(yield_per=batch_size)
+        if platform:
+            stmt = stmt.where(SavedContent.platform == platform)
+        # The rows are read after this returns, so the engine is picked now, while replica routing applies
+        return self._stream_rows(stmt, db.session.get_bind(clause=stmt))
+
+    def _stream_rows(self, stmt, bind):
+        """Yields row mappings for `stmt`, closing the cursor even if the consumer stops early."""
+        result = db.session.execute(stmt, bind_arguments={'bind': bind})
+        try:
+            for row in result:
+                yield row._mapping
+        finally:
+            result.close()
+
+
+
+def resolve_content_fields(fields):
+    """Returns the requested content fields (all of them by default). Raises ValueError on unknown names."""
+    fields = list(fields) if fields else list(CONTENT_FIELDS)
+    unknown = [field for field in fields if field not in CONTENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))}")
+    return fields
+
+def encode_content_cursor(saved_at, content_id):
+    """Encodes a (saved_at, id) keyset position as an opaque URL-safe token."""
+    raw = json.dumps([saved_at.isoformat(), content_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_content_cursor(cursor):
+    """Decodes a token from encode_content_cursor. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        saved_at, content_id = json.loads(raw)
+        return datetime.fromisoformat(saved_at), int(content_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
@@ -0,0 +1,183 @@
+from models import db, EmailOutbox
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from utils.email_sender import get_email_sender
+from utils.metrics import metrics
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DELIVERIES = metrics.counter('outbox_deliveries_total', 'Outbox delivery attempts, by result (sent, retried, failed).',
+                                    ('result',))
+
+class EmailOutboxService:
+    """
+    Durable email delivery. Producers write messages to the EmailOutbox table inside their own
+    transaction; dispatch_pending() later claims them in batches under a lease, sends each batch
+    concurrently over pooled SMTP connections, and retries failures with exponential backoff.
+    """
+
+    def enqueue_many(self, messages):
+        """
+        Adds messages to the outbox in the current transaction; the caller commits.
+        Each message is a dict with to_address, subject, body and optionally reminder_id.
+        """
+        if not messages:
+            return 0
+        now = datetime.utcnow()
+        rows = [{
+            'reminder_id': message.get('reminder_id'),
+            'to_address': message['to_address'],
+            'subject': message['subject'],
+            'body': message['body'],
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        } for message in messages]
+        db.session.execute(insert(EmailOutbox.__table__), rows)
+        return len(rows)
+
+    def reclaim_stale_leases(self, now):
+        """Returns messages whose sender's lease expired to 'pending'. Returns the count."""
+        result = db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.status == 'sending', EmailOutbox.lease_expires_at < now)
+            .values(status='pending', lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def claim_batch(self, now, limit, worker_id):
+        """
+        Atomically moves up to `limit` pending messages to 'sending' and returns (lease_owner, rows).
+        Uses the same single-UPDATE claim as ReminderService.claim_due_reminders, so several
+        dispatchers can drain the outbox side by side.
+        """
+        lease_owner = f"{worker_id}/{uuid.uuid4().hex[:12]}"
+        lease_expires_at = now + timedelta(seconds=current_app.config.get('MAIL_LEASE_SECONDS', 300))
+
+        candidates = select(EmailOutbox.id).where(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at.asc(), EmailOutbox.id.asc()).limit(limit).with_for_update(skip_locked=True)
+        claim = update(EmailOutbox).where(
+            EmailOutbox.id.in_(candidates.scalar_subquery()),
+            EmailOutbox.status == 'pending'
+        ).values(
+            status='sending', lease_owner=lease_owner, lease_expires_at=lease_expires_at
+        ).execution_options(synchronize_session=False)
+
+        if db.session.get_bind().dialect.update_returning:
+            claimed_ids = db.session.execute(claim.returning(EmailOutbox.id)).scalars().all()
+        else:
+            db.session.execute(claim)
+            claimed_ids = db.session.execute(
+                select(EmailOutbox.id).where(EmailOutbox.lease_owner == lease_owner)).scalars().all()
+
+        rows = []
+        if claimed_ids:
+            rows = db.session.execute(
+                select(EmailOutbox.id, EmailOutbox.to_address, EmailOutbox.subject,
+                       EmailOutbox.body, EmailOutbox.attempts)
+                .where(EmailOutbox.id.in_(claimed_ids))
+                .order_by(EmailOutbox.id.asc())
+            ).all()
+        db.session.commit()
+        return lease_owner, rows
+
+    def dispatch_pending(self, worker_id=None, max_batches=None):
+        """
+        Sends pending outbox messages until none are due (or `max_batches` batches were sent).
+        Returns counts and the achieved messages per second.
+        """
+        config = current_app.config
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        batch_size = config.get('MAIL_OUTBOX_BATCH_SIZE', 200)
+        stats = {'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0,
+                 'reclaimed': self.reclaim_stale_leases(datetime.utcnow())}
+        started = time.monotonic()
+
+        sender = get_email_sender(current_app._get_current_object()) # Kept open between dispatches
+        with ThreadPoolExecutor(max_workers=config.get('MAIL_SENDER_WORKERS', 4),
+                                thread_name_prefix='mail-sender') as executor:
+            while max_batches is None or stats['batches'] < max_batches:
+                lease_owner, messages = self.claim_batch(datetime.utcnow(), batch_size, worker_id)
+                if not messages:
+                    break
+                errors = list(executor.map(lambda message: self._send_one(sender, message), messages))
+                self._record_results(lease_owner, messages, errors, stats)
+                db.session.commit()
+                stats['batches'] += 1
+
+        elapsed = time.monotonic() - started
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['messages_per_second'] = round(stats['sent'] / elapsed, 2) if elapsed > 0 else 0.0
+        for result in ('sent', 'retried', 'failed'):
+            OUTBOX_DELIVERIES.inc(stats[result], result=result)
+        if stats['batches']:
+            logger.info('outbox dispatched', extra=stats)
+        return stats
+
+    def _send_one(self, sender, message):
+        """Sends one claimed message. Returns None on success or the error text. Runs on a sender thread."""
+        try:
+            sender.send_email(message.to_address, message.subject, message.body)
+            return None
+        except Exception as e:
+            return repr(e)
+
+    def _record_results(self, lease_owner, messages, errors, stats):
+        """Marks sent messages and schedules retries (or gives up) for failed ones, if we still hold the lease."""
+        now = datetime.utcnow()
+        max_attempts = current_app.config.get('MAIL_MAX_ATTEMPTS', 5)
+        base_delay = current_app.config.get('MAIL_RETRY_BASE_SECONDS', 30)
+
+        sent_ids = [message.id for message, error in zip(messages, errors) if error is None]
+        if sent_ids:
+            result = db.session.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(sent_ids), EmailOutbox.lease_owner == lease_owner)
+                .values(status='sent', sent_at=now, attempts=EmailOutbox.attempts + 1,
+                        last_error=None, lease_owner=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            stats['sent'] += result.rowcount
+
+        failures = []
+        for message, error in zip(messages, errors):
+            if error is None:
+                continue
+            attempts = message.attempts + 1
+            give_up = attempts >= max_attempts
+            # Exponential backoff with jitter, so a struggling server isn't hit by every retry at once
+            delay = base_delay * (2 ** message.attempts) * random.uniform(0.5, 1.0)
+            failures.append({
+                'b_id': message.id,
+                'b_lease_owner': lease_owner,
+                'status': 'failed' if give_up else 'pending',
+                'attempts': attempts,
+                'next_attempt_at': now + timedelta(seconds=delay),
+                'last_error': error
+            })
+            stats['failed' if give_up else 'retried'] += 1
+            logger.warning('email delivery failed', extra={'outbox_id': message.id, 'attempt': attempts, 'error': error})
+
+        if failures:
+            table = EmailOutbox.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('b_id'), table.c.lease_owner == bindparam('b_lease_owner'))
+                .values(status=bindparam('status'), attempts=bindparam('attempts'),
+                        next_attempt_at=bindparam('next_attempt_at'), last_error=bindparam('last_error'),
+                        lease_owner=None, lease_expires_at=None),
+                failures
+            )
@@ -0,0 +1,149 @@
+from flask import current_app, has_app_context
+from utils.normalization import NormalizationSpec, parse_iso8601, parse_twitter_date, parse_unix_timestamp
+from utils.rate_limiter import RateLimitedError, get_rate_limiter
+import json
+import logging
+import time # For mock delay
+import urllib.error
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# platform name -> fetcher instance; see register_fetcher
+FETCHERS = {}
+
+
+def register_fetcher(fetcher_class):
+    """Class decorator that makes a PlatformFetcher available to syncs under its `platform` name."""
+    FETCHERS[fetcher_class.platform] = fetcher_class()
+    return fetcher_class
+
+
+def get_fetcher(platform):
+    """Returns the fetcher registered for `platform`, or None if the platform isn't supported."""
+    return FETCHERS.get(platform)
+
+
+def supported_platforms():
+    return list(FETCHERS)
+
+
+def mock_latency():
+    """Seconds the mock fetchers sleep per page request (MOCK_FETCH_LATENCY_SECONDS, default 1)."""
+    return current_app.config.get('MOCK_FETCH_LATENCY_SECONDS', 1.0) if has_app_context() else 1.0
+
+
+def mock_api_request(platform, access_token, mock_items):
+    """
+    Makes one request of a mock fetcher. With MOCK_PLATFORM_API_URL set this is a real HTTP GET of
+    <url>/<platform>/saved on the mock platform server, whose 429s raise RateLimitedError and whose
+    other errors raise urllib's HTTPError/URLError; the rate-limit headers of a successful response
+    go to the platform limiter's observe(). Otherwise it sleeps mock_latency() and returns `mock_items`.
+    """
+    base_url = current_app.config.get('MOCK_PLATFORM_API_URL') if has_app_context() else None
+    if not base_url:
+        time.sleep(mock_latency()) # Simulate network delay
+        return mock_items
+
+    request = urllib.request.Request(f"{base_url.rstrip('/')}/{urllib.parse.quote(platform)}/saved",
+                                     headers={'Authorization': f'Bearer {access_token}'})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            # Remaining/Reset headers let the limiter slow down before the platform starts refusing
+            get_rate_limiter(current_app._get_current_object(), platform).observe(access_token, response.headers)
+            return json.loads(response.read())['items']
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            raise RateLimitedError.from_headers(e.headers, f'{platform} API returned 429') from e
+        raise
+
+
+class PlatformFetcher:
+    """
+    Adapter for one platform's API. Subclasses set `platform` and `spec`, and implement:
+
+    pages(access_token, call_api) -- yields pages (lists) of raw items, newest first. Each API request
+        is made as call_api(request), which applies the platform's rate limits and returns request().
+        Pages are pulled lazily, so a sync that stops early never requests the remaining pages.
+
+    `spec` is a NormalizationSpec mapping raw items to SavedContent columns. It is compiled once,
+    when the fetcher is created, into normalize_page(items).
+    """
+    platform = None
+    spec = NormalizationSpec()
+
+    def __init__(self):
+        self.normalize_page = self.spec.compile(self.platform)
+
+    def pages(self, access_token, call_api):
+        raise NotImplementedError
+
+    def normalize(self, item):
+        """Normalizes a single item; syncs use normalize_page."""
+        return self.normalize_page([item])[0]
+
+
+@register_fetcher
+class YouTubeFetcher(PlatformFetcher):
+    platform = 'youtube'
+    # YouTube API might need more logic to get full URL or description easily depending on endpoint
+    spec = NormalizationSpec(
+        fields={'title': 'title', 'url': 'url'},
+        constants={'content_type': 'video'},
+        published_at=('publishedAt', parse_iso8601) # RFC 3339
+    )
+
+    def pages(self, access_token, call_api):
+        """Mocks fetching saved YouTube content."""
+        logger.debug('calling platform API', extra={'platform': self.platform})
+        def request_page():
+            # In a real app, use google-api-python-client to fetch saved/liked videos, following nextPageToken
+            return mock_api_request(self.platform, access_token, [
+                {'id': 'video1', 'title': 'Mock YouTube Video 1', 'url': 'http://youtube.com/watch?v=video1', 'publishedAt': '2023-10-26T10:00:00Z'},
+                {'id': 'video2', 'title': 'Mock YouTube Video 2', 'url': 'http://youtube.com/watch?v=video2', 'publishedAt': '2023-10-25T15:30:00Z'}
+            ])
+        yield call_api(request_page)
+
+
+@register_fetcher
+class TwitterFetcher(PlatformFetcher):
+    platform = 'twitter'
+    spec = NormalizationSpec(
+        fields={'title': 'text', 'description': 'text', 'url': 'url'}, # Use text as title
+        constants={'content_type': 'tweet'},
+        published_at=('created_at', parse_twitter_date) # "Wed Oct 25 20:00:00 +0000 2023"
+    )
+
+    def pages(self, access_token, call_api):
+        """Mocks fetching saved Twitter content (e.g., liked tweets)."""
+        logger.debug('calling platform API', extra={'platform': self.platform})
+        def request_page():
+            # In a real app, use tweepy or similar, following pagination_token
+            return mock_api_request(self.platform, access_token, [
+                {'id': 'tweet2', 'text': 'Mock Tweet 2', 'url': 'http://twitter.com/user/status/tweet2', 'created_at': 'Wed Oct 25 21:00:00 +0000 2023'},
+                {'id': 'tweet1', 'text': 'Mock Tweet 1', 'url': 'http://twitter.com/user/status/tweet1', 'created_at': 'Wed Oct 25 20:00:00 +0000 2023'}
+            ])
+        yield call_api(request_page)
+
+
+@register_fetcher
+class RedditFetcher(PlatformFetcher):
+    platform = 'reddit'
+    # url can be a link or the permalink; the description might need fetching post content
+    spec = NormalizationSpec(
+        fields={'title': 'title', 'url': 'url'},
+        constants={'content_type': 'post'},
+        published_at=('created_utc', parse_unix_timestamp) # UTC timestamp
+    )
+
+    def pages(self, access_token, call_api):
+        """Mocks fetching saved Reddit content."""
+        logger.debug('calling platform API', extra={'platform': self.platform})
+        def request_page():
+            # In a real app, use PRAW (Python Reddit API Wrapper), following the 'after' fullname
+            return mock_api_request(self.platform, access_token, [
+                {'id': 'post2', 'title': 'Mock Reddit Post 2', 'url': 'http://reddit.com/r/subreddit/comments/post2', 'created_utc': 1698349200},
+                {'id': 'post1', 'title': 'Mock Reddit Post 1', 'url': 'http://reddit.com/r/subreddit/comments/post1', 'created_utc': 1698345600} # UTC timestamp
+            ])
+        yield call_api(request_page)
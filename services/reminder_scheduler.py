@@ -0,0 +1,163 @@
+from models import db, Reminder
+from datetime import datetime, timedelta
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ReminderScheduler:
+    """
+    Fires reminders on time from an in-memory timer instead of polling the table.
+
+    The scheduled reminders due within the next REMINDER_SCHEDULER_WINDOW_SECONDS are kept in a
+    min-heap keyed by reminder_time, and the scheduler thread sleeps until the earliest deadline.
+    ReminderService.create_reminder pushes new reminders in through notify(), which only reaches a
+    scheduler in the same process. Reminders created elsewhere (the web app, with the scheduler run
+    by `flask run-reminder-scheduler`) are loaded at the next window reload, so they may fire up to
+    REMINDER_SCHEDULER_WINDOW_SECONDS late: run the scheduler in the web app (REMINDER_SCHEDULER_ENABLED)
+    for on-time reminders, or trade that latency for a query by setting REMINDER_SCHEDULER_PEEK_SECONDS.
+    Sending goes through ReminderService.process_due_reminders, whose lease-based claiming keeps
+    it safe to run next to other processors.
+    """
+
+    def __init__(self):
+        self._heap = [] # (reminder_time, reminder_id)
+        self._queued_ids = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._app = None
+        self._window_end = None
+        self._next_peek = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """Starts the scheduler thread for `app`. Does nothing if it is already running."""
+        with self._condition:
+            if self.running:
+                return
+            self._app = app
+            self._stopping = False
+            self._window_end = None # Forces a reload from the DB, e.g. after a restart
+            self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+        logger.info('reminder scheduler started')
+
+    def stop(self, timeout=None):
+        """Stops the scheduler thread and waits for it to exit."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info('reminder scheduler stopped')
+
+    def join(self):
+        """Blocks until the scheduler thread exits."""
+        if self._thread is not None:
+            self._thread.join()
+
+    def notify(self, reminder_id, reminder_time):
+        """Adds a newly created reminder to the timer if it falls inside the loaded window."""
+        with self._condition:
+            if not self.running or self._window_end is None or reminder_time > self._window_end:
+                return # Picked up by the window reload that covers it
+            self._push(reminder_time, reminder_id)
+            self._condition.notify() # It may be earlier than the deadline we're sleeping towards
+
+    def _push(self, reminder_time, reminder_id):
+        if reminder_id not in self._queued_ids:
+            self._queued_ids.add(reminder_id)
+            heapq.heappush(self._heap, (reminder_time, reminder_id))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                now = datetime.utcnow()
+                reload_window = self._window_end is None or now >= self._window_end
+                due = bool(self._heap) and self._heap[0][0] <= now
+                peek = self._next_peek is not None and now >= self._next_peek
+                if not reload_window and not due and not peek:
+                    deadline = self._heap[0][0] if self._heap else self._window_end
+                    if self._next_peek is not None:
+                        deadline = min(deadline, self._next_peek)
+                    self._condition.wait(min((deadline - now).total_seconds(), self._window_seconds()))
+                    continue
+                if due:
+                    self._pop_due(now)
+
+            try:
+                with self._app.app_context():
+                    if reload_window:
+                        self._load_window(now)
+                    elif peek:
+                        self._peek(now)
+                    if due or reload_window:
+                        # Claims everything that is due, including rows created by other processes
+                        self._process_due()
+            except Exception:
+                logger.exception('reminder scheduler error')
+                with self._condition:
+                    self._condition.wait(1) # Back off briefly instead of spinning on a persistent error
+
+    def _pop_due(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            _, reminder_id = heapq.heappop(self._heap)
+            self._queued_ids.discard(reminder_id)
+
+    def _window_seconds(self):
+        return self._app.config.get('REMINDER_SCHEDULER_WINDOW_SECONDS', 3600)
+
+    def _schedule_peek(self, now):
+        peek_seconds = self._app.config.get('REMINDER_SCHEDULER_PEEK_SECONDS', 0)
+        self._next_peek = now + timedelta(seconds=peek_seconds) if peek_seconds else None
+
+    def _peek(self, now):
+        """
+        Queues the earliest scheduled reminder if the timer doesn't know it, e.g. because another
+        process created it. Only runs when REMINDER_SCHEDULER_PEEK_SECONDS is set; the timer's next
+        deadline is then never more than one interval later than the earliest reminder in the table.
+        """
+        earliest = db.session.query(Reminder.id, Reminder.reminder_time) \
+            .filter(Reminder.status == 'scheduled') \
+            .order_by(Reminder.reminder_time.asc(), Reminder.id.asc()).first()
+        db.session.rollback()
+
+        with self._condition:
+            self._schedule_peek(now)
+            if earliest is not None and earliest.reminder_time <= self._window_end:
+                self._push(earliest.reminder_time, earliest.id)
+
+    def _load_window(self, now):
+        """Replaces the heap with the scheduled reminders due before the end of the next window."""
+        window_end = now + timedelta(seconds=self._window_seconds())
+        rows = db.session.query(Reminder.id, Reminder.reminder_time).filter(
+            Reminder.status == 'scheduled',
+            Reminder.reminder_time <= window_end
+        ).all()
+        db.session.rollback()
+
+        with self._condition:
+            self._heap = [(reminder_time, reminder_id) for reminder_id, reminder_time in rows]
+            heapq.heapify(self._heap)
+            self._queued_ids = {reminder_id for reminder_id, _ in rows}
+            self._window_end = window_end
+            self._schedule_peek(now)
+            self._pop_due(now) # Already due ones are handled by the processing run that follows the reload
+        logger.info('reminder window loaded', extra={'reminders': len(rows), 'window_end': window_end.isoformat()})
+
+    def _process_due(self):
+        from services.reminder_service import ReminderService # Imported here to avoid a circular import
+        reminder_service = ReminderService()
+        if reminder_service.process_due_reminders()['sent']:
+            reminder_service.outbox.dispatch_pending() # Deliver right away rather than waiting for the next outbox run
+
+
+# Shared by ReminderService.create_reminder and the app/CLI that starts it
+reminder_scheduler = ReminderScheduler()
@@ -1,8 +1,29 @@
 from models import db, User, SavedContent, Reminder
-from datetime import datetime
-from utils.email_sender import EmailSender # Import the mock email sender
+from flask import current_app
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import time
+import uuid
+from services.reminder_scheduler import reminder_scheduler
+from services.email_outbox_service import EmailOutboxService
+from utils.db_engine import read_from_replica
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_PROCESSED = metrics.counter('reminders_processed_total', 'Due reminders processed, by result (sent, error).',
+                                      ('result',))
+REMINDER_LEASES_RECLAIMED = metrics.counter('reminder_leases_reclaimed_total', 'Reminders reclaimed from expired leases.')
+REMINDER_RUN_SECONDS = metrics.histogram('reminder_processing_duration_seconds', 'Wall time of process_due_reminders runs.')
 
 class ReminderService:
+    def __init__(self):
+        self.outbox = EmailOutboxService()
+
     def create_reminder(self, user_id, content_id, reminder_time_str):
         content = SavedContent.query.filter_by(id=content_id, user_id=user_id).first()
         if not content:
@@ -16,7 +37,7 @@ class ReminderService:
 
         # Optional: Check if reminder_time is in the future
         if reminder_time <= datetime.utcnow():
-             print("--- REMINDER: Cannot set reminder in the past ---")
+             logger.info('reminder time is in the past', extra={'user_id': user_id, 'content_id': content_id})
              return None
 
         new_reminder = Reminder(
@@ -26,52 +47,199 @@ class ReminderService:
             status='scheduled'
         )
         db.session.add(new_reminder)
+        self._bump_reminder_versions([user_id])
         db.session.commit()
-        print(f"--- REMINDER: Created reminder for content {content_id} at {reminder_time} for user {user_id} ---")
+        reminder_scheduler.notify(new_reminder.id, new_reminder.reminder_time)
+        logger.info('reminder created', extra={'user_id': user_id, 'content_id': content_id,
+                                               'reminder_time': reminder_time.isoformat()})
         return new_reminder
 
+    @read_from_replica
     def get_user_reminders(self, user_id):
         """Retrieves scheduled and past reminders for a user."""
-        return Reminder.query.filter_by(user_id=user_id).order_by(Reminder.reminder_time.asc()).all()
+        return Reminder.query.options(joinedload(Reminder.content)) \
+            .filter_by(user_id=user_id).order_by(Reminder.reminder_time.asc()).all()
 
-    def process_due_reminders(self):
+    @read_from_replica
+    def get_listing_versions(self, user_id):
         """
-        Mocks processing reminders that are due.
-        In a real app, this would run periodically via a background scheduler.
+        Returns (reminder_version, content_version) for the user, or None if there is no such user.
+        Listings embed content titles, so both counters go into their ETag. A primary-key lookup.
+        """
+        return db.session.query(User.reminder_version, User.content_version).filter(User.id == user_id).first()
+
+    def _bump_reminder_versions(self, user_ids):
+        """Marks the users' reminders as changed, in the current transaction."""
+        db.session.execute(
+            update(User).where(User.id.in_(user_ids)).values(reminder_version=User.reminder_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def get_due_reminders(self, now, limit=None):
+        """
+        Retrieves scheduled reminders whose time has come, oldest first.
+        User and content are loaded in the same query, so reading them costs no extra round trips.
+        """
+        query = Reminder.query.options(
+            joinedload(Reminder.user),
+            joinedload(Reminder.content)
+        ).filter(
+            Reminder.reminder_time <= now,
+            Reminder.status == 'scheduled'
+        ).order_by(Reminder.reminder_time.asc(), Reminder.id.asc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+
+    def reclaim_stale_leases(self, now):
+        """Returns reminders whose processor's lease expired (e.g. it crashed) to 'scheduled'. Returns the count."""
+        stale = and_(Reminder.status == 'processing', Reminder.lease_expires_at < now)
+        db.session.execute(
+            update(User).where(User.id.in_(select(Reminder.user_id).where(stale)))
+            .values(reminder_version=User.reminder_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        result = db.session.execute(
+            update(Reminder)
+            .where(stale)
+            .values(status='scheduled', lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def claim_due_reminders(self, now, limit, worker_id):
+        """
+        Atomically moves up to `limit` due reminders to 'processing' under a fresh lease and returns
+        (lease_owner, reminders), with user and content eager-loaded.
+        The claim is a single UPDATE over a sub-select. On Postgres the sub-select uses
+        FOR UPDATE SKIP LOCKED, so concurrent processors skip each other's rows instead of waiting;
+        SQLite ignores FOR UPDATE but runs the whole statement under its write lock, and the
+        outer status check makes the update conditional either way.
         """
-        print("\n--- REMINDER PROCESSOR: Checking for due reminders ---")
-        now = datetime.utcnow()
-        due_reminders = Reminder.query.filter(
+        lease_owner = f"{worker_id}/{uuid.uuid4().hex[:12]}" # Unique per claim, so we can find exactly our rows
+        lease_expires_at = now + timedelta(seconds=current_app.config.get('REMINDER_LEASE_SECONDS', 300))
+
+        candidates = select(Reminder.id).where(
             Reminder.reminder_time <= now,
             Reminder.status == 'scheduled'
-        ).all()
+        ).order_by(Reminder.reminder_time.asc(), Reminder.id.asc()).limit(limit).with_for_update(skip_locked=True)
+        claim = update(Reminder).where(
+            Reminder.id.in_(candidates.scalar_subquery()),
+            Reminder.status == 'scheduled'
+        ).values(
+            status='processing', lease_owner=lease_owner, lease_expires_at=lease_expires_at
+        ).execution_options(synchronize_session=False)
+
+        if db.session.get_bind().dialect.update_returning:
+            claimed_ids = db.session.execute(claim.returning(Reminder.id)).scalars().all()
+        else:
+            db.session.execute(claim)
+            claimed_ids = db.session.execute(
+                select(Reminder.id).where(Reminder.lease_owner == lease_owner)).scalars().all()
+        db.session.commit()
+
+        if not claimed_ids:
+            return lease_owner, []
+        reminders = Reminder.query.options(
+            joinedload(Reminder.user),
+            joinedload(Reminder.content)
+        ).filter(Reminder.id.in_(claimed_ids)).order_by(Reminder.reminder_time.asc(), Reminder.id.asc()).all()
+        return lease_owner, reminders
+
+    def _release_claimed(self, lease_owner, reminder_ids, status):
+        """
+        Sets the final status on reminders we still hold the lease for, in the current transaction.
+        Returns the ids actually released; a reminder whose lease expired and was reclaimed is left alone.
+        """
+        if not reminder_ids:
+            return []
+        held = and_(Reminder.id.in_(reminder_ids), Reminder.lease_owner == lease_owner)
+        if db.session.get_bind().dialect.update_returning:
+            return db.session.execute(
+                update(Reminder)
+                .where(held, Reminder.status == 'processing')
+                .values(status=status, lease_owner=None, lease_expires_at=None)
+                .returning(Reminder.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+        # Without RETURNING: set the status first, find our rows by lease, then drop the lease.
+        # The rows stay write-locked by this transaction in between, so no reclaim can slip in
+        db.session.execute(
+            update(Reminder).where(held, Reminder.status == 'processing').values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        released = db.session.execute(select(Reminder.id).where(held, Reminder.status == status)).scalars().all()
+        if released:
+            db.session.execute(
+                update(Reminder).where(Reminder.id.in_(released)).values(lease_owner=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+        return released
+
+    def process_due_reminders(self, batch_size=None, worker_id=None):
+        """
+        Processes reminders that are due, REMINDER_BATCH_SIZE at a time.
+        Each batch is claimed under a lease before sending, so any number of processors can run
+        side by side without sending the same reminder twice. Emails are written to the outbox in
+        the same transaction and delivered by EmailOutboxService.dispatch_pending. Each batch is
+        committed on its own, so a crash loses at most one batch (whose lease then expires and is reclaimed).
+        In a real app, this would run periodically via a background scheduler.
+        Returns a dict with counts of sent and failed reminders.
+        """
+        started = time.perf_counter()
+        batch_size = batch_size or current_app.config.get('REMINDER_BATCH_SIZE', 500)
+        worker_id = worker_id or current_app.config.get('REMINDER_WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+        now = datetime.utcnow() # Fixed for the run, so reminders that fall due meanwhile wait for the next one
+        stats = {'batches': 0, 'sent': 0, 'errors': 0, 'reclaimed': self.reclaim_stale_leases(now)}
 
-        email_sender = EmailSender() # Instantiate the mock sender
+        while True:
+            lease_owner, due_reminders = self.claim_due_reminders(now, batch_size, worker_id)
+            if not due_reminders:
+                break
 
-        for reminder in due_reminders:
-            user = User.query.get(reminder.user_id)
-            content = SavedContent.query.get(reminder.content_id)
+            sent_ids, error_ids, emails = [], [], []
+            for reminder in due_reminders:
+                user = reminder.user
+                content = reminder.content
 
-            if user and content:
-                subject = f"Reminder: Check out this saved item from {content.platform}"
-                body = f"Hi {user.email},\n\n" \
-                       f"You asked to be reminded about this saved item:\n\n" \
-                       f"Title: {content.title}\n" \
-                       f"URL: {content.url}\n" \
-                       f"Platform: {content.platform}\n\n" \
-                       f"Saved on: {content.saved_at.strftime('%Y-%m-%d %H:%M')}\n\n" \
-                       f"Best regards,\nYour App"
+                if user and content:
+                    subject = f"Reminder: Check out this saved item from {content.platform}"
+                    body = f"Hi {user.email},\n\n" \
+                           f"You asked to be reminded about this saved item:\n\n" \
+                           f"Title: {content.title}\n" \
+                           f"URL: {content.url}\n" \
+                           f"Platform: {content.platform}\n\n" \
+                           f"Saved on: {content.saved_at.strftime('%Y-%m-%d %H:%M')}\n\n" \
+                           f"Best regards,\nYour App"
 
-                # In a real app, handle email sending results and retries
-                email_sender.send_email(user.email, subject, body)
+                    # Delivery (and its retries) happens from the outbox, so a slow SMTP server can't stall this loop
+                    emails.append({'reminder_id': reminder.id, 'to_address': user.email,
+                                   'subject': subject, 'body': body})
 
-                reminder.status = 'sent'
-                print(f"--- REMINDER PROCESSOR: Sent reminder for user {user.id}, content {content.id} ---")
-            else:
-                # Content or User might have been deleted
-                reminder.status = 'error'
-                print(f"--- REMINDER PROCESSOR: Error processing reminder {reminder.id} - User or Content not found ---")
+                    sent_ids.append(reminder.id)
+                    logger.debug('reminder queued', extra={'reminder_id': reminder.id, 'user_id': user.id, 'content_id': content.id})
+                else:
+                    # Content or User might have been deleted
+                    error_ids.append(reminder.id)
+                    logger.warning('reminder user or content not found', extra={'reminder_id': reminder.id})
 
+            # Release first: if our lease expired and another processor reclaimed a reminder, it sends
+            # that email, not us. The outbox rows commit together with the status change, so a
+            # queued email is never lost
+            sent_ids = set(self._release_claimed(lease_owner, sent_ids, 'sent'))
+            error_ids = self._release_claimed(lease_owner, error_ids, 'error')
+            self.outbox.enqueue_many([email for email in emails if email['reminder_id'] in sent_ids])
+            self._bump_reminder_versions({reminder.user_id for reminder in due_reminders})
+            db.session.commit()
+            stats['batches'] += 1
+            stats['sent'] += len(sent_ids)
+            stats['errors'] += len(error_ids)
+            REMINDERS_PROCESSED.inc(len(sent_ids), result='sent')
+            REMINDERS_PROCESSED.inc(len(error_ids), result='error')
 
-        db.session.commit()
-        print("--- REMINDER PROCESSOR: Finished checking due reminders ---\n")
+        REMINDER_LEASES_RECLAIMED.inc(stats['reclaimed'])
+        REMINDER_RUN_SECONDS.observe(time.perf_counter() - started)
+        if stats['batches']:
+            logger.info('due reminders processed', extra=stats)
+        return stats
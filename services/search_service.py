@@ -0,0 +1,185 @@
+from models import db, SavedContent
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_, text
+import re
+
+# Columns returned for each search hit
+SEARCH_RESULT_FIELDS = ('id', 'platform', 'original_id', 'title', 'url', 'content_type', 'saved_at')
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SQLiteFTS5Backend:
+    """
+    Full-text index in a contentless FTS5 table kept in step with saved_content by triggers, so every
+    row sync_user_platform inserts (or updates, or deletes) is indexed in the same transaction.
+    The owner and platform are indexed as tokens, which lets FTS5 do the per-user filtering itself
+    instead of matching across every user's rows and discarding most of them afterwards.
+    """
+    name = 'sqlite_fts5'
+
+    INSTALL_DDL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS saved_content_fts USING fts5(
+            owner, platform, title, description,
+            content='', tokenize='unicode61 remove_diacritics 2')""",
+        """CREATE TRIGGER IF NOT EXISTS saved_content_fts_insert AFTER INSERT ON saved_content BEGIN
+            INSERT INTO saved_content_fts(rowid, owner, platform, title, description)
+            VALUES (new.id, 'u' || new.user_id, new.platform, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS saved_content_fts_delete AFTER DELETE ON saved_content BEGIN
+            INSERT INTO saved_content_fts(saved_content_fts, rowid, owner, platform, title, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.platform, old.title, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS saved_content_fts_update AFTER UPDATE ON saved_content BEGIN
+            INSERT INTO saved_content_fts(saved_content_fts, rowid, owner, platform, title, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.platform, old.title, old.description);
+            INSERT INTO saved_content_fts(rowid, owner, platform, title, description)
+            VALUES (new.id, 'u' || new.user_id, new.platform, new.title, new.description);
+        END""",
+    ]
+    DROP_DDL = [
+        "DROP TRIGGER IF EXISTS saved_content_fts_insert",
+        "DROP TRIGGER IF EXISTS saved_content_fts_delete",
+        "DROP TRIGGER IF EXISTS saved_content_fts_update",
+        "DROP TABLE IF EXISTS saved_content_fts",
+    ]
+
+    def install(self, connection):
+        for statement in self.INSTALL_DDL:
+            connection.exec_driver_sql(statement)
+
+    def drop(self, connection):
+        for statement in self.DROP_DDL:
+            connection.exec_driver_sql(statement)
+
+    def rebuild(self, connection):
+        """Re-indexes every saved_content row, e.g. for a database created before search existed."""
+        self.drop(connection)
+        self.install(connection)
+        connection.exec_driver_sql(
+            "INSERT INTO saved_content_fts(rowid, owner, platform, title, description) "
+            "SELECT id, 'u' || user_id, platform, title, description FROM saved_content")
+
+    def search(self, user_id, terms, platform, limit, offset):
+        # Every term is quoted (so user input can't inject FTS syntax); the last one also matches as a prefix
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        match = f"owner:u{int(user_id)} AND ({' '.join(quoted)})"
+        if platform:
+            match += ' AND platform:"{}"'.format(platform.replace('"', '""'))
+
+        columns = ', '.join(f'c.{field}' for field in SEARCH_RESULT_FIELDS)
+        # bm25 weights follow the FTS column order: owner, platform, title, description
+        return db.session.execute(text(
+            f"SELECT {columns}, bm25(saved_content_fts, 0.0, 0.0, 10.0, 1.0) AS rank "
+            "FROM saved_content_fts JOIN saved_content c ON c.id = saved_content_fts.rowid "
+            "WHERE saved_content_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ).columns(saved_at=db.DateTime), {'match': match, 'limit': limit, 'offset': offset}).all()
+
+
+class PostgresTsvectorBackend:
+    """
+    Full-text search on Postgres using a GIN expression index over to_tsvector(title || description).
+    Postgres maintains the index itself on every insert or update, so no triggers are needed.
+    """
+    name = 'postgres_tsvector'
+
+    DOCUMENT = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+    def install(self, connection):
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_saved_content_fts ON saved_content USING GIN ({self.DOCUMENT})")
+
+    def drop(self, connection):
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_saved_content_fts")
+
+    def rebuild(self, connection):
+        self.drop(connection)
+        self.install(connection)
+
+    def search(self, user_id, terms, platform, limit, offset):
+        # Same prefix-on-last-term behaviour as the SQLite backend
+        query = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+        platform_filter = 'AND c.platform = :platform' if platform else ''
+        columns = ', '.join(f'c.{field}' for field in SEARCH_RESULT_FIELDS)
+        return db.session.execute(text(
+            f"SELECT {columns}, ts_rank({self.DOCUMENT}, to_tsquery('simple', :query)) AS rank "
+            f"FROM saved_content c WHERE c.user_id = :user_id {platform_filter} "
+            f"AND {self.DOCUMENT} @@ to_tsquery('simple', :query) "
+            "ORDER BY rank DESC, c.id DESC LIMIT :limit OFFSET :offset"
+        ).columns(saved_at=db.DateTime), {'query': query, 'user_id': user_id, 'platform': platform, 'limit': limit, 'offset': offset}).all()
+
+
+class LikeBackend:
+    """Unindexed fallback for databases without a supported full-text engine. Scans the user's rows."""
+    name = 'like'
+
+    def install(self, connection):
+        pass
+
+    def drop(self, connection):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def search(self, user_id, terms, platform, limit, offset):
+        query = db.session.query(*[getattr(SavedContent, field) for field in SEARCH_RESULT_FIELDS]) \
+            .filter(SavedContent.user_id == user_id)
+        if platform:
+            query = query.filter(SavedContent.platform == platform)
+        for term in terms:
+            pattern = f'%{_escape_like(term)}%'
+            query = query.filter(or_(SavedContent.title.ilike(pattern, escape='\\'),
+                                     SavedContent.description.ilike(pattern, escape='\\')))
+        return query.order_by(SavedContent.saved_at.desc(), SavedContent.id.desc()).limit(limit).offset(offset).all()
+
+
+def _escape_like(term):
+    """Escapes LIKE's wildcards (terms are \\w+, so '_' can occur) so the term matches literally."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+BACKENDS = {backend.name: backend for backend in (SQLiteFTS5Backend(), PostgresTsvectorBackend(), LikeBackend())}
+
+
+def get_search_backend(dialect_name):
+    """Picks the backend named by SEARCH_BACKEND, or the native one for the dialect when it is 'auto'."""
+    configured = current_app.config.get('SEARCH_BACKEND', 'auto') if has_app_context() else 'auto'
+    if configured != 'auto':
+        return BACKENDS[configured]
+    if dialect_name == 'sqlite':
+        return BACKENDS['sqlite_fts5']
+    if dialect_name == 'postgresql':
+        return BACKENDS['postgres_tsvector']
+    return BACKENDS['like']
+
+
+@event.listens_for(SavedContent.__table__, 'after_create')
+def _install_search_index(target, connection, **kw):
+    get_search_backend(connection.dialect.name).install(connection)
+
+@event.listens_for(SavedContent.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    get_search_backend(connection.dialect.name).drop(connection)
+
+
+class SearchService:
+    def search(self, user_id, query, platform=None, limit=20, offset=0):
+        """
+        Ranked full-text search over the user's saved titles and descriptions.
+        Returns (rows, has_more); rows carry SEARCH_RESULT_FIELDS plus a backend-specific rank.
+        """
+        terms = _TERM_RE.findall(query or '')
+        if not terms:
+            return [], False
+        backend = get_search_backend(db.engine.dialect.name)
+        # Fetch one extra row to know whether another page exists
+        rows = backend.search(user_id, terms, platform, limit + 1, offset)
+        return rows[:limit], len(rows) > limit
+
+    def rebuild_index(self):
+        """Drops and rebuilds the search index from saved_content."""
+        with db.engine.begin() as connection:
+            get_search_backend(connection.dialect.name).rebuild(connection)
@@ -0,0 +1,390 @@
+from models import db, SyncJob
+from flask import current_app
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from services.data_aggregator_service import DataAggregatorService
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class JobLeaseLost(Exception):
+    """Raised inside a running job when another worker has reclaimed it."""
+
+
+class SyncJobService:
+    """
+    Durable queue of sync jobs in the SyncJob table; no broker needed, SQLite works.
+    Routes enqueue and return at once. Workers claim jobs with the same single-UPDATE lease as the
+    reminder and email outbox processors, run them, and retry failures with exponential backoff.
+    """
+
+    def __init__(self):
+        self.data_aggregator = DataAggregatorService()
+
+    # --- Enqueueing ---
+
+    def enqueue_platform_sync(self, user_id, platform, full=False):
+        """
+        Queues a sync of one account and commits. Returns (job, coalesced).
+        If the account already has a queued job, a running one whose lease is live, or (unless `full`)
+        one that succeeded within SYNC_MIN_INTERVAL_SECONDS, that job is returned with coalesced=True
+        instead. A `full` trigger joining a queued job turns it into a full resync.
+        """
+        # A job left 'running' by a dead worker would otherwise swallow every trigger until reclaimed
+        self.reclaim_stale_leases(datetime.utcnow(), user_id=user_id, platform=platform)
+        job = self._find_coalescable_job(user_id, platform, full)
+        if job is not None:
+            return job, True
+
+        job = SyncJob(kind='platform', user_id=user_id, platform=platform, full_resync=full)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent trigger queued one first (ux_sync_job_active_account); join it
+            db.session.rollback()
+            job = self._find_coalescable_job(user_id, platform, full)
+            if job is None:
+                raise
+            return job, True
+        return job, False
+
+    def _find_coalescable_job(self, user_id, platform, full):
+        now = datetime.utcnow()
+        active = SyncJob.query.filter(
+            SyncJob.kind == 'platform', SyncJob.user_id == user_id, SyncJob.platform == platform,
+            or_(SyncJob.status == 'queued', and_(SyncJob.status == 'running', SyncJob.lease_expires_at >= now))
+        ).first()
+        if active is not None and full and active.status == 'queued' and not active.full_resync:
+            db.session.execute(
+                update(SyncJob).where(SyncJob.id == active.id, SyncJob.status == 'queued')
+                .values(full_resync=True).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            db.session.refresh(active)
+        if active is not None or full:
+            return active
+        min_interval = current_app.config.get('SYNC_MIN_INTERVAL_SECONDS', 0)
+        if not min_interval:
+            return None
+        return SyncJob.query.filter(
+            SyncJob.kind == 'platform', SyncJob.user_id == user_id, SyncJob.platform == platform,
+            SyncJob.status == 'succeeded',
+            SyncJob.finished_at > datetime.utcnow() - timedelta(seconds=min_interval)
+        ).order_by(SyncJob.finished_at.desc()).first()
+
+    def enqueue_full_sync(self):
+        """Queues a sync of every linked account and commits. Returns the job."""
+        job = SyncJob(kind='full')
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    # --- Status ---
+
+    def get_job_status(self, job_id):
+        """Returns the job's status and progress as a dict, or None if there is no such job."""
+        job = db.session.get(SyncJob, job_id)
+        if job is None:
+            return None
+        status = {
+            'id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'user_id': job.user_id,
+            'platform': job.platform,
+            'attempts': job.attempts,
+            'pages': job.pages,
+            'items_added': job.items_added,
+            'created_at': _isoformat(job.created_at),
+            'started_at': _isoformat(job.started_at),
+            'finished_at': _isoformat(job.finished_at),
+            'elapsed_seconds': _elapsed(job.started_at, job.finished_at),
+            'last_error': job.last_error,
+            'result': json.loads(job.result) if job.result else None
+        }
+        if job.kind == 'full' and job.status == 'succeeded':
+            self._add_children_progress(job, status)
+        return status
+
+    def _add_children_progress(self, job, status):
+        """A fanned-out full sync is running until all of its platform jobs have finished."""
+        counts = {'queued': 0, 'running': 0, 'succeeded': 0, 'failed': 0}
+        items_added = pages = 0
+        finished_at = None
+        rows = db.session.query(SyncJob.status, func.count(), func.sum(SyncJob.items_added),
+                                func.sum(SyncJob.pages), func.max(SyncJob.finished_at)) \
+            .filter(SyncJob.parent_id == job.id).group_by(SyncJob.status)
+        for child_status, count, child_items, child_pages, child_finished_at in rows:
+            counts[child_status] = count
+            items_added += child_items or 0
+            pages += child_pages or 0
+            if child_finished_at and (finished_at is None or child_finished_at > finished_at):
+                finished_at = child_finished_at
+
+        if counts['queued'] or counts['running']:
+            status['status'], finished_at = 'running', None
+        else:
+            finished_at = finished_at or job.finished_at
+            if counts['failed']:
+                status['status'] = 'completed_with_errors'
+        status['jobs'] = dict(counts, total=sum(counts.values()))
+        status['items_added'] = items_added
+        status['pages'] = pages
+        status['finished_at'] = _isoformat(finished_at)
+        status['elapsed_seconds'] = _elapsed(job.started_at, finished_at)
+
+    # --- Claiming ---
+
+    def reclaim_stale_leases(self, now, user_id=None, platform=None):
+        """Requeues running jobs whose worker's lease expired (only the account's, if given). Returns the count."""
+        stale = update(SyncJob).where(SyncJob.status == 'running', SyncJob.lease_expires_at < now)
+        if user_id is not None:
+            stale = stale.where(SyncJob.user_id == user_id, SyncJob.platform == platform)
+        result = db.session.execute(
+            stale
+            .values(status='queued', lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def claim_job(self, now, worker_id):
+        """Atomically moves the oldest due job to 'running'. Returns (lease_owner, job_id) or None."""
+        lease_owner = f"{worker_id}/{uuid.uuid4().hex[:12]}"
+        lease_expires_at = now + timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+
+        candidates = select(SyncJob.id).where(
+            SyncJob.status == 'queued',
+            SyncJob.next_attempt_at <= now
+        ).order_by(SyncJob.next_attempt_at.asc(), SyncJob.id.asc()).limit(1).with_for_update(skip_locked=True)
+        claim = update(SyncJob).where(
+            SyncJob.id.in_(candidates.scalar_subquery()),
+            SyncJob.status == 'queued'
+        ).values(
+            status='running', lease_owner=lease_owner, lease_expires_at=lease_expires_at,
+            attempts=SyncJob.attempts + 1, started_at=func.coalesce(SyncJob.started_at, now)
+        ).execution_options(synchronize_session=False)
+
+        if db.session.get_bind().dialect.update_returning:
+            job_id = db.session.execute(claim.returning(SyncJob.id)).scalar()
+        else:
+            db.session.execute(claim)
+            job_id = db.session.execute(select(SyncJob.id).where(SyncJob.lease_owner == lease_owner)).scalar()
+        db.session.commit()
+        return (lease_owner, job_id) if job_id is not None else None
+
+    # --- Running ---
+
+    def run_job(self, job_id, lease_owner):
+        """Runs a claimed job and records the outcome. Returns the job's new status."""
+        job = db.session.get(SyncJob, job_id)
+        try:
+            if job.kind == 'full':
+                result = self._fan_out_full_sync(job)
+            else:
+                result = self._run_platform_job(job, lease_owner)
+        except JobLeaseLost:
+            db.session.rollback()
+            logger.warning('lost job lease to another worker', extra={'job_id': job_id})
+            return 'lost'
+        except Exception as e:
+            db.session.rollback()
+            return self._record_failure(job_id, lease_owner, repr(e))
+
+        if result is None:
+            # Unsupported platform, unlinked account or no token: retrying won't help
+            return self._finish(job_id, lease_owner, 'failed', last_error='sync returned no result')
+        return self._finish(job_id, lease_owner, 'succeeded', result=json.dumps(result, default=str),
+                            last_error=None)
+
+    def _run_platform_job(self, job, lease_owner):
+        job_id, user_id, platform, full = job.id, job.user_id, job.platform, job.full_resync
+        interval = current_app.config.get('JOB_PROGRESS_INTERVAL_SECONDS', 1.0)
+        last_report = [time.monotonic()]
+
+        def progress(pages, items_added):
+            # Also renews the lease, so a long sync isn't reclaimed while it is still making progress
+            if time.monotonic() - last_report[0] < interval:
+                return
+            last_report[0] = time.monotonic()
+            self._report_progress(job_id, lease_owner, pages=pages, items_added=items_added)
+
+        result = self.data_aggregator.sync_user_platform(user_id, platform, full=full, progress=progress)
+        if result is not None:
+            self._report_progress(job_id, lease_owner, pages=result['pages'], items_added=result['items_added'])
+        return result
+
+    def _fan_out_full_sync(self, job):
+        """
+        Queues one platform job per linked account, in batches. Accounts that already have a queued
+        or running job are skipped; that job syncs them. Returns {'jobs': queued, 'coalesced': skipped}.
+        """
+        parent_id = job.id
+        now = datetime.utcnow()
+        # Expired 'running' jobs still hold ux_sync_job_active_account; requeue them so they sync these accounts
+        self.reclaim_stale_leases(now)
+        batch, queued, accounts = [], 0, 0
+        for user_id, platform in self.data_aggregator._iter_sync_jobs():
+            accounts += 1
+            batch.append({'kind': 'platform', 'user_id': user_id, 'platform': platform, 'full_resync': False,
+                          'parent_id': parent_id, 'status': 'queued', 'attempts': 0, 'pages': 0,
+                          'items_added': 0, 'next_attempt_at': now, 'created_at': now})
+            if len(batch) >= current_app.config.get('SYNC_BATCH_SIZE', 500):
+                queued += self._insert_jobs(batch)
+                batch = []
+        if batch:
+            queued += self._insert_jobs(batch)
+        logger.info('full sync fanned out', extra={'job_id': parent_id, 'queued': queued, 'already_queued': accounts - queued})
+        return {'jobs': queued, 'coalesced': accounts - queued}
+
+    def _insert_jobs(self, rows):
+        """Bulk-inserts jobs, skipping accounts that already have an active job. Returns the count inserted."""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            stmt = postgresql_insert(SyncJob.__table__).on_conflict_do_nothing()
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(SyncJob.__table__).on_conflict_do_nothing()
+        else:
+            stmt = insert(SyncJob.__table__)
+        result = db.session.execute(stmt, rows)
+        db.session.commit()
+        return result.rowcount if result.rowcount >= 0 else len(rows)
+
+    def _report_progress(self, job_id, lease_owner, **values):
+        lease_expires_at = datetime.utcnow() + timedelta(seconds=current_app.config.get('JOB_LEASE_SECONDS', 300))
+        result = db.session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.lease_owner == lease_owner)
+            .values(lease_expires_at=lease_expires_at, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 0:
+            raise JobLeaseLost(job_id)
+
+    def _finish(self, job_id, lease_owner, status, **values):
+        result = db.session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.lease_owner == lease_owner)
+            .values(status=status, finished_at=datetime.utcnow(), lease_owner=None, lease_expires_at=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return status if result.rowcount else 'lost'
+
+    def _record_failure(self, job_id, lease_owner, error):
+        """Requeues the job with exponential backoff and jitter, or fails it after JOB_MAX_ATTEMPTS."""
+        attempts = db.session.query(SyncJob.attempts).filter(SyncJob.id == job_id).scalar() or 0
+        logger.warning('job failed', extra={'job_id': job_id, 'attempt': attempts, 'error': error})
+        if attempts >= current_app.config.get('JOB_MAX_ATTEMPTS', 3):
+            return self._finish(job_id, lease_owner, 'failed', last_error=error)
+        delay = current_app.config.get('JOB_RETRY_BASE_SECONDS', 30) * (2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        result = db.session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.lease_owner == lease_owner)
+            .values(status='queued', next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                    last_error=error, lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return 'queued' if result.rowcount else 'lost'
+
+    def work(self, worker_id, stop_event, exit_when_idle=False):
+        """
+        Claims and runs jobs until `stop_event` is set (or, with `exit_when_idle`, until no job is due).
+        Runs on a worker thread inside an app context. Returns the number of jobs run.
+        Every JOB_RECLAIM_INTERVAL_SECONDS it also requeues jobs whose worker died holding them.
+        """
+        poll_interval = current_app.config.get('JOB_POLL_INTERVAL_SECONDS', 1.0)
+        reclaim_interval = current_app.config.get('JOB_RECLAIM_INTERVAL_SECONDS', 30)
+        next_reclaim = 0.0
+        ran = 0
+        while not stop_event.is_set():
+            if time.monotonic() >= next_reclaim:
+                next_reclaim = time.monotonic() + reclaim_interval
+                reclaimed = self.reclaim_stale_leases(datetime.utcnow())
+                if reclaimed:
+                    logger.info('reclaimed expired job leases', extra={'worker_id': worker_id, 'jobs': reclaimed})
+            claimed = self.claim_job(datetime.utcnow(), worker_id)
+            if claimed is None:
+                if exit_when_idle:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            lease_owner, job_id = claimed
+            self.run_job(job_id, lease_owner)
+            ran += 1
+        return ran
+
+
+class JobWorker:
+    """
+    Runs JOB_WORKER_CONCURRENCY threads that each claim and run sync jobs.
+    Start one per process with `flask run-job-worker`, or inside the web app with JOB_WORKER_ENABLED.
+    """
+
+    def __init__(self):
+        self._threads = []
+        self._stop_event = threading.Event()
+        self.jobs_run = 0
+        self._lock = threading.Lock()
+
+    def start(self, app, concurrency=None, exit_when_idle=False):
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop_event.clear()
+        concurrency = concurrency or app.config.get('JOB_WORKER_CONCURRENCY', 4)
+        worker_id = app.config.get('JOB_WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = [
+            threading.Thread(target=self._run, args=(app, f"{worker_id}-{index}", exit_when_idle),
+                             name=f'sync-job-worker-{index}', daemon=True)
+            for index in range(concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info('job workers started', extra={'threads': concurrency})
+
+    def _run(self, app, worker_id, exit_when_idle):
+        service = SyncJobService()
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    ran = service.work(worker_id, self._stop_event, exit_when_idle)
+                with self._lock:
+                    self.jobs_run += ran
+                if exit_when_idle:
+                    return
+            except Exception: # e.g. the database is unreachable; back off and keep the thread alive
+                logger.exception('job worker error', extra={'worker_id': worker_id})
+                self._stop_event.wait(5)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.join(timeout)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _elapsed(started_at, finished_at):
+    if started_at is None:
+        return None
+    return round(((finished_at or datetime.utcnow()) - started_at).total_seconds(), 3)
+
+
+job_worker = JobWorker()
@@ -0,0 +1,237 @@
+from models import db, PlatformAccount
+from flask import current_app
+from sqlalchemy import or_, select, update
+from services.data_aggregator_service import AccountLeaseLost, DataAggregatorService
+from utils.metrics import metrics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Services create_app() starts from the environment; a shard process runs none of them
+# (`flask run-sync-workers` runs the host's token refresher in the supervisor process)
+BACKGROUND_WORKER_FLAGS = ('JOB_WORKER_ENABLED', 'REMINDER_SCHEDULER_ENABLED', 'TOKEN_REFRESHER_ENABLED')
+RESTART_DELAY_SECONDS = 5 # Minimum wait before a crashed shard process is started again
+
+SHARD_SYNCS = metrics.counter('sync_shard_syncs_total', 'Account syncs run by shard workers, by outcome.',
+                              ('shard', 'outcome'))
+
+
+def shard_of(user_id, shard_count):
+    """The shard that owns `user_id`'s accounts; the same mapping the shard queries use in SQL."""
+    return user_id % shard_count
+
+
+def split_rate_limits(rate_limits, shard_count):
+    """
+    Divides each platform's app-wide quota (requests_per_second, burst) between `shard_count` processes,
+    whose limiters can't see each other. Per-credential limits stay whole: every account, and so every
+    token, belongs to a single shard.
+    """
+    split = {}
+    for platform, settings in rate_limits.items():
+        settings = dict(settings)
+        if 'requests_per_second' in settings:
+            settings['requests_per_second'] = settings['requests_per_second'] / shard_count
+        if 'burst' in settings:
+            settings['burst'] = max(1, settings['burst'] // shard_count)
+        split[platform] = settings
+    return split
+
+
+class SyncShardService:
+    """
+    Keeps one shard of the linked accounts synced: those whose user_id % shard_count == shard_index.
+    Accounts are due SYNC_SHARD_INTERVAL_SECONDS after their last sync, stalest first.
+
+    The partition only keeps shards from competing for the same rows; what keeps an account from
+    being synced by two workers at once is its lease (PlatformAccount.sync_lease_*), which every
+    sync takes through DataAggregatorService.sync_user_platform, job workers included. Shards claim
+    the lease in bulk and hand it to the sync. That also covers resharding: while processes started
+    with the old and the new shard count overlap, the second one to reach an account skips it.
+    """
+
+    def __init__(self, shard_index, shard_count):
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f'Shard index {shard_index} is outside 0..{shard_count - 1}')
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.data_aggregator = DataAggregatorService()
+
+    def _in_shard(self):
+        return PlatformAccount.user_id % self.shard_count == self.shard_index
+
+    def _lease_free(self, now):
+        return or_(PlatformAccount.sync_lease_expires_at.is_(None), PlatformAccount.sync_lease_expires_at < now)
+
+    def claim_accounts(self, now, limit, worker_id):
+        """
+        Atomically leases up to `limit` of the shard's due accounts. Returns (lease_owner, [(account_id,
+        user_id, platform)]). A single UPDATE over a sub-select, like the job and reminder claims: FOR
+        UPDATE SKIP LOCKED on Postgres, SQLite's write lock otherwise.
+        """
+        config = current_app.config
+        lease_owner = f"{worker_id}/{uuid.uuid4().hex[:12]}"
+        lease_expires_at = now + timedelta(seconds=config.get('SYNC_ACCOUNT_LEASE_SECONDS', 300))
+        due_before = now - timedelta(seconds=config.get('SYNC_SHARD_INTERVAL_SECONDS', 900))
+
+        candidates = select(PlatformAccount.id).where(
+            self._in_shard(),
+            or_(PlatformAccount.last_synced_at.is_(None), PlatformAccount.last_synced_at <= due_before),
+            self._lease_free(now)
+        ).order_by(PlatformAccount.last_synced_at.asc().nulls_first(), PlatformAccount.id.asc()) \
+            .limit(limit).with_for_update(skip_locked=True)
+        claim = update(PlatformAccount).where(
+            PlatformAccount.id.in_(candidates.scalar_subquery()),
+            self._lease_free(now)
+        ).values(
+            sync_lease_owner=lease_owner, sync_lease_expires_at=lease_expires_at
+        ).execution_options(synchronize_session=False)
+
+        columns = (PlatformAccount.id, PlatformAccount.user_id, PlatformAccount.platform)
+        if db.session.get_bind().dialect.update_returning:
+            claimed = db.session.execute(claim.returning(*columns)).all()
+        else:
+            db.session.execute(claim)
+            claimed = db.session.execute(select(*columns).where(PlatformAccount.sync_lease_owner == lease_owner)).all()
+        db.session.commit()
+        return lease_owner, [tuple(row) for row in claimed]
+
+    def sync_account(self, account_id, user_id, platform, lease_owner):
+        """Syncs one claimed account and releases it. Returns 'synced', 'failed' or 'lost'. Never raises."""
+        try:
+            # The sync renews our lease as it saves pages
+            result = self.data_aggregator.sync_user_platform(user_id, platform, lease_owner=lease_owner)
+        except AccountLeaseLost:
+            db.session.rollback()
+            logger.warning('lost account lease to another worker', extra={'account_id': account_id})
+            return 'lost'
+        except Exception:
+            db.session.rollback()
+            logger.exception('shard sync failed', extra={'user_id': user_id, 'platform': platform,
+                                                         'shard': self.shard_index})
+            result = None
+
+        if result is None: # Failed, no account or no token: back off rather than retry on the next claim
+            self.data_aggregator.release_account_lease(account_id, lease_owner,
+                                                       retry_after=current_app.config.get('SYNC_SHARD_RETRY_SECONDS', 300))
+            return 'failed'
+        self.data_aggregator.release_account_lease(account_id, lease_owner)
+        return 'synced'
+
+    def run(self, worker_id, stop_event, concurrency=None):
+        """
+        Claims and syncs the shard's due accounts, `concurrency` at a time, until `stop_event` is set.
+        Runs inside an app context; each sync thread pushes its own (and so gets its own DB session).
+        Returns the number of syncs run.
+        """
+        app = current_app._get_current_object()
+        concurrency = concurrency or app.config.get('SYNC_SHARD_CONCURRENCY', 4)
+        poll_interval = app.config.get('SYNC_SHARD_POLL_SECONDS', 5.0)
+        shard = str(self.shard_index)
+        ran = 0
+
+        def sync_in_context(account):
+            with app.app_context():
+                return self.sync_account(*account, lease_owner)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'shard-{shard}') as executor:
+            while not stop_event.is_set():
+                try:
+                    # One batch per round, sized to the pool, so no claimed account waits out its lease in a queue
+                    lease_owner, accounts = self.claim_accounts(datetime.utcnow(), concurrency, worker_id)
+                except Exception: # e.g. the database is unreachable; back off and keep the shard alive
+                    db.session.rollback()
+                    logger.exception('shard claim failed', extra={'shard': self.shard_index})
+                    stop_event.wait(poll_interval)
+                    continue
+                if not accounts:
+                    stop_event.wait(poll_interval)
+                    continue
+                for outcome in executor.map(sync_in_context, accounts):
+                    SHARD_SYNCS.inc(shard=shard, outcome=outcome)
+                    ran += 1
+        return ran
+
+
+def run_shard_process(shard_index, shard_count, stop_event, concurrency=None):
+    """
+    Entry point of one shard worker process. The process builds its own app (and so its own engine
+    and connection pool) and stops once `stop_event` is set.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl-C reaches the whole group; the supervisor stops us
+    from app import create_app # Imported here: the app module imports the services
+
+    # Passed to create_app, not set in os.environ: Config has already read the environment on import
+    app = create_app({flag: False for flag in BACKGROUND_WORKER_FLAGS})
+    app.config['PLATFORM_RATE_LIMITS'] = split_rate_limits(app.config.get('PLATFORM_RATE_LIMITS', {}), shard_count)
+    worker_id = f"{app.config.get('SYNC_SHARD_WORKER_ID') or socket.gethostname()}:{os.getpid()}/shard-{shard_index}"
+    logger.info('shard worker started', extra={'shard': shard_index, 'shard_count': shard_count, 'pid': os.getpid()})
+    with app.app_context():
+        ran = SyncShardService(shard_index, shard_count).run(worker_id, stop_event, concurrency)
+    logger.info('shard worker stopped', extra={'shard': shard_index, 'syncs': ran})
+
+
+class ShardSupervisor:
+    """
+    Starts one process per shard, restarts any that dies and stops them all on SIGINT/SIGTERM.
+    `shards` are the indexes this host runs out of `shard_count` in total (default: all of them),
+    so several hosts can split one shard space. Processes are spawned rather than forked, so no
+    database connection or lock is inherited from the parent.
+    """
+
+    def __init__(self, shard_count, shards=None, concurrency=None):
+        self.shard_count = shard_count
+        self.shards = list(range(shard_count)) if shards is None else list(shards)
+        if not self.shards or any(not 0 <= shard < shard_count for shard in self.shards):
+            raise ValueError(f'Shards {self.shards} must be within 0..{shard_count - 1}')
+        self.concurrency = concurrency
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._processes = {}
+        self._started_at = {}
+
+    def run(self):
+        """Blocks until stopped; returns after every shard process has exited."""
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: self._stop_event.set())
+        try:
+            for shard in self.shards:
+                self._start(shard)
+            logger.info('shard supervisor started', extra={'shards': len(self.shards), 'shard_count': self.shard_count})
+            while not self._stop_event.is_set():
+                self._stop_event.wait(1)
+                for shard, process in list(self._processes.items()):
+                    if not process.is_alive() and not self._stop_event.is_set() \
+                            and time.monotonic() - self._started_at[shard] >= RESTART_DELAY_SECONDS:
+                        logger.warning('shard worker exited, restarting',
+                                       extra={'shard': shard, 'exit_code': process.exitcode})
+                        self._start(shard)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    def stop(self, timeout=60):
+        """Asks every shard to finish its current batch and exit; terminates any still running after `timeout`."""
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def _start(self, shard):
+        process = self._context.Process(target=run_shard_process, name=f'sync-shard-{shard}',
+                                        args=(shard, self.shard_count, self._stop_event, self.concurrency))
+        process.start()
+        self._processes[shard] = process
+        self._started_at[shard] = time.monotonic()
@@ -0,0 +1,213 @@
+from models import db, PlatformAccount
+from config import Config
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import urllib.parse
+import urllib.request
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class TokenRefreshError(Exception):
+    """Raised when a platform's token endpoint refuses or fails a refresh."""
+
+
+class TokenManager:
+    """
+    Hands out valid access tokens for PlatformAccounts.
+
+    Tokens are cached in memory per account. A background thread refreshes every account whose token
+    expires within TOKEN_REFRESH_LEEWAY_SECONDS, so a sync normally finds a fresh token and never waits
+    on the token endpoint. If a sync does get a token that is about to expire, it refreshes inline;
+    concurrent refreshes of the same account collapse into one call behind a per-account lock.
+    New tokens are saved through AuthService.store_tokens, the same path the OAuth callback uses.
+    """
+
+    def __init__(self):
+        self._cache = {} # account_id -> (access_token, expires_at)
+        self._cache_lock = threading.Lock()
+        # account_id -> [Lock, callers using it], so each account has at most one refresh in flight;
+        # an entry is dropped once no caller needs it, so the map only holds accounts being refreshed
+        self._refresh_locks = {}
+        self._lock = threading.Lock() # Guards _refresh_locks and refresh_count
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.refresh_count = 0 # Calls made to token endpoints, for monitoring
+
+    # --- Cache ---
+
+    def prime(self, account):
+        """Caches the tokens just stored for `account` (e.g. after the OAuth callback)."""
+        with self._cache_lock:
+            self._cache[account.id] = (account.access_token, account.expires_at)
+
+    def _cached(self, account_id, min_validity):
+        with self._cache_lock:
+            cached = self._cache.get(account_id)
+        if cached and _valid_for(cached[1], min_validity):
+            return cached[0]
+        return None
+
+    # --- Public API ---
+
+    def get_access_token(self, account):
+        """
+        Returns an access token for `account` that stays valid for at least TOKEN_MIN_VALIDITY_SECONDS.
+        Only refreshes inline when neither the cache nor the stored account has such a token.
+        Raises TokenRefreshError if that refresh fails.
+        """
+        min_validity = self._config('TOKEN_MIN_VALIDITY_SECONDS', 30)
+        token = self._cached(account.id, min_validity)
+        if token:
+            return token
+        if _valid_for(account.expires_at, min_validity):
+            self.prime(account)
+            return account.access_token
+        return self.refresh(account.id, min_validity=min_validity)
+
+    def refresh(self, account_id, min_validity=None):
+        """
+        Refreshes the account's token, unless another caller already did while we waited for the lock.
+        `min_validity` is how long the current token must stay valid to skip the refresh; by default
+        it is the background leeway. Returns the access token.
+        """
+        if min_validity is None:
+            min_validity = self._config('TOKEN_REFRESH_LEEWAY_SECONDS', 300)
+
+        with self._refresh_lock(account_id):
+            # Whoever held the lock before us may have refreshed this account already
+            token = self._cached(account_id, min_validity)
+            if token:
+                return token
+
+            account = db.session.get(PlatformAccount, account_id)
+            if account is None:
+                raise TokenRefreshError(f'Platform account {account_id} no longer exists')
+            db.session.refresh(account) # Another process may have refreshed it since we loaded it
+            if _valid_for(account.expires_at, min_validity):
+                self.prime(account)
+                return account.access_token
+            if not account.refresh_token:
+                raise TokenRefreshError(f'No refresh token for {account.platform} account {account_id}')
+
+            access_token, refresh_token, expires_at = self._request_refresh(account.platform, account.refresh_token)
+            from services.auth_service import AuthService # Imported here to avoid a circular import
+            account = AuthService().store_tokens(account.user_id, account.platform,
+                                                 access_token, refresh_token, expires_at)
+            self.prime(account)
+            logger.info('refreshed platform token', extra={'user_id': account.user_id, 'platform': account.platform})
+            return access_token
+
+    def refresh_expiring(self, limit=None):
+        """Refreshes accounts whose tokens expire within the leeway. Returns (refreshed, failed) counts."""
+        leeway = self._config('TOKEN_REFRESH_LEEWAY_SECONDS', 300)
+        limit = limit or self._config('TOKEN_REFRESH_BATCH_SIZE', 500)
+        account_ids = db.session.query(PlatformAccount.id).filter(
+            PlatformAccount.expires_at < datetime.utcnow() + timedelta(seconds=leeway),
+            PlatformAccount.refresh_token.isnot(None)
+        ).order_by(PlatformAccount.expires_at.asc()).limit(limit).all()
+        db.session.rollback()
+
+        refreshed = failed = 0
+        for (account_id,) in account_ids:
+            try:
+                self.refresh(account_id, min_validity=leeway)
+                refreshed += 1
+            except Exception as e:
+                db.session.rollback()
+                failed += 1
+                logger.warning('background token refresh failed', extra={'account_id': account_id, 'error': repr(e)})
+        return refreshed, failed
+
+    # --- Background refresher ---
+
+    def start(self, app):
+        """Starts the background refresher thread for `app`. Does nothing if it is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name='token-refresher', daemon=True)
+        self._thread.start()
+        logger.info('background token refresher started')
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, app):
+        interval = app.config.get('TOKEN_REFRESH_INTERVAL_SECONDS', 60)
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self.refresh_expiring()
+            except Exception:
+                logger.exception('background token refresh pass failed')
+            self._stop_event.wait(interval)
+
+    # --- Internals ---
+
+    @contextmanager
+    def _refresh_lock(self, account_id):
+        """Holds the account's refresh lock for the block."""
+        with self._lock:
+            entry = self._refresh_locks.get(account_id)
+            if entry is None:
+                entry = self._refresh_locks[account_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._refresh_locks[account_id]
+
+    def _config(self, key, default):
+        from flask import current_app, has_app_context
+        return current_app.config.get(key, default) if has_app_context() else getattr(Config, key, default)
+
+    def _request_refresh(self, platform, refresh_token):
+        """
+        Exchanges a refresh token at the platform's token endpoint. Returns (access_token, refresh_token,
+        expires_at); refresh_token is None when the platform doesn't rotate it. Without a configured
+        token_url this mocks the exchange, like AuthService.handle_oauth_callback does.
+        """
+        creds = self._config('PLATFORM_CREDS', {}).get(platform, {})
+        with self._lock:
+            self.refresh_count += 1
+        token_url = creds.get('token_url')
+        if not token_url:
+            return f"mock_access_token_{uuid.uuid4()}", None, datetime.utcnow() + timedelta(hours=1)
+
+        body = urllib.parse.urlencode({
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': creds.get('client_id'),
+            'client_secret': creds.get('client_secret')
+        }).encode()
+        request = urllib.request.Request(token_url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        try:
+            with urllib.request.urlopen(request, timeout=self._config('TOKEN_REQUEST_TIMEOUT_SECONDS', 10)) as response:
+                payload = json.loads(response.read())
+        except (OSError, ValueError) as e: # URLError/HTTPError are OSErrors, bad JSON is a ValueError
+            raise TokenRefreshError(f'{platform} token refresh failed: {e}') from e
+
+        if 'access_token' not in payload:
+            raise TokenRefreshError(f"{platform} token endpoint returned no access_token: {payload.get('error')}")
+        expires_at = datetime.utcnow() + timedelta(seconds=int(payload.get('expires_in', 3600)))
+        return payload['access_token'], payload.get('refresh_token'), expires_at
+
+
+def _valid_for(expires_at, seconds):
+    """True if a token expiring at `expires_at` (None = never) is still valid `seconds` from now."""
+    return expires_at is None or expires_at > datetime.utcnow() + timedelta(seconds=seconds)
+
+
+# Shared by AuthService (which primes it) and the sync paths (which read from it)
+token_manager = TokenManager()
@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app # noqa: E402
+from config import Config # noqa: E402
+from models import db # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app on a fresh SQLite database, with every background worker off."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    for flag in ('JOB_WORKER_ENABLED', 'REMINDER_SCHEDULER_ENABLED', 'TOKEN_REFRESHER_ENABLED'):
+        monkeypatch.setattr(Config, flag, False)
+    monkeypatch.setattr(Config, 'MOCK_FETCH_LATENCY_SECONDS', 0.0)
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def run_in_threads(app):
+    """Runs `target(index)` in `count` threads, each in its own app context, and returns the results in order."""
+    def run(target, count):
+        results = [None] * count
+        errors = []
+        barrier = threading.Barrier(count)
+
+        def worker(index):
+            with app.app_context():
+                try:
+                    barrier.wait()
+                    results[index] = target(index)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    return run
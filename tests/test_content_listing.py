@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+
+from models import db, Reminder, SavedContent, User
+from services.data_aggregator_service import DataAggregatorService
+from services.reminder_service import ReminderService
+from utils.cache import LRUTTLCache, get_app_cache
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def library(app):
+    """User 1 with five saved items, all saved at the same instant."""
+    db.session.add(User(id=1, email='user1@example.com'))
+    saved_at = datetime(2023, 10, 26, 10, 0, 0)
+    db.session.add_all([SavedContent(user_id=1, platform='youtube', original_id=f'video{number}',
+                                     title=f'Video {number}', saved_at=saved_at) for number in range(5)])
+    db.session.commit()
+
+
+def listing(client, **params):
+    headers = {'If-None-Match': params.pop('etag')} if 'etag' in params else {}
+    return client.get('/api/content/', query_string={'user_id': 1, **params}, headers=headers)
+
+
+@pytest.mark.parametrize('params', [
+    {'cursor': 'not-a-cursor'},
+    {'fields': 'id,password'},
+])
+def test_bad_parameters_get_400_even_when_any_etag_matches(client, library, params):
+    response = listing(client, etag='*', **params)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('body', [
+    {'user_id': 1, 'platform': ['youtube']},
+    {'user_id': 1, 'platform': 'myspace'},
+    {'user_id': 1, 'cursor': 12},
+    {'user_id': 1, 'fields': [1]},
+])
+def test_bad_parameters_in_the_body_get_400(client, library, body):
+    listing(client) # Caches the first page
+
+    assert client.post('/api/content/', json=body).status_code == 400
+
+
+def test_export_rejects_unknown_platform(client, library):
+    response = client.post('/api/content/export', json={'user_id': 1, 'platform': {'name': 'youtube'}})
+
+    assert response.status_code == 400
+
+
+def test_pages_follow_next_cursor_through_equal_saved_at(client, library):
+    ids, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = listing(client, **params).get_json()
+        ids += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    # Every row once, newest first; id breaks the tie between rows saved at the same instant
+    assert ids == sorted((row.id for row in SavedContent.query), reverse=True)
+
+
+def test_fields_and_platform_narrow_the_listing(client, library):
+    db.session.add(SavedContent(user_id=1, platform='reddit', original_id='post1', title='Post'))
+    db.session.commit()
+
+    items = listing(client, platform='reddit', fields='title').get_json()['items']
+
+    assert items == [{'title': 'Post'}]
+
+
+def add_item_without_bumping_the_version():
+    db.session.add(SavedContent(user_id=1, platform='youtube', original_id='video-new', title='New video',
+                                saved_at=datetime(2023, 10, 27)))
+    db.session.commit()
+
+
+def test_pages_are_cached_until_the_content_version_changes(app, client, library):
+    cache = get_app_cache(app, 'content')
+    first = listing(client).get_json()
+    assert listing(client).get_json() == first
+    assert (cache.stats()['misses'], cache.stats()['hits']) == (1, 1)
+
+    add_item_without_bumping_the_version()
+    assert listing(client).get_json() == first # Still the cached page: nothing told the cache
+
+    DataAggregatorService().bump_content_version(1)
+    db.session.commit()
+    items = listing(client).get_json()['items']
+    assert items[0]['title'] == 'New video'
+    assert cache.stats()['misses'] == 2
+
+
+def test_sync_invalidates_cached_pages(app, client, library):
+    listing(client)
+    rows = [{'original_id': 'video-synced', 'title': 'Synced', 'url': None, 'description': None,
+             'content_type': 'video', 'original_published_at': None, 'platform': 'youtube'}]
+
+    DataAggregatorService()._persist_page(1, 'youtube', rows)
+
+    assert 'Synced' in [item['title'] for item in listing(client).get_json()['items']]
+
+
+def test_cache_disabled_serves_fresh_pages(app, client, library):
+    app.config['CONTENT_CACHE_ENABLED'] = False
+    listing(client)
+
+    add_item_without_bumping_the_version()
+
+    assert listing(client).get_json()['items'][0]['title'] == 'New video'
+
+
+def test_lru_cache_evicts_the_least_recently_used_and_expires_entries():
+    cache = LRUTTLCache(max_entries=2, ttl=0.1)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    time.sleep(0.15)
+    assert cache.get('a') is None
+
+
+def test_matching_if_none_match_gets_304(client, library):
+    etag = listing(client).headers['ETag']
+
+    response = listing(client, etag=etag)
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_etag_depends_on_the_request_parameters(client, library):
+    assert listing(client).headers['ETag'] != listing(client, limit=2).headers['ETag']
+
+
+def test_etag_changes_when_the_content_version_does(client, library):
+    etag = listing(client).headers['ETag']
+
+    DataAggregatorService().bump_content_version(1)
+    db.session.commit()
+    response = listing(client, etag=etag)
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def reminders_etag(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    response = client.get('/api/reminders/', query_string={'user_id': 1}, headers=headers)
+    return response.status_code, response.headers.get('ETag')
+
+
+def test_reminder_listing_etag_changes_on_create_and_send(client, library):
+    status, etag = reminders_etag(client)
+    assert status == 200
+    assert reminders_etag(client, etag) == (304, etag)
+
+    content_id = SavedContent.query.first().id
+    reminder_time = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    assert client.post('/api/reminders/', json={'user_id': 1, 'content_id': content_id,
+                                                'reminder_time': reminder_time}).status_code == 201
+    status, created_etag = reminders_etag(client, etag)
+    assert status == 200 and created_etag != etag
+
+    Reminder.query.update({'reminder_time': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert ReminderService().process_due_reminders()['sent'] == 1
+    status, sent_etag = reminders_etag(client, created_etag)
+    assert status == 200 and sent_etag not in (etag, created_etag)
@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta
+import threading
+import time
+
+import pytest
+
+from models import db, PlatformAccount, SavedContent, User
+from services.data_aggregator_service import (AccountSyncInProgress, CoalescedSyncFailed, DataAggregatorService,
+                                              PageWrite)
+from services.platform_fetchers import get_fetcher
+
+
+def video(number, title=None):
+    return {'id': f'video{number}', 'title': title or f'Video {number}', 'url': f'https://example.com/v/{number}',
+            'publishedAt': f'2023-10-{number:02d}T10:00:00Z'}
+
+
+class ScriptedPages:
+    """Replaces the YouTube fetcher's pages(); serves `pages` and records each page request."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = 0
+        self.started = threading.Event() # Set once a sync requests its first page
+        self.release = threading.Event() # Page requests wait for this
+        self.release.set()
+        self.error = None # Raised by the next page request, if set
+
+    def __call__(self, access_token, call_api):
+        for page in self.pages:
+            def request_page(page=page):
+                self.requests += 1
+                self.started.set()
+                self.release.wait(5)
+                if self.error is not None:
+                    raise self.error
+                return page
+            yield call_api(request_page)
+
+
+@pytest.fixture
+def account(app):
+    app.config.update(SYNC_MIN_INTERVAL_SECONDS=0, SYNC_FULL_RESYNC_INTERVAL_SECONDS=0)
+    db.session.add(User(id=1, email='user1@example.com'))
+    account = PlatformAccount(user_id=1, platform='youtube', access_token='token',
+                              expires_at=datetime.utcnow() + timedelta(hours=1))
+    db.session.add(account)
+    db.session.commit()
+    return account.id
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    pages = ScriptedPages([[video(2), video(1)]])
+    monkeypatch.setattr(get_fetcher('youtube'), 'pages', pages)
+    return pages
+
+
+def sync(**kwargs):
+    return DataAggregatorService().sync_user_platform(1, 'youtube', **kwargs)
+
+
+def start_sync(app, results, **kwargs):
+    """Starts a sync in its own thread and app context; its result (or exception) lands in `results`."""
+    def run():
+        with app.app_context():
+            try:
+                results.append(sync(**kwargs))
+            except Exception as e:
+                results.append(e)
+            finally:
+                db.session.remove()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def run_leader_and_followers(app, fetcher, leader_kwargs=None, follower_kwargs=None, followers=3):
+    """Starts one sync, lets `followers` more join it while its first page is held, and returns all results."""
+    fetcher.release.clear()
+    leader_results, follower_results = [], []
+    leader = start_sync(app, leader_results, **(leader_kwargs or {}))
+    assert fetcher.started.wait(5)
+    threads = [start_sync(app, follower_results, **(follower_kwargs or {})) for _ in range(followers)]
+    time.sleep(0.2) # Let the followers find the sync in flight
+    fetcher.release.set()
+    for thread in [leader] + threads:
+        thread.join(10)
+    return leader_results[0], follower_results
+
+
+def test_first_sync_stores_every_item(app, account, fetcher):
+    stats = sync()
+
+    assert (stats['mode'], stats['items_added'], stats['pages']) == ('full', 2, 1)
+    assert {row.original_id for row in SavedContent.query} == {'video1', 'video2'}
+    stored = db.session.get(PlatformAccount, account)
+    assert stored.sync_cursor == 'video2'
+    assert stored.sync_lease_owner is None
+
+
+def test_incremental_sync_stops_at_the_stored_cursor(app, account, fetcher):
+    sync()
+    fetcher.pages = [[video(4), video(3)], [video(2), video(1)], [video(0)]]
+    fetcher.requests = 0
+
+    stats = sync()
+
+    assert (stats['mode'], stats['items_added'], stats['items_unchanged']) == ('incremental', 2, 0)
+    assert fetcher.requests == 2 # The page after the cursor is never requested
+    assert db.session.get(PlatformAccount, account).sync_cursor == 'video4'
+
+
+def test_full_resync_counts_changed_and_unchanged_items(app, account, fetcher):
+    sync()
+    assert sync(full=True)['items_unchanged'] == 2
+
+    fetcher.pages = [[video(2, title='Renamed'), video(1)]]
+    stats = sync(full=True)
+
+    assert (stats['items_added'], stats['items_updated'], stats['items_unchanged']) == (0, 1, 1)
+    assert SavedContent.query.filter_by(original_id='video2').one().title == 'Renamed'
+
+
+def test_stale_full_resync_is_promoted(app, account, fetcher):
+    sync()
+    app.config['SYNC_FULL_RESYNC_INTERVAL_SECONDS'] = 3600
+    db.session.get(PlatformAccount, account).last_full_synced_at = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+    fetcher.pages = [[video(2, title='Renamed'), video(1)]]
+
+    stats = sync()
+
+    assert (stats['mode'], stats['items_updated']) == ('full', 1)
+
+
+def test_recently_synced_account_is_skipped(app, account, fetcher):
+    app.config['SYNC_MIN_INTERVAL_SECONDS'] = 60
+    sync()
+
+    assert sync()['mode'] == 'skipped'
+    assert fetcher.requests == 1
+    assert sync(full=True)['mode'] == 'full' # A full resync is never skipped
+    assert fetcher.requests == 2
+
+
+def test_page_insert_is_chunked_and_skips_rows_inserted_meanwhile(app, account, monkeypatch):
+    app.config['SYNC_BATCH_SIZE'] = 2
+    service = DataAggregatorService()
+    rows = get_fetcher('youtube').normalize_page([video(number) for number in range(1, 6)])
+
+    assert service._persist_page(1, 'youtube', rows) == PageWrite(5, 0, 0, False)
+    # An overlapping sync stored the rows after we looked up the stored hashes
+    monkeypatch.setattr(service, '_get_stored_hashes', lambda user_id, platform, original_ids: {})
+    assert service._persist_page(1, 'youtube', rows).inserted == 0
+    assert SavedContent.query.count() == 5
+
+
+def test_concurrent_syncs_of_an_account_share_one_fetch(app, account, fetcher):
+    leader, followers = run_leader_and_followers(app, fetcher)
+
+    assert fetcher.requests == 1
+    assert leader['items_added'] == 2 and 'coalesced' not in leader
+    assert [result['coalesced'] for result in followers] == [True] * 3
+    assert SavedContent.query.count() == 2
+
+
+def test_followers_report_progress_while_waiting(app, account, fetcher):
+    app.config['SYNC_ACCOUNT_LEASE_RENEW_SECONDS'] = 0.02
+    calls = []
+
+    run_leader_and_followers(app, fetcher, follower_kwargs={'progress': lambda *args: calls.append(args)},
+                             followers=1)
+
+    assert len(calls) >= 3 and set(calls) == {(0, 0)}
+
+
+def test_leader_failure_reaches_followers_as_coalesced_failure(app, account, fetcher):
+    fetcher.error = RuntimeError('platform unavailable')
+
+    leader, followers = run_leader_and_followers(app, fetcher)
+
+    assert isinstance(leader, RuntimeError)
+    assert all(isinstance(result, CoalescedSyncFailed) for result in followers)
+    assert all(result.__cause__ is leader for result in followers)
+    assert db.session.get(PlatformAccount, account).sync_lease_owner is None
+
+
+def test_followers_run_their_own_sync_when_the_leader_loses_its_lease(app, account, fetcher):
+    class LeaseLost(Exception):
+        pass
+
+    def leader_progress(pages, items_added):
+        raise LeaseLost()
+
+    leader, followers = run_leader_and_followers(app, fetcher, leader_kwargs={'progress': leader_progress},
+                                                 followers=1)
+
+    assert isinstance(leader, LeaseLost)
+    assert followers[0]['mode'] == 'full' and 'coalesced' not in followers[0]
+    assert fetcher.requests == 2
+
+
+def test_full_sync_does_not_join_an_incremental_one(app, account, fetcher):
+    sync()
+    fetcher.pages = [[video(3), video(2, title='Renamed'), video(1)]]
+    fetcher.requests = 0
+
+    leader, followers = run_leader_and_followers(app, fetcher, follower_kwargs={'full': True}, followers=1)
+
+    assert leader['mode'] == 'incremental'
+    assert followers[0]['mode'] == 'full' and followers[0]['items_updated'] == 1
+    assert fetcher.requests == 2
+
+
+def test_account_leased_elsewhere_is_not_synced(app, account, fetcher):
+    service = DataAggregatorService()
+    other_owner = service.acquire_account_lease(account)
+    assert other_owner is not None
+    assert service.acquire_account_lease(account) is None
+
+    assert sync()['mode'] == 'in_progress'
+    with pytest.raises(AccountSyncInProgress):
+        sync(full=True)
+    assert fetcher.requests == 0
+
+    service.release_account_lease(account, other_owner)
+    assert sync()['items_added'] == 2
+
+
+def test_released_lease_can_hold_off_other_workers(app, account):
+    service = DataAggregatorService()
+    lease_owner = service.acquire_account_lease(account)
+    service.release_account_lease(account, lease_owner, retry_after=300)
+
+    stored = db.session.get(PlatformAccount, account)
+    db.session.refresh(stored)
+    assert stored.sync_lease_owner is None
+    assert stored.sync_lease_expires_at > datetime.utcnow() + timedelta(seconds=200)
@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+import socket
+import threading
+
+import pytest
+
+from models import db, EmailOutbox
+from services.email_outbox_service import EmailOutboxService
+import utils.email_sender
+
+
+class FakeSender:
+    """Records deliveries; the first `failures` sends raise."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_email(self, to, subject, body):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('mail server unavailable')
+            self.sent.append(to)
+
+    def close(self):
+        pass
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP and counts the connections opened."""
+    connections = 0
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+        self.messages = []
+        self.closed = False
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sender(app):
+    sender = FakeSender()
+    app.extensions['email_sender'] = {'default': sender}
+    return sender
+
+
+def enqueue(count):
+    EmailOutboxService().enqueue_many([{'to_address': f'user{index}@example.com', 'subject': 'Reminder',
+                                        'body': 'Hello'} for index in range(count)])
+    db.session.commit()
+
+
+def make_due():
+    EmailOutbox.query.update({'next_attempt_at': datetime.utcnow()})
+    db.session.commit()
+
+
+def test_pending_messages_are_sent(app, sender):
+    enqueue(5)
+
+    stats = EmailOutboxService().dispatch_pending(worker_id='dispatcher')
+
+    assert stats['sent'] == 5
+    assert len(sender.sent) == 5
+    assert {(message.status, message.attempts) for message in EmailOutbox.query} == {('sent', 1)}
+
+
+def test_failed_delivery_is_retried_with_exponential_backoff(app, sender):
+    app.config['MAIL_RETRY_BASE_SECONDS'] = 30
+    sender.failures = 2
+    enqueue(1)
+    service = EmailOutboxService()
+
+    before = datetime.utcnow()
+    assert service.dispatch_pending()['retried'] == 1
+    message = EmailOutbox.query.one()
+    assert (message.status, message.attempts) == ('pending', 1)
+    assert 'mail server unavailable' in message.last_error
+    # Jittered between half and all of the base delay
+    assert before + timedelta(seconds=15) <= message.next_attempt_at <= datetime.utcnow() + timedelta(seconds=30)
+
+    assert service.dispatch_pending()['batches'] == 0 # Not due yet
+
+    make_due()
+    before = datetime.utcnow()
+    assert service.dispatch_pending()['retried'] == 1
+    message = EmailOutbox.query.one()
+    assert message.attempts == 2
+    assert before + timedelta(seconds=30) <= message.next_attempt_at <= datetime.utcnow() + timedelta(seconds=60)
+
+    make_due()
+    assert service.dispatch_pending()['sent'] == 1
+    message = EmailOutbox.query.one()
+    assert (message.status, message.attempts, message.last_error) == ('sent', 3, None)
+    assert sender.sent == ['user0@example.com']
+
+
+def test_delivery_gives_up_after_max_attempts(app, sender):
+    app.config['MAIL_MAX_ATTEMPTS'] = 3
+    sender.failures = 10
+    enqueue(1)
+    service = EmailOutboxService()
+
+    results = []
+    for _ in range(3):
+        stats = service.dispatch_pending()
+        results.append((stats['retried'], stats['failed']))
+        make_due()
+
+    assert results == [(1, 0), (1, 0), (0, 1)]
+    message = EmailOutbox.query.one()
+    assert (message.status, message.attempts) == ('failed', 3)
+    assert service.dispatch_pending()['batches'] == 0
+
+
+def test_expired_sending_lease_is_reclaimed(app, sender):
+    enqueue(2)
+    service = EmailOutboxService()
+    service.claim_batch(datetime.utcnow(), 10, 'crashed-dispatcher')
+    EmailOutbox.query.update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    stats = service.dispatch_pending(worker_id='dispatcher')
+
+    assert (stats['reclaimed'], stats['sent']) == (2, 2)
+    assert len(sender.sent) == 2
+
+
+def test_concurrent_dispatchers_send_each_message_once(app, sender, run_in_threads):
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = 5
+    enqueue(40)
+
+    results = run_in_threads(lambda index: EmailOutboxService().dispatch_pending(worker_id=f'dispatcher-{index}'), 4)
+
+    assert sum(stats['sent'] for stats in results) == 40
+    assert sorted(sender.sent) == sorted(f'user{index}@example.com' for index in range(40))
+
+
+def test_dispatches_reuse_pooled_smtp_sessions(app, monkeypatch):
+    monkeypatch.setattr(utils.email_sender.smtplib, 'SMTP', FakeSMTP)
+    monkeypatch.setattr(FakeSMTP, 'connections', 0)
+    app.config.update(MAIL_BACKEND='smtp', MAIL_USE_TLS=False, MAIL_USERNAME=None, MAIL_SENDER_WORKERS=1)
+    service = EmailOutboxService()
+
+    for _ in range(3):
+        enqueue(2)
+        assert service.dispatch_pending()['sent'] == 2
+
+    assert FakeSMTP.connections == 1
+
+
+def test_pool_close_leaves_checked_out_sessions_open_until_returned(monkeypatch):
+    monkeypatch.setattr(utils.email_sender.smtplib, 'SMTP', FakeSMTP)
+    pool = utils.email_sender.SMTPConnectionPool('localhost', 25, size=2)
+    with pool.session() as busy, pool.session() as idle:
+        pass
+
+    with pool.session() as session:
+        assert session is busy # LIFO: the most recently returned session
+        pool.close()
+        assert idle.closed and not busy.closed
+        session.send_message('mid-delivery')
+
+    assert busy.closed
+    with pool.session() as session:
+        assert session not in (busy, idle)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_dispatch_delivers_to_a_local_smtp_server(app):
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+
+    class Inbox:
+        def __init__(self):
+            self.envelopes = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.envelopes.append(envelope)
+            return '250 OK'
+
+    inbox = Inbox()
+    port = unused_port()
+    controller = controller_module.Controller(inbox, hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        app.config.update(MAIL_BACKEND='smtp', MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                          MAIL_USERNAME=None, MAIL_SENDER_WORKERS=2, MAIL_MESSAGES_PER_CONNECTION=2)
+        enqueue(5)
+
+        assert EmailOutboxService().dispatch_pending()['sent'] == 5
+        utils.email_sender.get_email_sender(app).close()
+    finally:
+        controller.stop()
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in inbox.envelopes) == [f'user{index}@example.com' for index in range(5)]
+    assert all(b'Subject: Reminder' in envelope.content for envelope in inbox.envelopes)
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from utils.normalization import NormalizationSpec, content_hash, parse_iso8601, parse_twitter_date, parse_unix_timestamp
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2023-10-26T10:00:00Z', datetime(2023, 10, 26, 10, 0, 0)),
+    ('2023-10-26T10:00:00z', datetime(2023, 10, 26, 10, 0, 0)),
+    ('2023-10-26T10:00:00', datetime(2023, 10, 26, 10, 0, 0)),
+    ('2023-10-26T12:30:00+02:30', datetime(2023, 10, 26, 10, 0, 0)),
+    ('2023-10-26T05:00:00-05:00', datetime(2023, 10, 26, 10, 0, 0)),
+    ('2023-10-26T10:00:00.123Z', datetime(2023, 10, 26, 10, 0, 0, 123000)),
+    ('2023-10-26T10:00:00.123456789Z', datetime(2023, 10, 26, 10, 0, 0, 123456)), # Nanoseconds are truncated
+    ('2023-10-26T12:00:00.123456789+0200', datetime(2023, 10, 26, 10, 0, 0, 123456)),
+    ('2023-10-26 10:00:00,5Z', datetime(2023, 10, 26, 10, 0, 0, 500000)),
+    ('2016-12-31T23:59:60Z', datetime(2016, 12, 31, 23, 59, 59)), # Leap second
+])
+def test_parse_iso8601(value, expected):
+    assert parse_iso8601(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'yesterday', '2023-13-01T00:00:00Z', '2023-10-26T10:00:00.1234567+25:00x',
+                                   None, 1698314400])
+def test_parse_iso8601_rejects_invalid_input(value):
+    assert parse_iso8601(value) is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Wed Oct 25 20:00:00 +0000 2023', datetime(2023, 10, 25, 20, 0, 0)), # v1.1
+    ('Wed Oct 25 22:00:00 +0200 2023', datetime(2023, 10, 25, 20, 0, 0)),
+    ('Wed Oct 25 15:00:00 -0500 2023', datetime(2023, 10, 25, 20, 0, 0)),
+    ('2023-10-25T20:00:00.000Z', datetime(2023, 10, 25, 20, 0, 0)), # v2
+])
+def test_parse_twitter_date(value, expected):
+    assert parse_twitter_date(value) == expected
+
+
+@pytest.mark.parametrize('value', ['Wed Foo 25 20:00:00 +0000 2023', 'Wed Oct 25 20:00 +0000 2023',
+                                   'Wed Oct 32 20:00:00 +0000 2023', 'not a date', None])
+def test_parse_twitter_date_rejects_invalid_input(value):
+    assert parse_twitter_date(value) is None
+
+
+def test_parse_unix_timestamp():
+    assert parse_unix_timestamp(1698345600) == datetime(2023, 10, 26, 18, 40, 0)
+    assert parse_unix_timestamp('1698345600.5') == datetime(2023, 10, 26, 18, 40, 0, 500000)
+    assert parse_unix_timestamp('soon') is None
+    assert parse_unix_timestamp(None) is None
+    assert parse_unix_timestamp(1e20) is None
+
+
+def test_compiled_spec_maps_a_page():
+    normalize_page = NormalizationSpec(fields={'title': 'text', 'description': 'text'}, constants={'content_type': 'tweet'},
+                                       published_at=('created_at', parse_twitter_date)).compile('twitter')
+
+    rows = normalize_page([{'id': 7, 'text': 'Hello', 'created_at': 'Wed Oct 25 20:00:00 +0000 2023'},
+                           {'id': 8, 'created_at': ['unhashable']}])
+
+    assert rows[0] == {'platform': 'twitter', 'original_id': '7', 'title': 'Hello', 'url': None, 'description': 'Hello',
+                       'content_type': 'tweet', 'original_published_at': datetime(2023, 10, 25, 20, 0, 0)}
+    assert (rows[1]['original_id'], rows[1]['title'], rows[1]['original_published_at']) == ('8', None, None)
+
+
+def test_content_hash_tracks_hashed_columns_only():
+    row = {'original_id': '1', 'title': 'A', 'url': 'u', 'description': None, 'content_type': 'video',
+           'original_published_at': datetime(2023, 10, 26)}
+
+    assert content_hash(row) == content_hash(dict(row, original_id='2'))
+    assert content_hash(row) != content_hash(dict(row, title='B'))
+    assert content_hash(row) != content_hash(dict(row, description='')) # None and '' differ
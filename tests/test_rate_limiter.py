@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import utils.rate_limiter
+from utils.rate_limiter import (AdaptiveConcurrencyLimit, PlatformRateLimiter, RateLimitedError, TokenBucket,
+                                parse_rate_limit_headers)
+
+
+class FakeClock:
+    """Stands in for the time module inside utils.rate_limiter; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000 + self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(utils.rate_limiter, 'time', clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_spaces_requests_out(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0, 0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.0 # Refills two tokens, which the queued callers had already taken
+    assert bucket.reserve() == 0.5
+
+
+def test_paused_bucket_holds_back_every_request(clock):
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.pause(5)
+    bucket.pause(2) # A shorter pause doesn't cut the longer one short
+
+    assert bucket.reserve() == 5.0
+    clock.now += 5
+    assert bucket.reserve() == 0.0
+
+
+def test_limit_remaining_drains_the_bucket(clock):
+    bucket = TokenBucket(rate=1, burst=5)
+    assert bucket.is_idle()
+
+    bucket.limit_remaining(0)
+
+    assert not bucket.is_idle()
+    assert bucket.reserve() == 1.0
+
+
+def test_concurrency_limit_halves_on_throttle_at_most_once_per_interval(clock):
+    limit = AdaptiveConcurrencyLimit(8, min_limit=2, decrease_interval=1.0)
+
+    limit.on_throttle()
+    limit.on_throttle() # Same burst of 429s
+    assert limit.limit == 4
+    clock.now += 1.0
+    limit.on_throttle()
+    clock.now += 1.0
+    limit.on_throttle()
+    assert (limit.limit, limit.throttled) == (2, 4) # Never below min_limit
+
+
+def test_concurrency_limit_grows_by_one_per_limit_successes(clock):
+    limit = AdaptiveConcurrencyLimit(4)
+    limit.on_throttle()
+    limit.on_throttle()
+    clock.now += 1.0
+    limit.on_throttle()
+    assert limit.limit == 1
+
+    for _ in range(1 + 2):
+        limit.on_success()
+    assert limit.limit == 3
+    for _ in range(3 + 10):
+        limit.on_success()
+    assert limit.limit == 4 # Capped at max_limit
+
+
+def test_retry_after_in_seconds():
+    assert parse_rate_limit_headers({'Retry-After': '7'}) == (7.0, None)
+
+
+def test_retry_after_as_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    wait, remaining = parse_rate_limit_headers({'retry-after': format_datetime(retry_at, usegmt=True)})
+
+    assert 28 <= wait <= 30 and remaining is None
+
+
+def test_retry_after_in_the_past_or_unreadable():
+    assert parse_rate_limit_headers({'Retry-After': 'Mon, 01 Jan 2001 00:00:00 GMT'}) == (0.0, None)
+    assert parse_rate_limit_headers({'Retry-After': 'soon'}) == (None, None)
+    assert parse_rate_limit_headers(None) == (None, None)
+
+
+def test_exhausted_window_waits_for_its_reset(clock):
+    reset_at = clock.time() + 45
+
+    assert parse_rate_limit_headers({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset_at)}) == (45.0, 0)
+    assert parse_rate_limit_headers({'x-rate-limit-remaining': '0', 'x-rate-limit-reset': '12'}) == (12.0, 0)
+    assert parse_rate_limit_headers({'RateLimit-Remaining': '3', 'RateLimit-Reset': '12'}) == (None, 3)
+
+
+def test_limiter_retries_throttled_requests_after_retry_after(clock):
+    limiter = PlatformRateLimiter('youtube', max_retries=3, backoff_base_seconds=0.1)
+    responses = [RateLimitedError(retry_after=2), RateLimitedError(retry_after=2), 'page']
+
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call('token', request) == 'page'
+    assert limiter.stats()['retries'] == 2
+    assert all(2 <= seconds <= 2.1 for seconds in clock.slept)
+
+
+def test_limiter_gives_up_after_max_retries(clock):
+    limiter = PlatformRateLimiter('youtube', max_retries=2)
+
+    def request():
+        raise RateLimitedError()
+
+    with pytest.raises(RateLimitedError):
+        limiter.call('token', request)
+    assert limiter.requests == 3
+
+
+def test_observe_pauses_an_exhausted_credential(clock):
+    limiter = PlatformRateLimiter('youtube', credential_requests_per_second=10)
+
+    limiter.observe('token', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '30'})
+
+    assert limiter._credential_bucket('token').reserve() == 30.0
+    assert limiter._credential_bucket('other-token').reserve() == 0.0
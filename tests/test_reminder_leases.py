@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from models import db, EmailOutbox, Reminder, SavedContent, User
+from services.reminder_service import ReminderService
+
+
+def add_due_reminders(count, user_id=1):
+    user = db.session.get(User, user_id) or User(id=user_id, email=f'user{user_id}@example.com')
+    db.session.add(user)
+    content = SavedContent(user_id=user_id, platform='youtube', original_id=f'video-{user_id}',
+                           title='A video', url='https://example.com/video')
+    db.session.add(content)
+    db.session.flush()
+    due_at = datetime.utcnow() - timedelta(minutes=1)
+    reminders = [Reminder(user_id=user_id, content_id=content.id, reminder_time=due_at - timedelta(seconds=index))
+                 for index in range(count)]
+    db.session.add_all(reminders)
+    db.session.commit()
+    return [reminder.id for reminder in reminders]
+
+
+def test_claims_do_not_overlap(app):
+    add_due_reminders(10)
+    service = ReminderService()
+    now = datetime.utcnow()
+
+    first_owner, first = service.claim_due_reminders(now, 6, 'worker-a')
+    second_owner, second = service.claim_due_reminders(now, 6, 'worker-b')
+
+    assert first_owner != second_owner
+    assert len(first) == 6 and len(second) == 4
+    assert not {reminder.id for reminder in first} & {reminder.id for reminder in second}
+    assert service.claim_due_reminders(now, 6, 'worker-c')[1] == []
+
+
+def test_concurrent_processors_send_each_reminder_once(app, run_in_threads):
+    ids = add_due_reminders(40)
+
+    results = run_in_threads(lambda index: ReminderService().process_due_reminders(batch_size=5,
+                                                                                   worker_id=f'worker-{index}'), 4)
+
+    assert sum(stats['sent'] for stats in results) == len(ids)
+    assert sorted(reminder_id for (reminder_id,) in db.session.query(EmailOutbox.reminder_id)) == sorted(ids)
+    assert {reminder.status for reminder in Reminder.query} == {'sent'}
+
+
+def test_expired_lease_is_reclaimed_and_sent_once(app):
+    ids = add_due_reminders(3)
+    service = ReminderService()
+    service.claim_due_reminders(datetime.utcnow(), 10, 'crashed-worker')
+    Reminder.query.update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    stats = service.process_due_reminders(worker_id='worker-b')
+
+    assert stats['reclaimed'] == 3 and stats['sent'] == 3
+    assert EmailOutbox.query.count() == len(ids)
+    assert {(reminder.status, reminder.lease_owner) for reminder in Reminder.query} == {('sent', None)}
+
+
+def test_release_skips_reminders_reclaimed_by_another_processor(app):
+    add_due_reminders(2)
+    service = ReminderService()
+    slow_owner, claimed = service.claim_due_reminders(datetime.utcnow(), 10, 'slow-worker')
+    stolen_id = claimed[0].id
+    # The slow worker's lease runs out and another processor reclaims and sends the first reminder
+    db.session.get(Reminder, stolen_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    service.reclaim_stale_leases(datetime.utcnow())
+    fast_owner, reclaimed = service.claim_due_reminders(datetime.utcnow(), 10, 'fast-worker')
+    assert [reminder.id for reminder in reclaimed] == [stolen_id]
+
+    released = service._release_claimed(slow_owner, [reminder.id for reminder in claimed], 'sent')
+    db.session.commit()
+
+    assert released == [claimed[1].id]
+    stolen = db.session.get(Reminder, stolen_id)
+    assert (stolen.status, stolen.lease_owner) == ('processing', fast_owner)
+
+
+def test_process_due_reminders_queues_no_email_for_a_lost_lease(app, monkeypatch):
+    add_due_reminders(1)
+    service = ReminderService()
+    claim = service.claim_due_reminders
+
+    def claim_then_lose_lease(now, limit, worker_id):
+        lease_owner, reminders = claim(now, limit, worker_id)
+        if reminders: # Another processor takes the reminder over while we build the email
+            Reminder.query.update({'lease_owner': 'other-worker/0'}, synchronize_session=False)
+            db.session.commit()
+        return lease_owner, reminders
+
+    monkeypatch.setattr(service, 'claim_due_reminders', claim_then_lose_lease)
+    stats = service.process_due_reminders(worker_id='slow-worker')
+
+    assert stats['sent'] == 0
+    assert EmailOutbox.query.count() == 0
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+
+from models import db, Reminder, SavedContent, User
+from services.reminder_scheduler import ReminderScheduler
+
+
+@pytest.fixture
+def scheduler(app):
+    scheduler = ReminderScheduler()
+    yield scheduler
+    scheduler.stop(5)
+
+
+def schedule_in(seconds):
+    """Adds a reminder due `seconds` from now, as another process would: without telling the scheduler."""
+    user = db.session.get(User, 1) or User(id=1, email='user1@example.com')
+    content = SavedContent(user=user, platform='youtube', original_id=f'video-{time.monotonic_ns()}', title='A video')
+    reminder = Reminder(user=user, content=content, reminder_time=datetime.utcnow() + timedelta(seconds=seconds))
+    db.session.add(reminder)
+    db.session.commit()
+    return reminder.id, reminder.reminder_time
+
+
+def wait_for_status(reminder_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if db.session.get(Reminder, reminder_id).status == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_peek_is_off_by_default(app, scheduler):
+    scheduler.start(app)
+    time.sleep(0.2)
+
+    assert scheduler._window_end is not None
+    assert scheduler._next_peek is None
+
+
+def test_notified_reminder_fires_on_time(app, scheduler):
+    scheduler.start(app)
+    time.sleep(0.2) # Let the first window load
+    reminder_id, reminder_time = schedule_in(0.5)
+    scheduler.notify(reminder_id, reminder_time)
+
+    assert wait_for_status(reminder_id, 'sent')
+
+
+def test_peek_finds_reminders_created_by_other_processes(app, scheduler):
+    app.config['REMINDER_SCHEDULER_PEEK_SECONDS'] = 0.1
+    scheduler.start(app)
+    time.sleep(0.2)
+    reminder_id, _ = schedule_in(0.3) # Never notified
+
+    assert wait_for_status(reminder_id, 'sent')
@@ -0,0 +1,35 @@
+import pytest
+
+from models import db, SavedContent, User
+from services.search_service import SearchService
+
+
+@pytest.fixture
+def library(app):
+    db.session.add(User(id=1, email='user1@example.com'))
+    db.session.add(User(id=2, email='user2@example.com'))
+    db.session.add_all([
+        SavedContent(user_id=1, platform='youtube', original_id='a_b', title='a_b'),
+        SavedContent(user_id=1, platform='youtube', original_id='axb', title='axb'),
+        SavedContent(user_id=1, platform='reddit', original_id='post', title='Python packaging', description='a_b'),
+        SavedContent(user_id=2, platform='youtube', original_id='other', title='Python a_b'),
+    ])
+    db.session.commit()
+
+
+def titles(query, **kwargs):
+    rows, _ = SearchService().search(1, query, **kwargs)
+    return sorted(row.title for row in rows)
+
+
+def test_fts_search_matches_prefixes_within_the_users_rows(app, library):
+    assert titles('pyth') == ['Python packaging']
+    assert titles('a_b', platform='youtube') == ['a_b']
+
+
+def test_like_search_treats_wildcards_literally(app, library):
+    app.config['SEARCH_BACKEND'] = 'like'
+
+    assert titles('a_b') == ['Python packaging', 'a_b'] # Not 'axb'
+    assert titles('a_b', platform='youtube') == ['a_b']
+    assert titles('python') == ['Python packaging']
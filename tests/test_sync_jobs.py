@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+import json
+import threading
+
+import pytest
+
+from models import db, PlatformAccount, SyncJob, User
+from services.sync_job_service import SyncJobService
+
+
+@pytest.fixture
+def service(app):
+    app.config.update(JOB_RETRY_BASE_SECONDS=30, JOB_MAX_ATTEMPTS=3, SYNC_MIN_INTERVAL_SECONDS=0)
+    for user_id in (1, 2):
+        db.session.add(User(id=user_id, email=f'user{user_id}@example.com'))
+        db.session.add(PlatformAccount(user_id=user_id, platform='youtube', access_token='token'))
+    db.session.commit()
+    return SyncJobService()
+
+
+def stub_sync(service, monkeypatch, outcome):
+    """Makes the service's syncs return `outcome`, raise it if it is an exception, or call it with the progress callback."""
+    def sync_user_platform(user_id, platform, full=False, progress=None, lease_owner=None):
+        if isinstance(outcome, Exception):
+            raise outcome
+        if callable(outcome):
+            return outcome(progress)
+        return outcome
+    monkeypatch.setattr(service.data_aggregator, 'sync_user_platform', sync_user_platform)
+
+
+def run_next(service, now=None):
+    claimed = service.claim_job(now or datetime.utcnow(), 'worker')
+    assert claimed is not None
+    return service.run_job(claimed[1], claimed[0])
+
+
+def test_concurrent_claims_take_distinct_jobs(app, service, run_in_threads):
+    first, _ = service.enqueue_platform_sync(1, 'youtube')
+    second, _ = service.enqueue_platform_sync(2, 'youtube')
+
+    claims = run_in_threads(lambda index: service.claim_job(datetime.utcnow(), f'worker-{index}'), 4)
+
+    assert sorted(claim[1] for claim in claims if claim) == [first.id, second.id]
+    assert {job.status for job in SyncJob.query} == {'running'}
+
+
+def test_repeated_triggers_join_the_queued_job(app, service):
+    job, coalesced = service.enqueue_platform_sync(1, 'youtube')
+    assert not coalesced
+
+    joined, coalesced = service.enqueue_platform_sync(1, 'youtube', full=True)
+
+    assert coalesced and joined.id == job.id
+    assert joined.full_resync # A full trigger upgrades the queued job
+    assert SyncJob.query.count() == 1
+
+
+def test_trigger_requeues_a_job_whose_worker_died(app, service):
+    job, _ = service.enqueue_platform_sync(1, 'youtube')
+    service.claim_job(datetime.utcnow(), 'dead-worker')
+    SyncJob.query.update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    joined, coalesced = service.enqueue_platform_sync(1, 'youtube', full=True)
+
+    assert coalesced and joined.id == job.id
+    assert (joined.status, joined.full_resync) == ('queued', True)
+
+
+def test_successful_job_records_its_result(app, service, monkeypatch):
+    stub_sync(service, monkeypatch, {'mode': 'full', 'pages': 3, 'items_added': 7})
+    job, _ = service.enqueue_platform_sync(1, 'youtube')
+
+    assert run_next(service) == 'succeeded'
+    status = service.get_job_status(job.id)
+    assert (status['attempts'], status['pages'], status['items_added']) == (1, 3, 7)
+    assert status['result']['mode'] == 'full'
+
+
+def test_failed_job_is_retried_with_exponential_backoff_then_fails(app, service, monkeypatch):
+    stub_sync(service, monkeypatch, RuntimeError('platform unavailable'))
+    job, _ = service.enqueue_platform_sync(1, 'youtube')
+
+    now = datetime.utcnow()
+    for attempt, (low, high) in enumerate([(15, 30), (30, 60)], start=1):
+        assert run_next(service, now) == 'queued'
+        job = db.session.get(SyncJob, job.id)
+        db.session.refresh(job)
+        assert job.attempts == attempt and 'platform unavailable' in job.last_error
+        delay = (job.next_attempt_at - datetime.utcnow()).total_seconds()
+        assert low - 1 <= delay <= high
+        assert service.claim_job(datetime.utcnow(), 'worker') is None # Not due yet
+        now = job.next_attempt_at
+
+    assert run_next(service, now) == 'failed' # JOB_MAX_ATTEMPTS reached
+    db.session.refresh(job)
+    assert (job.status, job.attempts, job.lease_owner) == ('failed', 3, None)
+
+
+def test_sync_without_result_fails_without_retrying(app, service, monkeypatch):
+    stub_sync(service, monkeypatch, None)
+    service.enqueue_platform_sync(1, 'youtube')
+
+    assert run_next(service) == 'failed'
+    assert SyncJob.query.one().attempts == 1
+
+
+def test_job_whose_lease_was_taken_over_is_dropped(app, service, monkeypatch):
+    app.config['JOB_PROGRESS_INTERVAL_SECONDS'] = 0
+
+    def sync_losing_the_lease(progress):
+        SyncJob.query.update({'lease_owner': 'other-worker/0'})
+        db.session.commit()
+        progress(1, 1)
+        return {'mode': 'full', 'pages': 1, 'items_added': 1}
+
+    stub_sync(service, monkeypatch, sync_losing_the_lease)
+    service.enqueue_platform_sync(1, 'youtube')
+
+    assert run_next(service) == 'lost'
+    job = SyncJob.query.one()
+    assert (job.status, job.lease_owner) == ('running', 'other-worker/0')
+
+
+def test_worker_reclaims_expired_leases_and_runs_everything(app, service, monkeypatch):
+    stub_sync(service, monkeypatch, {'mode': 'full', 'pages': 1, 'items_added': 1})
+    service.enqueue_platform_sync(1, 'youtube')
+    service.enqueue_platform_sync(2, 'youtube')
+    service.claim_job(datetime.utcnow(), 'dead-worker')
+    SyncJob.query.update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    assert service.work('worker', threading.Event(), exit_when_idle=True) == 2
+    assert {job.status for job in SyncJob.query} == {'succeeded'}
+    assert all(json.loads(job.result)['items_added'] == 1 for job in SyncJob.query)
@@ -0,0 +1,47 @@
+import signal
+import threading
+
+import pytest
+
+from config import Config
+from services.sync_shard_service import BACKGROUND_WORKER_FLAGS, SyncShardService, run_shard_process, split_rate_limits
+
+BACKGROUND_THREAD_PREFIXES = ('reminder-scheduler', 'sync-job-worker', 'token-refresher')
+
+
+@pytest.fixture
+def shard_host(tmp_path, monkeypatch):
+    """A host whose environment enables every background worker, as Config read it on import."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    for flag in BACKGROUND_WORKER_FLAGS:
+        monkeypatch.setenv(flag, 'true')
+        monkeypatch.setattr(Config, flag, True)
+    previous_handler = signal.getsignal(signal.SIGINT)
+    yield
+    signal.signal(signal.SIGINT, previous_handler)
+
+
+def background_threads():
+    return [thread.name for thread in threading.enumerate() if thread.name.startswith(BACKGROUND_THREAD_PREFIXES)]
+
+
+def test_shard_process_starts_no_background_workers(shard_host, monkeypatch):
+    monkeypatch.setattr(Config, 'SYNC_SHARD_WORKER_ID', 'sync-host')
+    monkeypatch.setattr(Config, 'JOB_WORKER_ID', 'job-host')
+    workers = []
+    monkeypatch.setattr(SyncShardService, 'run',
+                        lambda self, worker_id, stop_event, concurrency=None: workers.append(worker_id) or 0)
+    stop_event = threading.Event()
+    stop_event.set()
+
+    run_shard_process(1, 4, stop_event)
+
+    assert background_threads() == []
+    assert len(workers) == 1
+    assert workers[0].startswith('sync-host:') and workers[0].endswith('/shard-1')
+
+
+def test_split_rate_limits_divides_app_wide_quota():
+    split = split_rate_limits({'youtube': {'requests_per_second': 10, 'burst': 5, 'per_token_per_second': 2}}, 4)
+
+    assert split == {'youtube': {'requests_per_second': 2.5, 'burst': 1, 'per_token_per_second': 2}}
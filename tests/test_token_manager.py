@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+
+from models import db, PlatformAccount, User
+from services.token_manager import TokenManager, TokenRefreshError
+
+
+def add_account(expires_in, refresh_token='refresh-token', user_id=1, platform='youtube'):
+    db.session.add(db.session.get(User, user_id) or User(id=user_id, email=f'user{user_id}@example.com'))
+    account = PlatformAccount(user_id=user_id, platform=platform, access_token='old-token',
+                              refresh_token=refresh_token, expires_at=datetime.utcnow() + timedelta(seconds=expires_in))
+    db.session.add(account)
+    db.session.commit()
+    return account.id
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = TokenManager()
+    request_refresh = manager._request_refresh
+
+    def slow_request_refresh(platform, refresh_token):
+        time.sleep(0.05) # Long enough for every concurrent caller to queue up behind the first
+        return request_refresh(platform, refresh_token)
+
+    monkeypatch.setattr(manager, '_request_refresh', slow_request_refresh)
+    return manager
+
+
+def test_valid_token_is_not_refreshed(app, manager):
+    account_id = add_account(expires_in=3600)
+
+    assert manager.get_access_token(db.session.get(PlatformAccount, account_id)) == 'old-token'
+    assert manager.refresh_count == 0
+
+
+def test_concurrent_callers_share_one_refresh(app, manager, run_in_threads):
+    account_id = add_account(expires_in=-60)
+
+    tokens = run_in_threads(lambda index: manager.get_access_token(db.session.get(PlatformAccount, account_id)), 8)
+
+    assert manager.refresh_count == 1
+    assert len(set(tokens)) == 1 and tokens[0] != 'old-token'
+    assert db.session.get(PlatformAccount, account_id).access_token == tokens[0]
+    assert manager._refresh_locks == {}
+
+
+def test_accounts_refresh_independently(app, manager, run_in_threads):
+    account_ids = [add_account(expires_in=-60, user_id=user_id) for user_id in (1, 2, 3)]
+
+    tokens = run_in_threads(lambda index: manager.refresh(account_ids[index % 3]), 6)
+
+    assert manager.refresh_count == 3
+    assert len(set(tokens)) == 3
+    assert manager._refresh_locks == {}
+
+
+def test_token_refreshed_elsewhere_is_reused(app, manager):
+    account_id = add_account(expires_in=-60)
+    # Another process refreshes the account after we loaded it
+    stale = db.session.get(PlatformAccount, account_id)
+    db.session.execute(db.update(PlatformAccount).values(access_token='new-token',
+                                                         expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.session.commit()
+
+    assert manager.refresh(stale.id) == 'new-token'
+    assert manager.refresh_count == 0
+
+
+def test_missing_refresh_token_raises(app, manager):
+    account_id = add_account(expires_in=-60, refresh_token=None)
+
+    with pytest.raises(TokenRefreshError):
+        manager.get_access_token(db.session.get(PlatformAccount, account_id))
+    assert manager._refresh_locks == {}
+
+
+def test_refresh_expiring_only_refreshes_tokens_within_the_leeway(app, manager):
+    app.config['TOKEN_REFRESH_LEEWAY_SECONDS'] = 300
+    expiring = add_account(expires_in=120, user_id=1)
+    add_account(expires_in=3600, user_id=2)
+    add_account(expires_in=60, refresh_token=None, user_id=3)
+
+    assert manager.refresh_expiring() == (1, 0)
+    assert manager.refresh_count == 1
+    assert db.session.get(PlatformAccount, expiring).access_token != 'old-token'
+
+
+@pytest.mark.parametrize('args, refresher', [
+    ([], True),
+    (['--no-token-refresher'], False),
+    (['--exit-when-idle'], False),
+])
+def test_job_worker_command_runs_the_token_refresher(app, monkeypatch, args, refresher):
+    from services.sync_job_service import job_worker
+    from services.token_manager import token_manager
+    started = []
+    monkeypatch.setattr(token_manager, 'start', lambda app: started.append('refresher'))
+    monkeypatch.setattr(job_worker, 'start', lambda app, **kwargs: started.append('jobs'))
+    monkeypatch.setattr(job_worker, 'join', lambda timeout=None: None)
+
+    result = app.test_cli_runner().invoke(args=['run-job-worker'] + args)
+
+    assert result.exit_code == 0, result.output
+    assert started == (['refresher', 'jobs'] if refresher else ['jobs'])
+
+
+def test_sync_workers_command_runs_one_token_refresher_for_the_host(app, monkeypatch):
+    from services.sync_shard_service import ShardSupervisor
+    from services.token_manager import token_manager
+    started = []
+    monkeypatch.setattr(token_manager, 'start', lambda app: started.append('refresher'))
+    monkeypatch.setattr(ShardSupervisor, 'run', lambda self: started.append(f'{len(self.shards)} shards'))
+
+    result = app.test_cli_runner().invoke(args=['run-sync-workers', '--workers', '2'])
+
+    assert result.exit_code == 0, result.output
+    assert started == ['refresher', '2 shards']
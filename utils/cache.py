@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import threading
+import time
+
+try:
+    import redis # Optional: only needed for a shared cache backend
+except ImportError:
+    redis = None
+
+
+class LRUTTLCache:
+    """
+    In-process cache bounded by entry count, evicting the least recently used entry first.
+    Entries also expire `ttl` seconds after they were stored. Thread-safe.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return _stats('memory', self.hits, self.misses, size)
+
+
+class RedisCache:
+    """Cache shared between processes, stored in Redis with a TTL per entry. Values must be bytes or str."""
+
+    def __init__(self, url, ttl=60, prefix='cache:'):
+        if redis is None:
+            raise RuntimeError('The redis package is required for a Redis cache backend')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, value)
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+    def stats(self):
+        return _stats('redis', self.hits, self.misses, None)
+
+
+def _stats(backend, hits, misses, size):
+    lookups = hits + misses
+    return {
+        'backend': backend,
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+        'entries': size
+    }
+
+
+def get_app_cache(app, name):
+    """
+    Returns the cache called `name` for `app`, creating it on first use from the app config:
+    {NAME}_CACHE_REDIS_URL selects Redis, otherwise an LRU bounded by {NAME}_CACHE_MAX_ENTRIES.
+    Both expire entries after {NAME}_CACHE_TTL_SECONDS.
+    """
+    caches = app.extensions.setdefault('caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        prefix = name.upper()
+        ttl = app.config.get(f'{prefix}_CACHE_TTL_SECONDS', 60)
+        redis_url = app.config.get(f'{prefix}_CACHE_REDIS_URL')
+        if redis_url:
+            cache = RedisCache(redis_url, ttl=ttl, prefix=f'{name}:')
+        else:
+            cache = LRUTTLCache(app.config.get(f'{prefix}_CACHE_MAX_ENTRIES', 10000), ttl=ttl)
+        cache = caches.setdefault(name, cache)
+    return cache
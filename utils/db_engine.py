@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica' # SQLALCHEMY_BINDS key of the read replica
+
+# True while a read_from_replica call is running in this thread/context
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def engine_profile(url, config):
+    """
+    Returns (engine options, SQLite pragmas) for the database at `url`. SQLite gets the DB_SQLITE_*
+    pragmas, applied to every new connection; server databases get the DB_POOL_* pool settings.
+    """
+    if make_url(url).get_backend_name() == 'sqlite':
+        pragmas = {
+            'journal_mode': config.get('DB_SQLITE_JOURNAL_MODE'),
+            'synchronous': config.get('DB_SQLITE_SYNCHRONOUS'),
+            'busy_timeout': config.get('DB_SQLITE_BUSY_TIMEOUT_MS'),
+            'mmap_size': config.get('DB_SQLITE_MMAP_SIZE'),
+            'cache_size': config.get('DB_SQLITE_CACHE_SIZE')
+        }
+        return {}, {name: value for name, value in pragmas.items() if value is not None}
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE'),
+        'max_overflow': config.get('DB_MAX_OVERFLOW'),
+        'pool_recycle': config.get('DB_POOL_RECYCLE_SECONDS'),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT_SECONDS'),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING')
+    }
+    return {name: value for name, value in options.items() if value is not None}, {}
+
+
+def configure_engines(app):
+    """
+    Fills in SQLALCHEMY_ENGINE_OPTIONS (and the replica bind, when DATABASE_REPLICA_URL is set) from
+    the engine profile of each URL. Runs before db.init_app; options already in the config win.
+    Returns {bind key: pragmas} for init_engines.
+    """
+    config = app.config
+    options, pragmas = engine_profile(config['SQLALCHEMY_DATABASE_URI'], config)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    bind_pragmas = {None: pragmas}
+
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        replica_options, bind_pragmas[REPLICA_BIND] = engine_profile(replica_url, config)
+        config['SQLALCHEMY_BINDS'] = {**config.get('SQLALCHEMY_BINDS', {}),
+                                      REPLICA_BIND: {**replica_options, 'url': replica_url}}
+    return bind_pragmas
+
+
+def init_engines(app, db, bind_pragmas):
+    """Applies each SQLite engine's pragmas on connect. Runs after db.init_app, which creates the engines."""
+    with app.app_context():
+        engines = db.engines
+    for key, pragmas in bind_pragmas.items():
+        engine = engines.get(key)
+        if engine is not None and pragmas:
+            event.listen(engine, 'connect', _pragma_setter(pragmas))
+            logger.debug('sqlite pragmas set', extra={'bind': key or 'primary', **pragmas})
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}') # Pragmas don't take bound parameters
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+class RoutingSession(Session):
+    """
+    Sends the queries of read_from_replica calls to the replica bind, when one is configured.
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reading_from_replica.get() and not self._flushing \
+                and not getattr(clause, 'is_dml', False):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """Routes the block's read queries to the replica (to the primary when no replica is configured)."""
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+def read_from_replica(method):
+    """
+    Marks a read-only service method whose queries may be served by the replica. Only for reads
+    that tolerate replication lag: anything that writes, or reads to decide a write, stays on the primary.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return method(*args, **kwargs)
+    return wrapper
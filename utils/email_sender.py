@@ -1,20 +1,169 @@
 # In a real app, use Flask-Mail or smtplib with your email provider credentials
 # from flask_mail import Mail, Message # If using Flask-Mail
+from contextlib import contextmanager
+from email.message import EmailMessage
+import logging
+import queue
+import smtplib
+import threading
+
+logger = logging.getLogger(__name__)
 
 class EmailSender:
     """Mock Email Sending Utility."""
     def __init__(self):
         # In a real app, configure Flask-Mail or smtplib
-        print("--- MOCK: EmailSender initialized ---")
+        logger.debug('mock email sender initialized')
 
     def send_email(self, to, subject, body):
-        """Mocks sending an email by printing to the console."""
-        print("\n--- MOCK EMAIL START ---")
-        print(f"To: {to}")
-        print(f"Subject: {subject}")
-        print("Body:")
-        print(body)
-        print("--- MOCK EMAIL END ---\n")
+        """Mocks sending an email by logging it."""
+        logger.info('mock email', extra={'to': to, 'subject': subject, 'body': body})
         # In a real app:
         # msg = Message(subject, recipients=[to], body=body)
         # mail.send(msg) # Assuming 'mail' is a Flask-Mail instance
+
+    def close(self):
+        pass
+
+
+class SMTPConnectionPool:
+    """
+    A fixed-size pool of reusable SMTP sessions.
+    Each session sends up to `max_messages` messages before it is closed and replaced, so senders
+    skip the connect/EHLO/STARTTLS/AUTH handshake for most messages without holding a session forever.
+    Safe to share between threads; each session is used by one thread at a time.
+    """
+
+    def __init__(self, host, port, use_tls=False, username=None, password=None,
+                 size=4, max_messages=100, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.max_messages = max_messages
+        self.timeout = timeout
+        # Slots hold an open (session, messages_sent) pair or None for a session not opened yet
+        self._slots = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put(None)
+        self._lock = threading.Lock()
+        # Bumped by close(); sessions checked out under an older generation are closed when returned
+        self._generation = 0
+
+    def _connect(self):
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            session.starttls()
+        if self.username:
+            session.login(self.username, self.password)
+        return session
+
+    def _discard(self, session):
+        try:
+            session.quit()
+        except (smtplib.SMTPException, OSError):
+            session.close()
+
+    @contextmanager
+    def session(self):
+        """Checks out a session, opening one if the slot is empty. A session that errors is dropped."""
+        slot = self._slots.get()
+        with self._lock:
+            generation = self._generation
+        if slot:
+            session, sent = slot
+        else:
+            try:
+                session, sent = self._connect(), 0
+            except BaseException:
+                self._slots.put(None) # Give the slot back so a failed connect doesn't shrink the pool
+                raise
+        try:
+            yield session
+        except BaseException:
+            self._discard(session)
+            self._slots.put(None)
+            raise
+        sent += 1
+        with self._lock:
+            closed = generation != self._generation
+        if closed or sent >= self.max_messages:
+            self._discard(session)
+            self._slots.put(None)
+        else:
+            self._slots.put((session, sent))
+
+    def send_message(self, message):
+        """Sends one message, reconnecting once if the pooled session was closed by the server."""
+        try:
+            with self.session() as session:
+                session.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            with self.session() as session:
+                session.send_message(message)
+
+    def close(self):
+        """
+        Closes the idle sessions. Sessions checked out by a sender mid-delivery are left alone and
+        closed when they are returned, so close() never pulls a connection out from under a send.
+        """
+        with self._lock:
+            self._generation += 1
+        idle = []
+        while True:
+            try:
+                idle.append(self._slots.get_nowait())
+            except queue.Empty:
+                break
+        for slot in idle:
+            if slot:
+                self._discard(slot[0])
+            self._slots.put(None)
+
+
+class SMTPEmailSender:
+    """Sends email over a pool of SMTP connections. Thread-safe."""
+
+    def __init__(self, pool, default_sender):
+        self.pool = pool
+        self.default_sender = default_sender
+
+    def send_email(self, to, subject, body):
+        message = EmailMessage()
+        message['From'] = self.default_sender
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(body)
+        self.pool.send_message(message)
+
+    def close(self):
+        self.pool.close()
+
+
+def create_email_sender(config):
+    """Builds the sender selected by MAIL_BACKEND ('mock' or 'smtp')."""
+    if config.get('MAIL_BACKEND', 'mock') != 'smtp':
+        return EmailSender()
+    pool = SMTPConnectionPool(
+        config['MAIL_SERVER'],
+        config['MAIL_PORT'],
+        use_tls=config.get('MAIL_USE_TLS', False),
+        username=config.get('MAIL_USERNAME'),
+        password=config.get('MAIL_PASSWORD'),
+        size=config.get('MAIL_POOL_SIZE', 4),
+        max_messages=config.get('MAIL_MESSAGES_PER_CONNECTION', 100)
+    )
+    return SMTPEmailSender(pool, config.get('MAIL_DEFAULT_SENDER'))
+
+
+def get_email_sender(app):
+    """
+    Returns the app's shared sender, creating it on first use. One per process, so outbox dispatches
+    reuse the pooled SMTP sessions instead of opening new ones on every run.
+    """
+    senders = app.extensions.setdefault('email_sender', {})
+    sender = senders.get('default')
+    if sender is None:
+        sender = senders.setdefault('default', create_email_sender(app.config))
+    return sender
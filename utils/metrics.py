@@ -0,0 +1,290 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Statement kinds SQL metrics are labelled with; anything else counts as OTHER
+SQL_STATEMENT_KINDS = frozenset(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT', 'ROLLBACK'))
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {} # label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def labels(self, **labels):
+        """The series for these label values, for hot paths that record into the same one repeatedly."""
+        return _Series(self, self._key(labels))
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    """A value that only goes up; Prometheus derives rates from it."""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._inc(self._key(labels), amount)
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value):
+        return [f'{self.name}{self._label_text(key)} {_number(value)}']
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, e.g. jobs in flight."""
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        self._inc(self._key(labels), amount)
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _render_value(self, key, value):
+        return [f'{self.name}{self._label_text(key)} {_number(value)}']
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count (for latency percentiles)."""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key, value):
+        index = bisect_left(self.buckets, value) # Buckets are inclusive upper bounds
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds the block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, value):
+        bucket_counts, total, count = value[0][:], value[1], value[2]
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+        lines.append(f'{self.name}_sum{self._label_text(key)} {_number(total)}')
+        lines.append(f'{self.name}_count{self._label_text(key)} {count}')
+        return lines
+
+
+class _Series:
+    """One labelled series of a metric; see _Metric.labels."""
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric._inc(self.key, amount)
+
+    def observe(self, value):
+        self.metric._observe(self.key, value)
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process. counter()/gauge()/histogram() return the existing metric when the
+    name is already registered, so modules can declare what they record at import time.
+    Each process keeps its own values: with several server workers, scrape each one.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _register(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'Metric {name} is already registered with a different type or labels')
+            return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Shared by the app and the services that record into it
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter('http_requests_total', 'HTTP requests handled.', ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'HTTP request latency.', ('method', 'route'))
+HTTP_REQUEST_QUERIES = metrics.histogram('http_request_db_queries', 'SQL statements executed per HTTP request.',
+                                         ('route',), buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+HTTP_REQUEST_DB_SECONDS = metrics.histogram('http_request_db_seconds', 'Time per HTTP request spent in SQL statements.',
+                                            ('route',))
+DB_QUERIES = metrics.counter('db_queries_total', 'SQL statements executed.', ('statement',))
+DB_QUERY_SECONDS = metrics.histogram('db_query_duration_seconds', 'SQL statement latency.', ('statement',))
+# statement kind -> (query counter, latency histogram) series, bound once since every statement records into them
+_SQL_SERIES = {kind: (DB_QUERIES.labels(statement=kind), DB_QUERY_SECONDS.labels(statement=kind))
+               for kind in SQL_STATEMENT_KINDS | {'OTHER'}}
+
+_sql_listeners_installed = False
+_sql_listeners_lock = threading.Lock()
+
+
+def init_metrics(app):
+    """
+    Records request latency and per-request SQL counts and time for `app`, and serves all metrics
+    on /metrics. Does nothing unless METRICS_ENABLED.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _install_sql_listeners()
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        _record_request(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        if exc is not None and 'metrics_started' in g:
+            _record_request(500) # after_request doesn't run for unhandled exceptions
+
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+
+
+def _record_request(status):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    # The URL rule, not the path, keeps one series per route rather than per user id
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route)
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
+    HTTP_REQUEST_QUERIES.observe(g.get('db_queries', 0), route=route)
+    HTTP_REQUEST_DB_SECONDS.observe(g.get('db_seconds', 0.0), route=route)
+
+
+def _install_sql_listeners():
+    """Times every statement of every engine; installed once per process."""
+    global _sql_listeners_installed
+    with _sql_listeners_lock:
+        if _sql_listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _sql_listeners_installed = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_started')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    words = statement[:16].split(None, 1)
+    queries, seconds = _SQL_SERIES.get(words[0].upper() if words else 'OTHER') or _SQL_SERIES['OTHER']
+    queries.inc()
+    seconds.observe(elapsed)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    """A failed statement never reaches after_cursor_execute; drop its start time so later ones pair up."""
+    connection = exception_context.connection
+    if connection is None:
+        return # Failed while connecting, so nothing was pushed
+    starts = connection.info.get('metrics_query_started')
+    if starts:
+        starts.pop()
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import hashlib
+import re
+
+# Timestamps repeat a lot within a sync (many items share a second, retries re-send pages), so
+# parsed values are memoized. Every parser returns a naive UTC datetime, like the rest of the models.
+TIMESTAMP_CACHE_SIZE = 65536
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), start=1)}
+
+_RFC3339_RE = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d+))?\s*(?:([Zz])|([+-])(\d{2}):?(\d{2}))?$')
+
+
+def _to_naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_iso8601(value):
+    """Parses an RFC 3339 / ISO 8601 timestamp ('2023-10-26T10:00:00Z', '...10:00:00.123+02:00'). None if invalid."""
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if text[-1:] in ('Z', 'z'):
+        text = text[:-1] + '+00:00' # fromisoformat only accepts Z from Python 3.11 on
+    try:
+        return _to_naive_utc(datetime.fromisoformat(text))
+    except ValueError:
+        pass
+    # Slow path for valid RFC 3339 that fromisoformat rejects, such as more than 6 fractional digits
+    match = _RFC3339_RE.match(value.strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, zulu, sign, offset_hours, offset_minutes = match.groups()
+    try:
+        parsed = datetime(int(year), int(month), int(day), int(hour), int(minute), min(int(second), 59), # Leap seconds
+                          int((fraction or '0')[:6].ljust(6, '0')))
+    except ValueError:
+        return None
+    if sign:
+        offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+        parsed -= offset if sign == '+' else -offset
+    return parsed
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_twitter_date(value):
+    """Parses Twitter's v1.1 created_at format, 'Wed Oct 25 20:00:00 +0000 2023'. None if invalid."""
+    if not isinstance(value, str):
+        return None
+    parts = value.split()
+    if len(parts) != 6:
+        return parse_iso8601(value) # The v2 API returns ISO 8601 instead
+    _weekday, month_name, day, clock, offset, year = parts
+    try:
+        hour, minute, second = clock.split(':')
+        parsed = datetime(int(year), _MONTHS[month_name], int(day), int(hour), int(minute), int(second))
+        if offset != '+0000':
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+            parsed -= delta if offset[0] == '+' else -delta
+        return parsed
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_unix_timestamp(value):
+    """Parses seconds since the epoch (int, float or numeric string). None if invalid."""
+    try:
+        return datetime(1970, 1, 1) + timedelta(seconds=float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class NormalizationSpec:
+    """
+    Declarative mapping from a platform's raw items to SavedContent columns, compiled once into a
+    function that normalizes a whole page.
+
+    fields -- {column: raw key} copied with item.get(); several columns may share a raw key
+    constants -- {column: value} set on every row
+    published_at -- optional (raw key, parser) for original_published_at
+    Unmapped columns are None. original_id is always str(item['id']).
+    """
+    COLUMNS = ('platform', 'original_id', 'title', 'url', 'description', 'content_type', 'original_published_at')
+
+    def __init__(self, fields=None, constants=None, published_at=None):
+        self.fields = dict(fields or {})
+        self.constants = dict(constants or {})
+        self.published_at = published_at
+
+    def compile(self, platform):
+        """Returns normalize_page(items) -> list of row dicts for `platform`."""
+        template = dict.fromkeys(self.COLUMNS)
+        template.update(self.constants, platform=platform)
+        copies = tuple(self.fields.items())
+        published_key, parse_published = self.published_at or (None, None)
+
+        def normalize_page(items):
+            rows = []
+            append = rows.append
+            for item in items:
+                get = item.get
+                row = template.copy()
+                row['original_id'] = str(get('id')) # Ensure string
+                for column, key in copies:
+                    row[column] = get(key)
+                if published_key is not None:
+                    published = get(published_key)
+                    if published is not None:
+                        try:
+                            row['original_published_at'] = parse_published(published)
+                        except TypeError: # Unhashable values can't go through the memoized parsers
+                            pass
+                append(row)
+            return rows
+
+        return normalize_page
+
+
+# Columns covered by SavedContent.content_hash: an upstream change to any of them is written on the next sync
+HASHED_COLUMNS = ('title', 'url', 'description', 'content_type', 'original_published_at')
+
+def content_hash(row):
+    """Compact fingerprint (16 hex chars) of a normalized row's HASHED_COLUMNS."""
+    parts = []
+    for column in HASHED_COLUMNS:
+        value = row.get(column)
+        if value is None:
+            parts.append('\x00') # Distinguishes None from ''
+        elif isinstance(value, datetime):
+            parts.append(value.isoformat())
+        else:
+            parts.append(str(value))
+    return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=8).hexdigest()
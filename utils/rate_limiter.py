@@ -0,0 +1,289 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from contextlib import contextmanager
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Header spellings used by the platforms we sync (and the IETF draft); looked up case-insensitively
+_REMAINING_HEADERS = ('x-ratelimit-remaining', 'x-rate-limit-remaining', 'ratelimit-remaining')
+_RESET_HEADERS = ('x-ratelimit-reset', 'x-rate-limit-reset', 'ratelimit-reset')
+_EPOCH_THRESHOLD = 1_000_000_000 # Reset values above this are Unix timestamps, below are seconds from now
+
+
+class RateLimitedError(Exception):
+    """
+    Raised by a platform request that was throttled (HTTP 429, or a quota error in the body).
+    `retry_after` is the number of seconds the platform asked us to wait, if it said.
+    `scope` is 'credential' when only this token is throttled and 'app' when our whole client is.
+    """
+
+    def __init__(self, message='rate limited', retry_after=None, scope='credential'):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.scope = scope
+
+    @classmethod
+    def from_headers(cls, headers, message='rate limited', scope='credential'):
+        """Builds the error from a throttled response's headers."""
+        retry_after, _remaining = parse_rate_limit_headers(headers)
+        return cls(message, retry_after=retry_after, scope=scope)
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Reads Retry-After and the X-RateLimit-Remaining/Reset family from response headers.
+    Returns (wait_seconds, remaining): wait_seconds is how long until requests may resume (None if
+    the headers don't say) and remaining is the calls left in the current window (None if unknown).
+    """
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    wait = None
+
+    retry_after = headers.get('retry-after')
+    if retry_after is not None:
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            try: # Retry-After may also be an HTTP date
+                wait = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                wait = None
+
+    remaining = _first_number(headers, _REMAINING_HEADERS)
+    if remaining is not None:
+        remaining = int(remaining)
+        reset = _first_number(headers, _RESET_HEADERS)
+        if wait is None and remaining <= 0 and reset is not None:
+            wait = reset - time.time() if reset > _EPOCH_THRESHOLD else reset
+
+    if wait is not None:
+        wait = max(0.0, wait)
+    return wait, remaining
+
+
+def _first_number(headers, names):
+    for name in names:
+        try:
+            return float(headers[name])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average with bursts of up to `burst`. Thread-safe.
+    A bucket can also be paused, e.g. until the time a Retry-After header named.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1 # May go negative: later callers queue up behind this one
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds back every request for `seconds`. Calls made during a pause share the same resume time."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def limit_remaining(self, remaining):
+        """Drains tokens the platform says we no longer have in this window."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, float(remaining))
+
+    def is_idle(self):
+        """True when the bucket is full and unpaused, i.e. dropping it would change nothing."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._tokens >= self.burst and self._paused_until <= now
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Caps concurrent requests with an AIMD limit: each throttling response halves the limit (at most
+    once per `decrease_interval` seconds, so one burst of 429s counts once) and every `limit`
+    consecutive successes raise it by one, up to `max_limit`. Thread-safe.
+    """
+
+    def __init__(self, max_limit, min_limit=1, decrease_interval=1.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.decrease_interval = decrease_interval
+        self.throttled = 0
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            self.throttled += 1
+            self._successes = 0
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._last_decrease = now
+
+
+class PlatformRateLimiter:
+    """
+    Rate control for one platform's API: a token bucket for the whole client (app quota), one bucket
+    per credential (per-user quota), and an adaptive cap on concurrent requests. Throttled requests
+    are retried after the platform's Retry-After, or with exponential backoff and jitter.
+    """
+    MAX_IDLE_CREDENTIALS = 10000 # Credential buckets kept before idle ones are dropped
+
+    def __init__(self, platform, requests_per_second=None, burst=None,
+                 credential_requests_per_second=None, credential_burst=None,
+                 max_concurrency=4, min_concurrency=1, max_retries=5,
+                 backoff_base_seconds=1.0, backoff_max_seconds=60.0):
+        self.platform = platform
+        self.app_bucket = TokenBucket(requests_per_second, burst or requests_per_second) if requests_per_second else None
+        self.credential_rate = credential_requests_per_second
+        self.credential_burst = credential_burst or credential_requests_per_second
+        self.concurrency = AdaptiveConcurrencyLimit(max_concurrency, min_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.requests = 0
+        self.retries = 0
+        self._credential_buckets = {}
+        self._lock = threading.Lock()
+
+    def _credential_bucket(self, credential):
+        if not self.credential_rate or credential is None:
+            return None
+        with self._lock:
+            bucket = self._credential_buckets.get(credential)
+            if bucket is None:
+                if len(self._credential_buckets) >= self.MAX_IDLE_CREDENTIALS:
+                    self._credential_buckets = {key: value for key, value in self._credential_buckets.items()
+                                                if not value.is_idle()}
+                bucket = self._credential_buckets[credential] = TokenBucket(self.credential_rate, self.credential_burst)
+            return bucket
+
+    def call(self, credential, request):
+        """
+        Runs `request()` within the limits and returns its result, retrying while it raises
+        RateLimitedError. Raises the last RateLimitedError once max_retries is exhausted.
+        """
+        credential_bucket = self._credential_bucket(credential)
+        attempt = 0
+        while True:
+            # Wait for quota before taking a concurrency slot, so waiting callers don't hold slots
+            if self.app_bucket is not None:
+                self.app_bucket.acquire()
+            if credential_bucket is not None:
+                credential_bucket.acquire()
+            try:
+                with self.concurrency.slot():
+                    with self._lock:
+                        self.requests += 1
+                    result = request()
+            except RateLimitedError as e:
+                self.concurrency.on_throttle()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e.retry_after)
+                bucket = self.app_bucket if e.scope == 'app' else credential_bucket or self.app_bucket
+                if bucket is not None:
+                    bucket.pause(delay) # Everyone sharing the throttled quota waits, not just this caller
+                logger.warning('platform throttled, retrying',
+                               extra={'platform': self.platform, 'retry_in_seconds': round(delay, 1), 'attempt': attempt + 1})
+                with self._lock:
+                    self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.concurrency.on_success()
+            return result
+
+    def observe(self, credential, headers):
+        """
+        Feeds rate-limit headers from a successful response back into the buckets, so we slow down
+        before the platform starts refusing: an exhausted window pauses until its reset.
+        """
+        wait, remaining = parse_rate_limit_headers(headers)
+        bucket = self._credential_bucket(credential) or self.app_bucket
+        if bucket is None or remaining is None:
+            return
+        bucket.limit_remaining(remaining)
+        if remaining <= 0 and wait:
+            bucket.pause(wait)
+
+    def _retry_delay(self, attempt, retry_after):
+        if retry_after is not None:
+            # A little jitter so every throttled caller doesn't come back in the same instant
+            return retry_after + random.uniform(0, self.backoff_base_seconds)
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'throttled': self.concurrency.throttled,
+            'concurrency_limit': self.concurrency.limit
+        }
+
+
+def get_rate_limiter(app, platform):
+    """
+    Returns the shared limiter for `platform`, creating it on first use from PLATFORM_RATE_LIMITS.
+    The concurrency ceiling defaults to the platform's SYNC_PLATFORM_CONCURRENCY.
+    """
+    limiters = app.extensions.setdefault('rate_limiters', {})
+    limiter = limiters.get(platform)
+    if limiter is None:
+        settings = dict(app.config.get('PLATFORM_RATE_LIMITS', {}).get(platform, {}))
+        settings.setdefault('max_concurrency', app.config.get('SYNC_PLATFORM_CONCURRENCY', {}).get(platform, 4))
+        limiter = limiters.setdefault(platform, PlatformRateLimiter(platform, **settings))
+    return limiter
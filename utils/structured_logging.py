@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+import json
+import logging
+import sys
+
+# Attributes every LogRecord has; anything else on a record came in through `extra=` and is a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    """The structured fields passed to a log call as `extra`."""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES and not key.startswith('_')}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the record's fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with the record's fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={_quote(value)}' for key, value in fields.items())
+        return line
+
+
+def _quote(value):
+    text = str(value)
+    return json.dumps(text) if not text or any(char in text for char in ' "=\n') else text
+
+
+def configure_logging(app):
+    """
+    Sends log records to stderr as LOG_FORMAT ('text' or 'json') at LOG_LEVEL. Installed on the root
+    logger once; later calls (another create_app) replace the handler rather than adding a second one.
+    """
+    formatter = JsonFormatter() if app.config.get('LOG_FORMAT', 'text') == 'json' else KeyValueFormatter()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(formatter)
+    handler._structured = True
+
+    root = logging.getLogger()
+    for existing in [existing for existing in root.handlers if getattr(existing, '_structured', False)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO').upper())